@@ -51,7 +51,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # первым, чтобы время запроса включало все остальные middleware, а размер - уже сжатый ответ
+    'mondiv.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'mondiv.responses.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -94,6 +97,44 @@ DATABASES = {
     }
 }
 
+# Общий для всех воркеров gunicorn кэш (графики, версии данных пользователей).
+# По умолчанию таблица в БД: python manage.py createcachetable
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.db.DatabaseCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'mondiv_cache'),
+    }
+}
+
+# Внешние источники рыночных данных (Polygon, MOEX): таймауты запроса в секундах,
+# число повторов и общий предел ожидания ответа в запросе пользователя
+POLYGON_API_KEY = os.environ.get('POLYGON_API_KEY') or 'slfhowwfy'
+MARKET_DATA_CONNECT_TIMEOUT = float(os.environ.get('MARKET_DATA_CONNECT_TIMEOUT', 3.05))
+MARKET_DATA_READ_TIMEOUT = float(os.environ.get('MARKET_DATA_READ_TIMEOUT', 5))
+MARKET_DATA_RETRIES = int(os.environ.get('MARKET_DATA_RETRIES', 2))
+MARKET_DATA_DEADLINE = float(os.environ.get('MARKET_DATA_DEADLINE', 8))
+# не больше стольких поисков тикера в секунду при пакетном добавлении компаний
+MARKET_DATA_RATE = float(os.environ.get('MARKET_DATA_RATE', 5))
+# загружать данные новых компаний в потоке воркера сразу после создания;
+# при 0 их забирает только команда fetch_pending_companies
+COMPANY_FETCH_IN_BACKGROUND = int(os.environ.get('COMPANY_FETCH_IN_BACKGROUND', 1))
+
+# сжатие json и html ответов (mondiv.responses.CompressionMiddleware): меньшие не сжимаются,
+# уровни выбраны для динамических ответов - быстрее, почти без потери в размере
+COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+COMPRESS_GZIP_LEVEL = int(os.environ.get('COMPRESS_GZIP_LEVEL', 6))
+COMPRESS_BROTLI_QUALITY = int(os.environ.get('COMPRESS_BROTLI_QUALITY', 5))
+
+# как часто воркер кладет свои метрики в общий кэш для /metrics, секунд
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 10))
+# сколько хранится снимок воркера: несколько интервалов, после этого остановленный
+# (или давно простаивающий) воркер выпадает из суммы
+METRICS_SNAPSHOT_TIMEOUT = int(os.environ.get('METRICS_SNAPSHOT_TIMEOUT', 60))
+
+# валюта сводных графиков профиля, если загружены курсы (команда load_fx_rates)
+BASE_CURRENCY = os.environ.get('BASE_CURRENCY', 'USD')
+
 # AUTH_USER_MODEL = 'mondiv.AppUser'
 
 
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'appbox.settings')
 
 application = get_wsgi_application()
+
+# индекс автодополнения компаний строится при старте воркера, а не на первом запросе
+from mondiv.autocomplete import warm_index  # noqa: E402
+
+warm_index()
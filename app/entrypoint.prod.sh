@@ -11,4 +11,6 @@ then
     echo "Mysql started"
 fi
 
+python manage.py createcachetable
+
 exec "$@"
\ No newline at end of file
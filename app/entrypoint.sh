@@ -14,5 +14,6 @@ fi
 #python manage.py flush --no-input
 #python manage.py makemigrations
 python manage.py migrate
+python manage.py createcachetable
 
 exec "$@"
\ No newline at end of file
@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.utils.safestring import mark_safe
 
-from mondiv.models import Company, Account, Currency, Dividend, Report
+from mondiv.models import Company, Account, Currency, Dividend, Report, DividendHistory, FxRate
 
 
 class ReportAdmin(admin.ModelAdmin):
@@ -24,19 +24,39 @@ class DividendAdmin(admin.ModelAdmin):
 
 class CompanyAdmin(admin.ModelAdmin):
     list_display = ('id',
-        'name', 'ticker', 'time_create', 'get_html_photo')
+        'name', 'ticker', 'status', 'time_create', 'get_html_photo')
     list_display_links = ('ticker', 'name')
     search_fields = ('name', 'ticker')
-    list_filter = ('time_create',)
+    list_filter = ('time_create', 'status')
 
     def get_html_photo(self, object):
         if object.icon_image:
-            return mark_safe(f'<img src="{object.icon_image.url}" width=50>')
+            return mark_safe(f'<img src="{object.icon_thumb_url()}" width=50>')
 
     get_html_photo.short_description = 'логотип'
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if 'icon_image' in form.changed_data:
+            obj.update_thumbnails()
+
+
+class DividendHistoryAdmin(admin.ModelAdmin):
+    list_display = ('ticker', 'ex_dividend_date', 'pay_date', 'cash_amount', 'currency', 'source')
+    search_fields = ('ticker',)
+    list_filter = ('source',)
+
+
+class FxRateAdmin(admin.ModelAdmin):
+    list_display = ('date', 'currency', 'base', 'rate')
+    list_filter = ('currency', 'base')
+    date_hierarchy = 'date'
+
+
 admin.site.register(Company, CompanyAdmin)
 admin.site.register(Account)
 admin.site.register(Currency)
 admin.site.register(Dividend, DividendAdmin)
-admin.site.register(Report, ReportAdmin)
\ No newline at end of file
+admin.site.register(Report, ReportAdmin)
+admin.site.register(DividendHistory, DividendHistoryAdmin)
+admin.site.register(FxRate, FxRateAdmin)
\ No newline at end of file
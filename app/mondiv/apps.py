@@ -5,3 +5,6 @@ class MondivConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'mondiv'
     verbose_name='Монитор дивидендов'
+
+    def ready(self):
+        import mondiv.signals
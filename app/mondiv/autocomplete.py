@@ -0,0 +1,97 @@
+import threading
+from bisect import bisect_left
+from heapq import nsmallest
+from time import monotonic
+
+from django.db import DatabaseError
+
+from mondiv.cache import get_catalog_version
+from mondiv.models import Company
+
+# как часто сверять индекс с версией каталога (одно чтение кэша), секунд
+INDEX_CHECK_INTERVAL = 1.0
+MAX_RESULTS = 20
+
+
+# отсортированный список ключей (тикер и слова названия в нижнем регистре) для поиска
+# по префиксу двоичным поиском; строится целиком и подменяется, поэтому читается без блокировок
+class PrefixIndex:
+    def __init__(self, companies):
+        self.companies = {}
+        entries = set()
+        for pk, ticker, name in companies:
+            self.companies[pk] = (ticker, name)
+            # 0 - совпадение по тикеру выше совпадения по названию
+            entries.add((ticker.lower(), 0, pk))
+            entries.add((name.lower(), 1, pk))
+            for word in name.lower().split()[1:]:
+                entries.add((word, 1, pk))
+        self.entries = sorted(entries)
+        self.keys = [e[0] for e in self.entries]
+
+    # [(id, тикер, название)]: сначала совпадения по тикеру, затем по названию, короткие ключи выше;
+    # ранжируется весь диапазон ключей с этим префиксом (его границы дает двоичный поиск),
+    # поэтому точное совпадение тикера не теряется среди множества похожих названий
+    def search(self, query, limit=10):
+        query = query.strip().lower()
+        if not query:
+            return []
+        start = bisect_left(self.keys, query)
+        end = bisect_left(self.keys, query[:-1] + chr(ord(query[-1]) + 1), start)
+        best = {}
+        for key, rank, pk in self.entries[start:end]:
+            order = (rank, len(key), key)
+            if pk not in best or order < best[pk]:
+                best[pk] = order
+        return [(pk,) + self.companies[pk] for pk in nsmallest(limit, best, key=lambda pk: (best[pk], pk))]
+
+
+_index = None
+_version = None
+_checked = 0
+_lock = threading.Lock()
+
+
+def build_index():
+    companies = Company.objects.exclude(status='failed').values_list('id', 'ticker', 'name').iterator()
+    return PrefixIndex(companies)
+
+
+# индекс процесса; пересобирается, если версия каталога изменилась (компания добавлена или изменена)
+def get_index():
+    global _index, _version, _checked
+    now = monotonic()
+    if _index is not None and now - _checked < INDEX_CHECK_INTERVAL:
+        return _index
+    version = get_catalog_version()
+    _checked = now
+    if _index is None or version != _version:
+        with _lock:
+            if _index is None or version != _version:
+                _index = build_index()
+                _version = version
+    return _index
+
+
+def search_companies(query, limit=10):
+    return get_index().search(query, min(limit, MAX_RESULTS))
+
+
+# подписи выбранных компаний {id: 'Название (ТИКЕР)'} из индекса; в базу только за теми,
+# кого в индексе еще нет
+def company_labels(pks):
+    companies = get_index().companies
+    labels = {pk: '{1} ({0})'.format(*companies[pk]) for pk in pks if pk in companies}
+    missing = [pk for pk in pks if pk not in labels]
+    if missing:
+        for pk, ticker, name in Company.objects.filter(pk__in=missing).values_list('id', 'ticker', 'name'):
+            labels[pk] = f'{name} ({ticker})'
+    return labels
+
+
+# построение при старте воркера; до миграций таблицы может не быть
+def warm_index():
+    try:
+        get_index()
+    except DatabaseError:
+        pass
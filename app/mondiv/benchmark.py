@@ -0,0 +1,122 @@
+import statistics
+import tracemalloc
+from math import ceil
+from time import perf_counter
+
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, reverse
+
+from mondiv import autocomplete, metrics
+from mondiv.models import Company, Dividend, Report
+from mondiv.synthetic import TICKER_PREFIX
+from mondiv.urls import app_name, urlpatterns
+
+# Обход всех адресов mondiv/urls.py тестовым клиентом: замеры run_benchmarks
+# и проверка числа запросов к базе в тестах (mondiv/tests.py)
+
+# адреса, которые не замеряем: выход завершает сессию
+SKIP = {'logout'}
+# параметры запроса, без которых адрес отвечает пустой страницей или ошибкой
+QUERY = {
+    'company_autocomplete': {'q': TICKER_PREFIX.lower()},
+    'dividend_history': {'ticker': f'{TICKER_PREFIX}0'},
+    'proba': {'currency': 'USD'},
+    'last_year': {'currency': 'USD'},
+    'last_n_years': {'currency': 'USD', 'for_n_years': 5},
+    'total_for_each_year': {'currency': 'USD'},
+    'total_for_each_ticker': {'currency': 'USD'},
+    'total_for_each_account': {'currency': 'USD'},
+    'all_reports': {'currency': 'USD'},
+    'report_in_currency': {'currency': 'USD'},
+    'export': {'format': 'csv'},
+}
+# те же адреса с пересчетом в базовую валюту, отдельными строками результата
+BASE_CURRENCY = ('last_n_years', 'total_for_each_ticker', 'all_reports', 'dashboard')
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[max(ceil(len(values) * p / 100) - 1, 0)]
+
+
+# ответ целиком, включая потоковые (export)
+def fetch(client, url, query):
+    response = client.get(url, query)
+    if response.streaming:
+        size = sum(len(chunk) for chunk in response.streaming_content)
+    else:
+        size = len(response.content)
+    return response, size
+
+
+# [(имя результата, адрес, параметры)] для всех адресов mondiv/urls.py
+def endpoints(user):
+    dividend = Dividend.objects.filter(user=user).order_by('id').first()
+    report = Report.objects.filter(user=user).order_by('id').first()
+    kwargs = {
+        'company_pk': dividend.company_id,
+        'div_pk': dividend.pk,
+        'report_pk': report.pk,
+    }
+    ticker = Company.objects.get(pk=dividend.company_id).ticker
+    res = []
+    for pattern in urlpatterns:
+        if not isinstance(pattern, URLPattern) or pattern.name in SKIP:
+            continue
+        query = dict(QUERY.get(pattern.name, {}))
+        if pattern.name == 'dividend_history':
+            query['ticker'] = ticker
+        names = list(pattern.pattern.converters)
+        if pattern.name == 'export':
+            for kind in ('dividends', 'reports'):
+                url = reverse(f'{app_name}:export', kwargs={'kind': kind})
+                res.append((f'export_{kind}', url, query))
+            continue
+        url = reverse(f'{app_name}:{pattern.name}', kwargs={n: kwargs[n] for n in names})
+        res.append((pattern.name, url, query))
+        if pattern.name in BASE_CURRENCY:
+            res.append((f'{pattern.name}_base', url, dict(query, base_currency='USD')))
+    return res
+
+
+# пустой кэш и состояние процесса, как у только что запущенного воркера: индекс
+# автодополнения и ячейка метрик заново создаются первым запросом
+def reset_state():
+    cache.clear()
+    autocomplete._index = None
+    metrics.registry.slot = None
+
+
+def measure(client, url, query, repeat, warm):
+    times, queries, status, size = [], 0, None, 0
+    if warm:
+        fetch(client, url, query)
+    for _ in range(repeat):
+        if not warm:
+            reset_state()
+        with CaptureQueriesContext(connection) as ctx:
+            start = perf_counter()
+            response, size = fetch(client, url, query)
+            times.append((perf_counter() - start) * 1000)
+        queries = max(queries, len(ctx.captured_queries))
+        status = response.status_code
+
+    # пиковая память - отдельным запросом: tracemalloc сильно замедляет выполнение
+    if not warm:
+        reset_state()
+    tracemalloc.start()
+    try:
+        fetch(client, url, query)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        'status': status,
+        'median_ms': round(statistics.median(times), 2),
+        'p95_ms': round(percentile(times, 95), 2),
+        'queries': queries,
+        'peak_kb': round(peak / 1024, 1),
+        'bytes': size,
+    }
@@ -0,0 +1,212 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils import timezone
+from django.views.decorators.http import condition
+
+from mondiv.metrics import registry, collect
+from mondiv.models import Account, Currency, UserDataStamp
+
+# ответ графика живет в кэше сутки; устаревает раньше, если сменилась версия данных
+CHART_CACHE_TIMEOUT = 60 * 60 * 24
+
+# версия формата ответов графиков: меняется вместе с кодом, чтобы после выкладки
+# не отдавать ответы старого формата из кэша и по старым ETag
+CHARTS_VERSION = 3
+
+# значения счетчиков попаданий на момент обнуления (chart_cache_stats --reset): сами счетчики
+# живут в памяти воркеров (mondiv/metrics.py), а не в кэше, где incr не атомарен и стоит запросов
+STATS_BASELINE_KEY = 'mondiv:chart_cache:baseline'
+
+CATALOG_VERSION_KEY = 'mondiv:catalog_version'
+CURRENCY_VERSION_KEY = 'mondiv:currency_version'
+FX_VERSION_KEY = 'mondiv:fx_version'
+
+# списки выбора форм меняются редко, живут до смены версии счетов или валют
+CHOICES_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def data_version_key(user_id):
+    return f'mondiv:data_version:{user_id}'
+
+
+# версия по ключу; если ключ вытеснен из кэша - новая уникальная версия,
+# чтобы старые записи не могли совпасть
+def get_version(key):
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+# несколько версий одним обращением к кэшу; вытесненные - как в get_version
+def get_versions(*keys):
+    versions = cache.get_many(keys)
+    return [versions[key] if key in versions else get_version(key) for key in keys]
+
+
+def bump_version(key):
+    cache.set(key, time.time_ns(), None)
+
+
+# версия данных пользователя (выплаты, отчеты)
+def get_data_version(user_id):
+    return get_version(data_version_key(user_id))
+
+
+def bump_data_version(user_id):
+    bump_version(data_version_key(user_id))
+
+
+# версии данных сразу нескольких пользователей, одной записью в кэш
+def bump_data_versions(user_ids):
+    version = time.time_ns()
+    cache.set_many({data_version_key(user_id): version for user_id in user_ids}, None)
+
+
+# версия общего каталога компаний
+def get_catalog_version():
+    return get_version(CATALOG_VERSION_KEY)
+
+
+def bump_catalog_version():
+    bump_version(CATALOG_VERSION_KEY)
+
+
+def accounts_version_key(user_id):
+    return f'mondiv:accounts_version:{user_id}'
+
+
+def bump_accounts_version(user_id):
+    bump_version(accounts_version_key(user_id))
+
+
+def bump_currency_version():
+    bump_version(CURRENCY_VERSION_KEY)
+
+
+# версия курсов валют: от нее зависят графики с пересчетом (?base_currency=)
+def get_fx_version():
+    return get_version(FX_VERSION_KEY)
+
+
+def bump_fx_version():
+    bump_version(FX_VERSION_KEY)
+
+
+# варианты выбора счета (только свои) и валюты для форм пользователя:
+# {'account': [(id, название)], 'currency': [(id, название)]}
+def form_choices(user_id):
+    accounts_version, currency_version = get_versions(accounts_version_key(user_id), CURRENCY_VERSION_KEY)
+    key = f'mondiv:form_choices:{user_id}:{accounts_version}:{currency_version}'
+    choices = cache.get(key)
+    if choices is None:
+        choices = {
+            'account': list(Account.objects.filter(user_id=user_id).order_by('name', 'id').values_list('id', 'name')),
+            'currency': list(Currency.objects.order_by('name', 'id').values_list('id', 'name')),
+        }
+        cache.set(key, choices, CHOICES_CACHE_TIMEOUT)
+    return choices
+
+
+# day - текущая дата для графиков, которые от нее зависят: после полуночи ключ другой
+def chart_cache_key(name, user_id, params, version, day=None):
+    currency = params.get('currency', 'USD')
+    query = '&'.join(f'{k}={v}' for k in sorted(params) for v in params.getlist(k))
+    digest = hashlib.md5(query.encode()).hexdigest()
+    if 'base_currency' in params:
+        version = f'{version}:{get_fx_version()}'
+    if day:
+        version = f'{version}:{day.isoformat()}'
+    return f'mondiv:chart:{CHARTS_VERSION}:{name}:{user_id}:{currency}:{digest}:{version}'
+
+
+def count(view, result):
+    registry.inc('mondiv_chart_cache_total', {'chart': view.__name__, 'result': result})
+
+
+# попадания и промахи всех воркеров с последнего обнуления
+def chart_cache_totals():
+    counters, histograms = collect()
+    totals = {'hits': 0, 'misses': 0}
+    for (name, labels), value in counters.items():
+        if name == 'mondiv_chart_cache_total':
+            totals['hits' if dict(labels)['result'] == 'hit' else 'misses'] += value
+    return totals
+
+
+def cache_stats():
+    totals = chart_cache_totals()
+    baseline = cache.get(STATS_BASELINE_KEY) or {}
+    # после перезапуска воркеров суммы могут стать меньше сохраненных
+    return {k: max(v - baseline.get(k, 0), 0) for k, v in totals.items()}
+
+
+def reset_cache_stats():
+    cache.set(STATS_BASELINE_KEY, chart_cache_totals(), None)
+
+
+# кэширует json графика по (график, пользователь, валюта, параметры, версия данных);
+# daily - как в user_data_condition, в ключ входит и текущая дата.
+# попадания и промахи считаются в памяти процесса, без записи в кэш
+def cached_chart(daily=False):
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            version = get_data_version(request.user.pk)
+            key = chart_cache_key(view.__name__, request.user.pk, request.GET, version,
+                                  timezone.localdate() if daily else None)
+            content = cache.get(key)
+            if content is not None:
+                count(view, 'hit')
+                return HttpResponse(content, content_type='application/json')
+
+            count(view, 'miss')
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(key, response.content, CHART_CACHE_TIMEOUT)
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+# HTTP-валидаторы ######################################################
+
+# отметка изменения данных пользователя, один запрос по первичному ключу на весь запрос
+def user_data_modified(request):
+    if not hasattr(request, '_data_modified'):
+        request._data_modified = UserDataStamp.objects \
+            .filter(user_id=request.user.pk).values_list('modified', flat=True).first()
+    return request._data_modified
+
+
+# ETag и Last-Modified по отметке изменения данных пользователя;
+# daily - ответ зависит и от текущей даты (графики "за последний год" и т.п.)
+def user_data_condition(name, daily=False):
+    def last_modified(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return None
+        modified = user_data_modified(request)
+        if daily:
+            midnight = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+            modified = max(modified, midnight) if modified else midnight
+        return modified
+
+    def etag(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return None
+        modified = user_data_modified(request)
+        parts = [name, str(CHARTS_VERSION), str(request.user.pk), modified.isoformat() if modified else '-', request.GET.urlencode()]
+        if daily:
+            parts.append(timezone.localdate().isoformat())
+        if 'base_currency' in request.GET:
+            parts.append(str(get_fx_version()))
+        return hashlib.md5(':'.join(parts).encode()).hexdigest()
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
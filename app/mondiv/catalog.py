@@ -0,0 +1,34 @@
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.template.loader import render_to_string
+
+from mondiv.cache import get_catalog_version
+from mondiv.models import Company
+
+CATALOG_PAGE_SIZE = 50
+CATALOG_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+# только колонки, которые показывает таблица, порядок по индексу (name, id)
+def catalog_queryset():
+    return Company.objects \
+        .only('id', 'name', 'ticker', 'icon_image', 'icon_hash', 'status') \
+        .order_by('name', 'id')
+
+
+def catalog_page(number):
+    return Paginator(catalog_queryset(), CATALOG_PAGE_SIZE).get_page(number)
+
+
+# html таблицы каталога; одинаков для всех пользователей, поэтому кэшируется по
+# версии каталога, которая меняется при любом изменении компаний
+def catalog_fragment(number):
+    key = f'mondiv:catalog:{get_catalog_version()}:{number}'
+    html = cache.get(key)
+    if html is None:
+        page = catalog_page(number)
+        html = render_to_string('mondiv/parts/company_catalog.html', {'page': page})
+        # номер за пределами каталога показывает последнюю страницу, такие ключи не храним
+        if str(page.number) == str(number):
+            cache.set(key, html, CATALOG_CACHE_TIMEOUT)
+    return html
@@ -0,0 +1,203 @@
+import json
+from collections import OrderedDict
+from datetime import date
+
+from mondiv.series import densify
+from mondiv.utils import month_name, get_month_list, last_year_start
+
+
+# Статическая часть графиков Chart.js (тип, оформление, постоянные свойства рядов) ####
+# Отдается один раз по /charts/config/?v=<версия> и кэшируется браузером;
+# при любом изменении CHART_CONFIG нужно увеличить CHART_CONFIG_VERSION
+
+CHART_CONFIG_VERSION = 1
+
+LEGEND_LABELS = {'font': {'size': 18}}
+TOOLTIP = {'titleFont': {'size': 20}, 'titleAlign': 'center', 'boxPadding': 10}
+TITLE = {'font': {'size': 30}, 'display': 'true'}
+POINTS = {'pointStyle': 'circle', 'pointRadius': 8, 'pointHoverRadius': 10}
+YEAR_COLORS = {
+    'backgroundColor': [
+        'rgba(255, 99, 132, 0.2)',
+        'rgba(255, 159, 64, 0.2)',
+        'rgba(255, 205, 86, 0.2)',
+        'rgba(75, 192, 192, 0.2)',
+        'rgba(54, 162, 235, 0.2)',
+        'rgba(153, 102, 255, 0.2)',
+        'rgba(201, 203, 207, 0.2)'
+    ],
+    'borderColor': [
+        'rgb(255, 99, 132)',
+        'rgb(255, 159, 64)',
+        'rgb(255, 205, 86)',
+        'rgb(75, 192, 192)',
+        'rgb(54, 162, 235)',
+        'rgb(153, 102, 255)',
+        'rgb(201, 203, 207)'
+    ],
+    'borderWidth': 1
+}
+
+
+def chart_options(legend=None, **options):
+    return dict(options, plugins={
+        'legend': dict(legend or {}, labels=LEGEND_LABELS),
+        'tooltip': TOOLTIP,
+        'title': TITLE,
+    })
+
+
+# тип графика, общие свойства всех его рядов, options без текста заголовка
+CHART_CONFIG = {
+    'last_year': {'type': 'bar', 'dataset': {}, 'options': chart_options()},
+    'last_n_years': {'type': 'bar', 'dataset': {}, 'options': chart_options()},
+    'total_for_each_ticker': {'type': 'doughnut', 'dataset': {'hoverOffset': 8},
+                              'options': chart_options({'display': 0})},
+    'total_for_each_account': {'type': 'polarArea', 'dataset': {'hoverOffset': 8}, 'options': chart_options()},
+    'dividend_history': {'type': 'bar', 'dataset': {}, 'options': chart_options({'display': 0})},
+    'total_for_each_year': {'type': 'bar', 'dataset': YEAR_COLORS, 'options': chart_options({'display': 0})},
+    # у счетов разные даты отчетов: пропуски (null) соединяются линией
+    'all_reports': {'type': 'line', 'dataset': dict(POINTS, spanGaps=True),
+                    'options': chart_options({'display': 1, 'position': 'top'}, responsive=1)},
+    'report_in_currency': {'type': 'line', 'dataset': POINTS,
+                           'options': chart_options({'display': 0, 'position': 'top'}, responsive=1)},
+}
+
+CHART_CONFIG_JSON = json.dumps({'version': CHART_CONFIG_VERSION, 'charts': CHART_CONFIG})
+
+
+# полный конфиг Chart.js из статической части и данных графика (то же делает drawChart в браузере)
+def expand_chart(name, payload):
+    config = CHART_CONFIG[name]
+    plugins = config['options']['plugins']
+    return {
+        'type': config['type'],
+        'data': {
+            'labels': payload['labels'],
+            'datasets': [dict(config['dataset'], **series) for series in payload['series']],
+        },
+        'options': dict(config['options'], plugins=dict(plugins, title=dict(plugins['title'], text=payload['title']))),
+    }
+
+
+# Данные графиков: подписи, ряды значений по подписям и заголовок ##########
+
+# series - список пар (название ряда, значения)
+def chart_data(labels, series, title):
+    return {
+        'labels': labels,
+        'series': [{'label': label, 'data': data} for label, data in series],
+        'title': title,
+    }
+
+
+def last_year_chart(currency, labels, data):
+    return chart_data(labels, [('Дивиденды за последний год в ' + currency, data)],
+                      f'Дивиденды за последний год в {currency}')
+
+
+# datasets - список пар (год или None если выплат не было, данные по месяцам)
+def last_n_years_chart(currency, labels, datasets):
+    return chart_data(labels, [('Нет дивидендов' if year is None else f'Дивиденды за {year} год в {currency}', data)
+                               for year, data in datasets],
+                      f'Дивиденды за последние {len(datasets)} г. в {currency}')
+
+
+def total_for_each_ticker_chart(currency, labels, data):
+    return chart_data(labels, [(f'Всего в  {currency}', data)], f'Дивиденды по компаниям в {currency}')
+
+
+def total_for_each_account_chart(currency, labels, data):
+    return chart_data(labels, [(f'Всего в  {currency}', data)], f'Дивиденды на счетах в {currency}')
+
+
+def dividend_history_chart(limit, labels, data):
+    return chart_data(labels, [('выплата', data)], f'Дивиденды, последние {limit} выплат')
+
+
+def total_for_each_year_chart(currency, labels, data):
+    return chart_data(labels, [('Дивиденды в ' + currency, data)], f'Дивиденды в {currency}')
+
+
+# accounts - список пар (название счета, {метка: сумма}), labels - все метки по порядку дат;
+# у счета без отчета на дату - null
+def all_reports_chart(currency, accounts, labels):
+    return chart_data(labels, [(name, [data.get(label) for label in labels]) for name, data in accounts],
+                      f'Отчеты в {currency}')
+
+
+# data - {метка: сумма} по порядку дат
+def report_in_currency_chart(currency, data):
+    return chart_data(list(data), [(currency, list(data.values()))], f'Отчет в {currency}')
+
+
+# метка точки на графике отчетов, например 'January - 2023'
+def report_label(report_date):
+    return f"{month_name(report_date)} - {report_date.year}"
+
+
+# раскладывает строки отчетов (упорядоченные по дате) по счетам и по валютам
+# за один проход; счета различаются по id, а не по названию.
+# base - строки уже пересчитаны в базовую валюту и складываются в одну
+def group_reports(rows, base=None):
+    by_account = OrderedDict()
+    by_date = OrderedDict()
+    for r in rows:
+        currency = base or r['currency__name']
+        key = (currency, r['account_id'])
+        if key not in by_account:
+            by_account[key] = (r['account__name'], {})
+        # за одну дату у счета берется последний отчет в каждой валюте
+        by_account[key][1].setdefault(r['report_date'], {})[r['currency__name']] = r['value']
+
+        date_key = (currency, r['report_date'])
+        by_date[date_key] = by_date.get(date_key, 0) + (r['value'] or 0)
+
+    accounts = {}
+    for (currency, _), (name, dates) in by_account.items():
+        data = {report_label(d): sum(v or 0 for v in values.values()) for d, values in dates.items()}
+        accounts.setdefault(currency, []).append((name, data))
+
+    totals = {}
+    for (currency, report_date), total in by_date.items():
+        totals.setdefault(currency, {})[report_label(report_date)] = total
+    return accounts, totals
+
+
+# помесячный ряд за несколько лет -> список пар (год или None если выплат не было, 12 значений)
+def last_n_years_datasets(buckets, data):
+    res = []
+    for i in range(0, len(buckets), 12):
+        chunk = data[i:i + 12]
+        res.append((buckets[i].year if any(chunk) else None, chunk))
+    return res
+
+
+# все дивидендные графики одной валюты из строк сводки, сгруппированных по
+# (месяц, компания, счет); last_year - сумма за последние 12 месяцев
+def dividend_charts(currency, rows, today, for_n_years=3):
+    by_ticker = {}
+    by_account = {}
+    for r in rows:
+        # в пересчете по курсу сумма валюты без единого курса - None
+        by_ticker[r['company__name']] = by_ticker.get(r['company__name'], 0) + (r['total'] or 0)
+        by_account[r['account__name']] = by_account.get(r['account__name'], 0) + (r['total'] or 0)
+
+    months = [{'bucket': r['month'], 'value': r['total']} for r in rows]
+    last = [{'bucket': r['month'], 'value': r['last_year']} for r in rows if r['last_year']]
+    year_buckets, by_year = densify(months, 'year', end=today)
+    last_buckets, last_year = densify(last, 'month', last_year_start(), today)
+    n_buckets, by_month = densify(months, 'month', date(today.year - (for_n_years - 1), 1, 1),
+                                  date(today.year, 12, 31))
+
+    tickers = sorted(by_ticker)
+    accounts = sorted(by_account)
+    return {
+        'total_for_each_year': total_for_each_year_chart(currency, [b.year for b in year_buckets], by_year[()]),
+        'last_year': last_year_chart(currency, [month_name(b) for b in last_buckets], last_year[()]),
+        'last_n_years': last_n_years_chart(currency, get_month_list(),
+                                           last_n_years_datasets(n_buckets, by_month[()])),
+        'total_for_each_ticker': total_for_each_ticker_chart(currency, tickers, [by_ticker[t] for t in tickers]),
+        'total_for_each_account': total_for_each_account_chart(currency, accounts,
+                                                               [by_account[a] for a in accounts]),
+    }
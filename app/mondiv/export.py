@@ -0,0 +1,58 @@
+import csv
+
+from mondiv.pagination import keyset_batches
+from mondiv.queries import dividend_listing, report_listing
+from mondiv.responses import dumps
+
+# тип выгрузки: (запрос по пользователю и фильтрам, поле даты, [(колонка, поле)])
+EXPORTS = {
+    'dividends': (dividend_listing, 'date_of_receipt', [
+        ('id', 'id'),
+        ('date', 'date_of_receipt'),
+        ('ticker', 'company__ticker'),
+        ('company', 'company__name'),
+        ('currency', 'currency__name'),
+        ('account', 'account__name'),
+        ('payoff', 'payoff'),
+    ]),
+    'reports': (report_listing, 'report_date', [
+        ('id', 'id'),
+        ('date', 'report_date'),
+        ('currency', 'currency__name'),
+        ('account', 'account__name'),
+        ('amount', 'amount'),
+    ]),
+}
+FORMATS = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+
+# файлоподобный объект для csv.writer: возвращает строку вместо записи
+class Echo:
+    def write(self, value):
+        return value
+
+
+# строки выгрузки как словари {колонка: значение}, порциями по chunk_size
+def export_rows(user, kind, filters=None, chunk_size=2000):
+    listing, date_field, columns = EXPORTS[kind]
+    queryset = listing(user, filters).values(*[field for _, field in columns])
+    for row in keyset_batches(queryset, date_field, chunk_size):
+        yield {name: row[field] for name, field in columns}
+
+
+def csv_lines(kind, rows):
+    writer = csv.writer(Echo())
+    columns = [name for name, _ in EXPORTS[kind][2]]
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow([row[c] for c in columns])
+
+
+def ndjson_lines(kind, rows):
+    for row in rows:
+        yield dumps(row).decode() + '\n'
+
+
+def export_lines(user, kind, fmt, filters=None, chunk_size=2000):
+    rows = export_rows(user, kind, filters, chunk_size)
+    return csv_lines(kind, rows) if fmt == 'csv' else ndjson_lines(kind, rows)
@@ -1,16 +1,55 @@
+import re
+
 from bootstrap_datepicker_plus.widgets import DatePickerInput
 from django import forms
 from django.contrib.auth.models import User
+from django.urls import reverse_lazy
+
+from mondiv.autocomplete import company_labels
+from mondiv.cache import form_choices
+from mondiv.models import Account, Company, Dividend, Report
+
+# тикер: латиница, цифры, точка и дефис (BRK.B, RDS-A), не длиннее поля Company.ticker
+TICKER_RE = re.compile(r'[A-Z0-9.\-]+')
+TICKER_MAX_LENGTH = Company._meta.get_field('ticker').max_length
+
+
+def valid_ticker(ticker):
+    return len(ticker) <= TICKER_MAX_LENGTH and TICKER_RE.fullmatch(ticker) is not None
+
+
+# выбор компании поиском (select2 + /company_autocomplete/): в html только выбранная компания,
+# а не весь каталог
+class CompanyAutocompleteWidget(forms.Select):
+    def __init__(self, attrs=None):
+        super().__init__(attrs={'class': 'form-select company-autocomplete',
+                                'data-autocomplete-url': reverse_lazy('mondiv:company_autocomplete'),
+                                **(attrs or {})})
+
+    def optgroups(self, name, value, attrs=None):
+        labels = company_labels([int(v) for v in value if str(v).isdigit()])
+        options = [self.create_option(name, pk, label, True, i) for i, (pk, label) in enumerate(labels.items())]
+        return [(None, options, 0)]
+
 
-from mondiv.models import Dividend, Company, Report
+# счет и валюта для форм пользователя: выбор только из своих счетов,
+# варианты берутся из кэша пользователя (mondiv.cache.form_choices), а не из базы
+class UserChoicesMixin:
+    def __init__(self, *args, user=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['account'].queryset = Account.objects.filter(user=user)
+        choices = form_choices(user.pk)
+        for name in ('account', 'currency'):
+            field = self.fields[name]
+            field.choices = ([('', field.empty_label)] if field.empty_label is not None else []) + choices[name]
 
 
-class AddDividendForm(forms.ModelForm):
+class AddDividendForm(UserChoicesMixin, forms.ModelForm):
     class Meta:
         model=Dividend
         fields = ('company','date_of_receipt', 'payoff', 'currency','account')
         widgets = {
-            'company': forms.Select(attrs={'class': 'form-select'}),
+            'company': CompanyAutocompleteWidget(),
             'date_of_receipt': DatePickerInput(format='%dd:%mm:%YYYY', attrs={'class': 'form-control'}),
             # 'amount_of_shares': forms.NumberInput(attrs={'class': 'form-control'}),
             # 'quantity_per_share': forms.NumberInput(attrs={'class': 'form-control'}),
@@ -21,12 +60,56 @@ class AddDividendForm(forms.ModelForm):
 
 
 class SearchCompanyForm(forms.Form):
-    ticker = forms.CharField(max_length=10, label='Тикер')
+    ticker = forms.CharField(max_length=TICKER_MAX_LENGTH, label='Тикер')
+
+    def clean_ticker(self):
+        ticker = self.cleaned_data['ticker'].strip().upper()
+        if not valid_ticker(ticker):
+            raise forms.ValidationError(f'Неверный тикер: {ticker}')
+        return ticker
+
+
+class BatchCompanyForm(forms.Form):
+    tickers = forms.CharField(label='Тикеры', help_text='через пробел, запятую или с новой строки, до 50 штук',
+                              widget=forms.Textarea(attrs={'class': 'form-control', 'rows': 4}))
+
+    def clean_tickers(self):
+        tickers = [t.upper() for t in re.split(r'[\s,;]+', self.cleaned_data['tickers']) if t]
+        invalid = [t for t in tickers if not valid_ticker(t)]
+        if invalid:
+            raise forms.ValidationError('Неверные тикеры: ' + ', '.join(invalid))
+        if not tickers:
+            raise forms.ValidationError('Укажите хотя бы один тикер')
+        if len(set(tickers)) > 50:
+            raise forms.ValidationError('Не больше 50 тикеров за раз')
+        return tickers
+
+
+# фильтры списков выплат и отчетов, все поля необязательные
+class ReportFilterForm(forms.Form):
+    account = forms.CharField(max_length=100, required=False, label='Счет',
+                              widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'счет'}))
+    currency = forms.CharField(max_length=5, required=False, label='Валюта',
+                               widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'валюта'}))
+    start = forms.DateField(required=False, widget=DatePickerInput(format='%dd:%mm:%YYYY', attrs={'class': 'form-control', 'placeholder': 'start'}))
+    end = forms.DateField(required=False, widget=DatePickerInput(format='%dd:%mm:%YYYY', attrs={'class': 'form-control', 'placeholder': 'end'}))
+    min_amount = forms.FloatField(required=False, label='Сумма от',
+                                  widget=forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'от'}))
+    max_amount = forms.FloatField(required=False, label='Сумма до',
+                                  widget=forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'до'}))
+
+
+class DividendFilterForm(ReportFilterForm):
+    ticker = forms.CharField(max_length=10, required=False, label='Тикер',
+                             widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'тикер'}))
 
 
-class DividendPeriodForm(forms.Form):
-    start = forms.DateField(widget=DatePickerInput(format='%dd:%mm:%YYYY', attrs={'class': 'form-control', 'placeholder': 'start'}))
-    end = forms.DateField(widget=DatePickerInput(format='%dd:%mm:%YYYY', attrs={'class': 'form-control', 'placeholder': 'end'}))
+class ImportForm(forms.Form):
+    kind = forms.ChoiceField(choices=(('dividends', 'Дивиденды'), ('reports', 'Отчеты')), label='Что загружаем',
+                             widget=forms.Select(attrs={'class': 'form-select'}))
+    file = forms.FileField(label='Файл csv или json',
+                           help_text='колонки: date, ticker, currency, account, payoff для дивидендов; '
+                                     'date, currency, account, amount для отчетов')
 
 
 class ChangeUserInfoForm(forms.ModelForm):
@@ -35,7 +118,7 @@ class ChangeUserInfoForm(forms.ModelForm):
         fields = ('username', 'email', 'first_name', 'last_name')
 
 
-class AddReportForm(forms.ModelForm):
+class AddReportForm(UserChoicesMixin, forms.ModelForm):
     class Meta:
         model=Report
         fields = ('account','currency', 'report_date', 'amount')
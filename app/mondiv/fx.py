@@ -0,0 +1,74 @@
+from django.db import transaction
+from django.db.models import Case, When, F, FloatField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from mondiv.cache import bump_fx_version
+from mondiv.imports import parse_date, parse_amount
+from mondiv.models import Currency, FxRate
+
+
+# курс из валюты строки в base на дату строки: ближайший предыдущий,
+# а для дат раньше первого известного курса - самый ранний
+def rate_expression(base, date_field, currency_field='currency'):
+    rates = FxRate.objects.filter(currency=OuterRef(currency_field), base__name=base)
+    return Coalesce(
+        Subquery(rates.filter(date__lte=OuterRef(date_field)).order_by('-date').values('rate')[:1]),
+        Subquery(rates.order_by('date').values('rate')[:1]),
+    )
+
+
+# сумма строки в base, считается в самом запросе; строки в base не пересчитываются,
+# строки без единого курса дают NULL и в Sum не попадают - такие валюты ответы
+# перечисляют в missing_rates (mondiv.queries.missing_rates)
+def in_base(value_field, date_field, base, currency_field='currency'):
+    return Case(
+        When(**{f'{currency_field}__name': base}, then=F(value_field)),
+        default=F(value_field) * rate_expression(base, date_field, currency_field),
+        output_field=FloatField(),
+    )
+
+
+# строки одной валюты как есть или, если задана base, всех валют в пересчете в base;
+# возвращает (queryset, выражение суммы)
+def currency_scope(queryset, currency, value_field, date_field, base=None):
+    if base:
+        return queryset, in_base(value_field, date_field, base)
+    return queryset.filter(currency__name=currency), F(value_field)
+
+
+# загрузка курсов пачкой из строк {'date', 'currency', 'base', 'rate'}; вместе с курсом
+# сохраняется обратный, курсы на те же даты заменяются.
+# возвращает {'loaded': n, 'errors': [(номер строки, сообщение)]}
+def load_rates(rows, batch_size=1000):
+    currencies = dict(Currency.objects.values_list('name', 'id'))
+    rates, errors = {}, []
+    # первая строка csv - заголовок, поэтому данные нумеруются с 2
+    for line, r in enumerate(rows, start=2):
+        r = {k.strip().lower(): v for k, v in r.items() if k}
+        try:
+            day = parse_date(str(r.get('date') or ''))
+            rate = parse_amount(r.get('rate'))
+            currency, base = (str(r.get(f) or '').strip().upper() for f in ('currency', 'base'))
+            for name in (currency, base):
+                if name not in currencies:
+                    raise ValueError(f'неизвестная валюта "{name}"')
+            if currency == base or rate <= 0:
+                raise ValueError(f'неверный курс {currency}/{base} {rate}')
+        except ValueError as e:
+            errors.append((line, str(e)))
+            continue
+        rates[(currencies[currency], currencies[base], day)] = rate
+        rates[(currencies[base], currencies[currency], day)] = 1 / rate
+
+    days = {}
+    for currency_id, base_id, day in rates:
+        days.setdefault((currency_id, base_id), []).append(day)
+    with transaction.atomic():
+        for (currency_id, base_id), pair_days in days.items():
+            FxRate.objects.filter(currency_id=currency_id, base_id=base_id, date__in=pair_days).delete()
+        FxRate.objects.bulk_create((FxRate(currency_id=c, base_id=b, date=d, rate=rate)
+                                    for (c, b, d), rate in rates.items()), batch_size=batch_size)
+        # bulk_create не вызывает сигналы: пересчитанные графики в кэше устаревают здесь
+        if rates:
+            transaction.on_commit(bump_fx_version)
+    return {'loaded': len(rates), 'errors': errors}
@@ -0,0 +1,70 @@
+import logging
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db.models import Max
+from django.utils import timezone
+
+from mondiv.models import DividendHistory, DividendHistorySync
+from mondiv.providers import PROVIDERS, ProviderError, first_useful
+
+logger = logging.getLogger(__name__)
+
+# сколько локальная история тикера считается свежей
+HISTORY_TTL = timedelta(hours=12)
+# после ошибки источника тикер не синхронизируется при просмотре страницы столько времени:
+# во время сбоя запросы не ждут MARKET_DATA_DEADLINE каждый раз и не забивают пул источников
+HISTORY_RETRY_AFTER = timedelta(minutes=10)
+
+
+def failed_key(ticker):
+    return f'mondiv:history:failed:{ticker}'
+
+
+# дописывает в таблицу только выплаты новее последней сохраненной;
+# источник тикера определяется один раз: Polygon, а если там пусто - MOEX
+def sync_ticker(ticker):
+    ticker = ticker.strip().upper()
+    # пустой тикер - запрос всей ленты выплат источника
+    if not ticker:
+        return 0
+    state = DividendHistorySync.objects.filter(ticker=ticker).first()
+    since = DividendHistory.objects.filter(ticker=ticker).aggregate(last=Max('ex_dividend_date'))['last']
+    source = state.source if state and state.source else None
+
+    # пока источник не известен, Polygon и MOEX опрашиваются параллельно, Polygon в приоритете
+    providers = [p for p in PROVIDERS if p.name == source] or PROVIDERS
+    found = first_useful('dividends', ticker, since, providers=providers)
+    rows = []
+    if found:
+        provider, payouts = found
+        source = provider.name
+        rows = [DividendHistory(ticker=ticker, source=source, **r) for r in payouts]
+
+    DividendHistory.objects.bulk_create(rows, ignore_conflicts=True)
+    DividendHistorySync.objects.update_or_create(ticker=ticker, defaults={
+        'synced_at': timezone.now(), 'source': source or ''})
+    return len(rows)
+
+
+def is_fresh(ticker):
+    return DividendHistorySync.objects \
+        .filter(ticker=ticker.upper(), synced_at__gte=timezone.now() - HISTORY_TTL) \
+        .exists()
+
+
+# последние limit выплат по возрастанию даты; устаревшая история сначала дополняется,
+# при недоступности источника отдается то, что уже есть, а попытка запоминается на HISTORY_RETRY_AFTER
+def history_rows(ticker, limit):
+    ticker = ticker.upper()
+    if not is_fresh(ticker) and cache.get(failed_key(ticker)) is None:
+        try:
+            sync_ticker(ticker)
+        except ProviderError as e:
+            logger.warning('dividend history sync failed for %s: %s', ticker, e)
+            cache.set(failed_key(ticker), timezone.now(), HISTORY_RETRY_AFTER.total_seconds())
+    rows = DividendHistory.objects \
+        .filter(ticker=ticker) \
+        .order_by('-ex_dividend_date') \
+        .values_list('ex_dividend_date', 'cash_amount')[:limit]
+    return list(reversed(rows))
@@ -0,0 +1,158 @@
+import csv
+import hashlib
+import io
+import json
+from datetime import datetime
+
+from django.db import transaction
+
+from mondiv.cache import bump_data_version
+from mondiv.models import Account, Company, Currency, Dividend, Report
+from mondiv.rollup import add_dividends
+from mondiv.signals import touch_user_data
+
+# тип загрузки: (модель, поле даты, поле суммы, нужен ли тикер)
+IMPORTS = {
+    'dividends': (Dividend, 'date_of_receipt', 'payoff', True),
+    'reports': (Report, 'report_date', 'amount', False),
+}
+DATE_FORMATS = ('%Y-%m-%d', '%d.%m.%Y', '%d/%m/%Y')
+
+
+def parse_date(value):
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value.strip(), fmt).date()
+        except ValueError:
+            pass
+    raise ValueError(f'неверная дата "{value}"')
+
+
+def parse_amount(value):
+    try:
+        return float(str(value).replace(' ', '').replace(',', '.'))
+    except ValueError:
+        raise ValueError(f'неверная сумма "{value}"')
+
+
+# строки файла как словари: csv с заголовком, json-массив объектов или ndjson (формат выгрузки)
+def read_rows(file):
+    text = file.read()
+    if isinstance(text, bytes):
+        text = text.decode('utf-8-sig')
+    stripped = text.lstrip()
+    if stripped.startswith('['):
+        rows = json.loads(stripped)
+    elif stripped.startswith('{'):
+        rows = [json.loads(line) for line in stripped.splitlines() if line.strip()]
+    else:
+        return list(csv.DictReader(io.StringIO(text)))
+    if not isinstance(rows, list) or not all(isinstance(r, dict) for r in rows):
+        raise ValueError('ожидается список объектов')
+    return rows
+
+
+# естественный ключ записи в виде хэша; по нему ищутся дубли в файле и в базе
+def natural_key(kind, user_id, company_id, account_id, currency_id, day, amount):
+    raw = f'{kind}|{user_id}|{company_id}|{account_id}|{currency_id}|{day.isoformat()}|{amount:.4f}'
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+# строка файла с ключами в нижнем регистре и значениями-строками; в json значением может
+# оказаться список или объект - такая строка считается ошибочной
+def clean_row(row):
+    res = {}
+    for k, v in row.items():
+        if not k:
+            continue
+        if isinstance(v, (list, dict)):
+            raise ValueError(f'неверное значение поля "{k}"')
+        res[k.strip().lower()] = '' if v is None else str(v).strip()
+    return res
+
+
+# загрузка выплат или отчетов пользователя одной транзакцией;
+# возвращает {'created': n, 'duplicates': n, 'errors': [(номер строки, сообщение)]}
+def import_rows(user, kind, rows, batch_size=500):
+    model, date_field, amount_field, with_ticker = IMPORTS[kind]
+    errors = []
+    cleaned = []
+    # первая строка csv - заголовок, поэтому данные нумеруются с 2
+    for line, r in enumerate(rows, start=2):
+        try:
+            cleaned.append((line, clean_row(r)))
+        except ValueError as e:
+            errors.append((line, str(e)))
+    rows = [r for _, r in cleaned]
+
+    # справочники - один запрос на каждый, по всем различным значениям из файла
+    currencies = dict(Currency.objects
+                      .filter(name__in={r.get('currency', '').upper() for r in rows})
+                      .values_list('name', 'id'))
+    accounts = dict(Account.objects
+                    .filter(user=user, name__in={r.get('account') for r in rows})
+                    .values_list('name', 'id'))
+    companies = {}
+    if with_ticker:
+        companies = dict(Company.objects
+                         .filter(ticker__in={r.get('ticker', '').upper() for r in rows})
+                         .values_list('ticker', 'id'))
+
+    parsed = []
+    for line, r in cleaned:
+        try:
+            day = parse_date(r.get('date') or r.get(date_field) or '')
+            amount = parse_amount(r[amount_field] if amount_field in r else r.get('amount'))
+            currency = r.get('currency', '').upper()
+            if currency not in currencies:
+                raise ValueError(f'неизвестная валюта "{currency}"')
+            if r.get('account') not in accounts:
+                raise ValueError(f'нет счета "{r.get("account")}"')
+            company_id = None
+            if with_ticker:
+                ticker = r.get('ticker', '').upper()
+                if ticker not in companies:
+                    raise ValueError(f'нет компании с тикером "{ticker}"')
+                company_id = companies[ticker]
+        except ValueError as e:
+            errors.append((line, str(e)))
+            continue
+        parsed.append((company_id, accounts[r['account']], currencies[currency], day, amount))
+    errors.sort()
+
+    created = duplicates = 0
+    if parsed:
+        # ключи уже загруженных записей только за период файла
+        days = [p[3] for p in parsed]
+        fields = ('account_id', 'currency_id', date_field, amount_field)
+        if with_ticker:
+            fields = ('company_id',) + fields
+        existing = model.objects \
+            .filter(user=user, **{f'{date_field}__range': [min(days), max(days)]}) \
+            .values_list(*fields)
+        seen = {natural_key(kind, user.id, *(e if with_ticker else (None,) + e)) for e in existing.iterator()}
+
+        objs = []
+        for company_id, account_id, currency_id, day, amount in parsed:
+            key = natural_key(kind, user.id, company_id, account_id, currency_id, day, amount)
+            if key in seen:
+                duplicates += 1
+                continue
+            seen.add(key)
+            values = {'user': user, 'account_id': account_id, 'currency_id': currency_id,
+                      date_field: day, amount_field: amount}
+            if with_ticker:
+                values['company_id'] = company_id
+            objs.append(model(**values))
+
+        if objs:
+            # bulk_create не вызывает сигналы: сводку (только затронутые месяцы) и отметку изменений обновляем сами
+            with transaction.atomic():
+                model.objects.bulk_create(objs, batch_size=batch_size)
+                if model is Dividend:
+                    add_dividends(objs)
+                touch_user_data(user.id)
+                transaction.on_commit(lambda: bump_data_version(user.id))
+        created = len(objs)
+
+    return {'created': created, 'duplicates': duplicates, 'errors': errors}
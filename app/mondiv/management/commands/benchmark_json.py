@@ -0,0 +1,81 @@
+import gzip
+import json
+import random
+from datetime import date
+from time import perf_counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.timezone import now
+
+from mondiv.charts import dividend_charts, all_reports_chart, report_in_currency_chart, group_reports, expand_chart
+from mondiv.responses import dumps, orjson, brotli
+
+
+# ответ dashboard по синтетической сводке: years лет, companies компаний, accounts счетов, две валюты
+def synthetic_dashboard(years, companies, accounts, compact):
+    rnd = random.Random(1)
+    today = date.today()
+    res = {}
+    for currency in ('USD', 'RUB'):
+        rows, reports = [], []
+        for year in range(today.year - years + 1, today.year + 1):
+            for month in range(1, 13):
+                for c in rnd.sample(range(companies), min(companies, 10)):
+                    total = round(rnd.uniform(1, 500), 2)
+                    rows.append({'month': date(year, month, 1), 'company__name': f'Компания {c}',
+                                 'account__name': f'Счет {c % accounts}', 'total': total, 'last_year': total})
+                for a in range(accounts):
+                    reports.append({'currency__name': currency, 'account_id': a, 'account__name': f'Счет {a}',
+                                    'report_date': date(year, month, 28), 'value': round(rnd.uniform(1e3, 1e5), 2)})
+        charts = dividend_charts(currency, rows, today, years)
+        by_account, totals = group_reports(reports)
+        charts['all_reports'] = all_reports_chart(currency, by_account[currency], list(totals[currency]))
+        charts['report_in_currency'] = report_in_currency_chart(currency, totals[currency])
+        if not compact:
+            charts = {name: expand_chart(name, chart) for name, chart in charts.items()}
+        res[currency] = charts
+    res['generated'] = now()
+    return res
+
+
+def timed(func, repeat):
+    start = perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return result, (perf_counter() - start) / repeat * 1000
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает сериализацию json (stdlib и orjson) и сжатие (gzip, brotli) большого ответа dashboard'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--years', type=int, default=20)
+        parser.add_argument('--companies', type=int, default=200)
+        parser.add_argument('--accounts', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--compact', action='store_true', help='данные без статической части графиков')
+
+    def handle(self, *args, **options):
+        data = synthetic_dashboard(options['years'], options['companies'], options['accounts'], options['compact'])
+        repeat = options['repeat']
+
+        # как раньше в JsonResponse: DjangoJSONEncoder, ensure_ascii
+        stdlib, stdlib_ms = timed(lambda: json.dumps(data, cls=DjangoJSONEncoder).encode(), repeat)
+        fast, fast_ms = timed(lambda: dumps(data), repeat)
+        self.stdout.write(f'json stdlib:  {stdlib_ms:8.2f} мс  {len(stdlib):>9} байт')
+        self.stdout.write(f'json {"orjson" if orjson else "stdlib*"}:  {fast_ms:8.2f} мс  {len(fast):>9} байт  '
+                          f'(в {stdlib_ms / fast_ms:.1f} раза быстрее)')
+
+        level = settings.COMPRESS_GZIP_LEVEL
+        body, gzip_ms = timed(lambda: gzip.compress(fast, compresslevel=level, mtime=0), repeat)
+        self.stdout.write(f'gzip {level}:      {gzip_ms:8.2f} мс  {len(body):>9} байт  '
+                          f'({len(body) / len(stdlib) * 100:.1f}% от исходного)')
+        if brotli is not None:
+            quality = settings.COMPRESS_BROTLI_QUALITY
+            body, br_ms = timed(lambda: brotli.compress(fast, quality=quality), repeat)
+            self.stdout.write(f'brotli {quality}:    {br_ms:8.2f} мс  {len(body):>9} байт  '
+                              f'({len(body) / len(stdlib) * 100:.1f}% от исходного)')
+        else:
+            self.stdout.write('brotli не установлен')
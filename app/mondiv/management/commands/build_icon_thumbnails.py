@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from mondiv.models import Company
+
+
+class Command(BaseCommand):
+    help = 'Строит уменьшенные копии иконок компаний, у которых их еще нет'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='пересобрать для всех компаний с иконкой')
+
+    def handle(self, *args, **options):
+        companies = Company.objects.exclude(icon_image='').exclude(icon_image=None)
+        if not options['force']:
+            companies = companies.filter(icon_hash='')
+        done = failed = 0
+        for company in companies.iterator():
+            try:
+                company.update_thumbnails()
+            except OSError as e:
+                failed += 1
+                self.stdout.write(self.style.ERROR(f'{company.ticker}: {e}'))
+                continue
+            if company.icon_hash:
+                done += 1
+            else:
+                failed += 1
+                self.stdout.write(self.style.ERROR(f'{company.ticker}: не удалось прочитать иконку'))
+        self.stdout.write(self.style.SUCCESS(f'Готово: {done}, ошибок: {failed}'))
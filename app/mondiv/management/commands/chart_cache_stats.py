@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from mondiv.cache import cache_stats, reset_cache_stats
+
+
+class Command(BaseCommand):
+    help = 'Показывает счетчики попаданий и промахов кэша графиков всех воркеров ' \
+           '(воркеры присылают их раз в METRICS_FLUSH_INTERVAL секунд)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='обнулить счетчики')
+
+    def handle(self, *args, **options):
+        stats = cache_stats()
+        total = stats['hits'] + stats['misses']
+        ratio = stats['hits'] / total * 100 if total else 0
+        self.stdout.write(f"попаданий: {stats['hits']}, промахов: {stats['misses']}, доля попаданий: {ratio:.1f}%")
+        if options['reset']:
+            reset_cache_stats()
+            self.stdout.write('счетчики обнулены')
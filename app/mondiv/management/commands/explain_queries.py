@@ -0,0 +1,114 @@
+import re
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from mondiv.models import Company, Dividend, Report, MonthlyDividend
+from mondiv.queries import dividend_totals, dashboard_dividends, report_rows, report_totals, profile_stats, \
+    dividend_listing, report_listing, company_dividends
+from mondiv.pagination import after_position, PAGE_SIZE
+from mondiv.series import dividend_series_rows
+from mondiv.utils import last_year_start
+
+# таблицы, полный просмотр которых недопустим; справочники (валюты, компании) небольшие
+CHECKED_TABLES = {Dividend._meta.db_table, Report._meta.db_table, MonthlyDividend._meta.db_table}
+SUBQUERY_ALIAS = re.compile(r'^U\d+$')
+
+
+def chart_and_list_queries(user, currency):
+    today = date.today()
+    company = Company.objects.filter(dividend__user=user).first() or Company.objects.first()
+    queries = [
+        ('last_year', dividend_series_rows(user, currency, 'month', last_year_start(), today)),
+        ('last_n_years', dividend_series_rows(user, currency, 'month', date(today.year - 2, 1, 1), today)),
+        ('total_for_each_year', dividend_series_rows(user, currency, 'year')),
+        ('weekly_series', dividend_series_rows(user, currency, 'week', date(today.year, 1, 1), today)),
+        ('total_for_each_ticker', dividend_totals(user, currency, 'company__name')),
+        ('total_for_each_account', dividend_totals(user, currency, 'account__name')),
+        ('all_reports', report_rows(user, [currency])),
+        ('report_in_currency', report_totals(user, currency)),
+        ('dashboard_dividends', dashboard_dividends(user, [currency])),
+        ('dashboard_reports', report_rows(user, [currency])),
+        # все валюты в пересчете в currency по курсу (?base_currency=)
+        ('last_n_years_base', dividend_series_rows(user, currency, 'month', date(today.year - 2, 1, 1), today,
+                                                   base=currency)),
+        ('weekly_series_base', dividend_series_rows(user, currency, 'week', date(today.year, 1, 1), today,
+                                                    base=currency)),
+        ('dashboard_dividends_base', dashboard_dividends(user, [currency], currency)),
+        ('dashboard_reports_base', report_rows(user, [currency], currency)),
+        ('profile', profile_stats(user)),
+        ('dividends_received', after_position(dividend_listing(user), 'date_of_receipt')[:PAGE_SIZE + 1]),
+        ('dividends_received_next', after_position(dividend_listing(user), 'date_of_receipt',
+                                                   (today, 1000))[:PAGE_SIZE + 1]),
+        ('dividends_received_period', after_position(dividend_listing(user, {'start': date(today.year, 1, 1),
+                                                                            'end': today}),
+                                                     'date_of_receipt')[:PAGE_SIZE + 1]),
+        ('report_list', after_position(report_listing(user), 'report_date')[:PAGE_SIZE + 1]),
+        ('report_list_next', after_position(report_listing(user), 'report_date', (today, 1000))[:PAGE_SIZE + 1]),
+    ]
+    if company:
+        queries.append(('company', company_dividends(user, company)))
+    return queries
+
+
+# полные просмотры проверяемых таблиц в плане запроса
+def full_scans(queryset):
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            plan = [row[-1] for row in cursor.fetchall()]
+            # 'SCAN mondiv_dividend' или 'SCAN TABLE mondiv_dividend AS U0' (старые версии sqlite);
+            # 'SEARCH ... USING INDEX' и просмотр покрывающего индекса допустимы
+            scans = [line for line in plan
+                     if line.split()[0] == 'SCAN' and 'COVERING INDEX' not in line
+                     and (line.replace('SCAN TABLE ', 'SCAN ').split()[1] in CHECKED_TABLES
+                          or SUBQUERY_ALIAS.match(line.replace('SCAN TABLE ', 'SCAN ').split()[1]))]
+        elif connection.vendor == 'mysql':
+            cursor.execute('EXPLAIN ' + sql, params)
+            columns = [c[0] for c in cursor.description]
+            rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+            plan = [f"{r['table']}: type={r['type']} key={r['key']} rows={r['rows']} {r['Extra'] or ''}"
+                    for r in rows]
+            # таблицы подзапросов mysql показывает под алиасами Django (U0, U1...), их тоже проверяем
+            scans = [line for r, line in zip(rows, plan)
+                     if r['type'] == 'ALL' and (r['table'] in CHECKED_TABLES or SUBQUERY_ALIAS.match(r['table']))]
+        else:
+            raise CommandError(f'EXPLAIN для {connection.vendor} не поддерживается, только sqlite и mysql')
+    return plan, scans
+
+
+class Command(BaseCommand):
+    help = 'Выполняет EXPLAIN для запросов графиков и списков, ошибка при полном просмотре таблицы'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help='id пользователя, по умолчанию первый пользователь')
+        parser.add_argument('--currency', default='USD')
+        parser.add_argument('--plan', action='store_true', help='печатать план каждого запроса')
+
+    def handle(self, *args, **options):
+        if options['user']:
+            user = User.objects.get(pk=options['user'])
+        else:
+            user = User.objects.order_by('pk').first()
+        if user is None:
+            raise CommandError('В базе нет пользователей')
+
+        failed = []
+        for name, queryset in chart_and_list_queries(user, options['currency']):
+            plan, scans = full_scans(queryset)
+            if scans:
+                failed.append(name)
+                self.stdout.write(self.style.ERROR(f'{name}: полный просмотр'))
+                for line in scans:
+                    self.stdout.write(f'    {line}')
+            else:
+                self.stdout.write(self.style.SUCCESS(f'{name}: ok'))
+            if options['plan']:
+                for line in plan:
+                    self.stdout.write(f'    | {line}')
+
+        if failed:
+            raise CommandError('Полный просмотр таблицы в запросах: ' + ', '.join(failed))
@@ -0,0 +1,31 @@
+import sys
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from mondiv.export import EXPORTS, FORMATS, export_lines
+
+
+class Command(BaseCommand):
+    help = 'Выгружает выплаты или отчеты пользователя в csv или ndjson потоком, без загрузки всей истории в память'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(EXPORTS))
+        parser.add_argument('--user', type=int, required=True, help='id пользователя')
+        parser.add_argument('--format', choices=sorted(FORMATS), default='csv')
+        parser.add_argument('--output', help='файл, по умолчанию stdout')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='строк в одном запросе к БД')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(pk=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f'Пользователь {options["user"]} не найден')
+
+        lines = export_lines(user, options['kind'], options['format'], chunk_size=options['chunk_size'])
+        if options['output']:
+            with open(options['output'], 'w', newline='', encoding='utf-8') as f:
+                f.writelines(lines)
+            self.stderr.write(self.style.SUCCESS(f'Выгружено в {options["output"]}'))
+        else:
+            sys.stdout.writelines(lines)
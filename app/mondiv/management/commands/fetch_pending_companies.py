@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from mondiv.models import Company
+from mondiv.onboarding import fetch_company
+from mondiv.providers import ProviderError
+
+
+class Command(BaseCommand):
+    help = 'Загружает данные компаний, созданных по тикеру (status=pending), и недостающие иконки'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--icons', action='store_true',
+                            help='также докачать иконки готовых компаний, у которых их нет')
+
+    def handle(self, *args, **options):
+        pending = list(Company.objects.filter(status='pending').values_list('pk', 'ticker'))
+        for pk, ticker in pending:
+            self.stdout.write(f'{ticker}: {fetch_company(pk)}')
+
+        if options['icons']:
+            for company in Company.objects.filter(status='ready', icon_url__isnull=False, icon_image=''):
+                try:
+                    company.get_remote_image()
+                except ProviderError as e:
+                    self.stdout.write(self.style.ERROR(f'{company.ticker}: {e}'))
+                    continue
+                self.stdout.write(f'{company.ticker}: иконка загружена')
+        self.stdout.write(self.style.SUCCESS('Готово'))
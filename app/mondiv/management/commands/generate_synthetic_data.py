@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from mondiv.synthetic import generate, CURRENCIES
+
+
+class Command(BaseCommand):
+    help = 'Создает синтетических пользователей со счетами, выплатами и отчетами для замеров производительности'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=3)
+        parser.add_argument('--accounts', type=int, default=5, help='счетов у каждого пользователя')
+        parser.add_argument('--companies', type=int, default=200)
+        parser.add_argument('--dividends', type=int, default=1000, help='выплат у каждого пользователя')
+        parser.add_argument('--reports', type=int, default=200, help='отчетов у каждого пользователя')
+        parser.add_argument('--years', type=int, default=10)
+        parser.add_argument('--currencies', type=int, default=3, choices=range(1, len(CURRENCIES) + 1))
+        parser.add_argument('--portfolio', type=int, default=30, help='компаний в портфеле пользователя')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--prefix', default='bench', help='начало логинов пользователей')
+        parser.add_argument('--password', default='bench')
+
+    def handle(self, *args, **options):
+        result = generate(users=options['users'], accounts=options['accounts'], companies=options['companies'],
+                          dividends=options['dividends'], reports=options['reports'], years=options['years'],
+                          currencies=options['currencies'], portfolio=options['portfolio'], seed=options['seed'],
+                          prefix=options['prefix'], password=options['password'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Пользователей: {result["users"]}, счетов: {result["accounts"]}, компаний: {result["companies"]}, '
+            f'выплат: {result["dividends"]}, отчетов: {result["reports"]} за {result["years"]} лет'))
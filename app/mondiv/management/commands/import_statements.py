@@ -0,0 +1,28 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from mondiv.imports import IMPORTS, read_rows, import_rows
+
+
+class Command(BaseCommand):
+    help = 'Загружает выплаты или отчеты пользователя из csv / json файла с проверкой дублей'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(IMPORTS))
+        parser.add_argument('file')
+        parser.add_argument('--user', type=int, required=True, help='id пользователя')
+        parser.add_argument('--batch-size', type=int, default=500, help='размер пачки bulk_create')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(pk=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f'Пользователь {options["user"]} не найден')
+
+        with open(options['file'], 'rb') as f:
+            rows = read_rows(f)
+        result = import_rows(user, options['kind'], rows, options['batch_size'])
+        for line, error in result['errors']:
+            self.stdout.write(self.style.ERROR(f'строка {line}: {error}'))
+        self.stdout.write(self.style.SUCCESS(
+            f'Добавлено: {result["created"]}, дублей: {result["duplicates"]}, ошибок: {len(result["errors"])}'))
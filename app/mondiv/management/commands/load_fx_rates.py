@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from mondiv.fx import load_rates
+from mondiv.imports import read_rows
+
+
+class Command(BaseCommand):
+    help = 'Загружает курсы валют из csv / json файла: date, currency, base, rate (1 currency = rate base)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('file')
+        parser.add_argument('--batch-size', type=int, default=1000, help='размер пачки bulk_create')
+
+    def handle(self, *args, **options):
+        with open(options['file'], 'rb') as f:
+            rows = read_rows(f)
+        result = load_rates(rows, options['batch_size'])
+        for line, error in result['errors']:
+            self.stdout.write(self.style.ERROR(f'строка {line}: {error}'))
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено курсов: {result["loaded"]} (с обратными), ошибок: {len(result["errors"])}'))
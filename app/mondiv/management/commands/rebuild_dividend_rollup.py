@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from mondiv.models import Dividend, MonthlyDividend
+from mondiv.rollup import rebuild_rollup
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает помесячную сводку дивидендов (MonthlyDividend) порциями по пользователям'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='users',
+                            help='id пользователя, можно указать несколько раз; по умолчанию все')
+        parser.add_argument('--chunk-size', type=int, default=50,
+                            help='сколько пользователей пересчитывать в одной транзакции')
+        parser.add_argument('--batch-size', type=int, default=1000, help='размер пачки bulk_create')
+
+    def handle(self, *args, **options):
+        user_ids = options['users']
+        if not user_ids:
+            # и те, у кого есть выплаты, и те, у кого осталась устаревшая сводка
+            user_ids = sorted(set(Dividend.objects.values_list('user_id', flat=True).distinct())
+                              | set(MonthlyDividend.objects.values_list('user_id', flat=True).distinct()))
+
+        chunk_size = options['chunk_size']
+        for i in range(0, len(user_ids), chunk_size):
+            chunk = user_ids[i:i + chunk_size]
+            rebuild_rollup(chunk, options['batch_size'])
+            self.stdout.write(f'пересчитано пользователей: {i + len(chunk)} из {len(user_ids)}')
+        self.stdout.write(self.style.SUCCESS('Сводка пересобрана'))
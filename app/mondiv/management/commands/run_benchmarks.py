@@ -0,0 +1,120 @@
+import json
+from datetime import datetime
+
+import django
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from mondiv.benchmark import endpoints, measure, reset_state
+from mondiv.synthetic import generate
+
+
+class Command(BaseCommand):
+    help = 'Замеряет все адреса mondiv (время, число запросов к базе, пиковую память) ' \
+           'на синтетических данных нескольких размеров во временной тестовой базе'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='100,1000,10000',
+                            help='выплат у пользователя через запятую, отчетов - в 5 раз меньше')
+        parser.add_argument('--users', type=int, default=2)
+        parser.add_argument('--companies', type=int, default=200)
+        parser.add_argument('--years', type=int, default=10)
+        parser.add_argument('--repeat', type=int, default=10)
+        parser.add_argument('--warm', action='store_true', help='с прогретым кэшем (по умолчанию кэш '
+                                                                'очищается перед каждым запросом)')
+        parser.add_argument('--only', default='', help='имена адресов через запятую')
+        parser.add_argument('--output', default='benchmarks.json')
+        parser.add_argument('--compare', help='файл результатов прошлого запуска')
+        parser.add_argument('--threshold', type=float, default=20,
+                            help='рост медианы в процентах, который считается регрессией')
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(s) for s in options['sizes'].split(',')]
+        except ValueError:
+            raise CommandError('--sizes: числа через запятую')
+        only = {s.strip() for s in options['only'].split(',') if s.strip()}
+        previous = None
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as f:
+                previous = json.load(f)
+
+        result = {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'repeat': options['repeat'],
+            'warm': options['warm'],
+            'sizes': {},
+        }
+        # данные создаются во временной базе, рабочая не затрагивается
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            for size in sizes:
+                result['sizes'][str(size)] = self.run_size(size, only, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        with open(options['output'], 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        self.stdout.write(self.style.SUCCESS(f'Результаты записаны в {options["output"]}'))
+        if previous:
+            self.compare(previous, result, options['threshold'])
+
+    def run_size(self, size, only, options):
+        call_command('flush', interactive=False, verbosity=0)
+        reset_state()
+        dataset = generate(users=options['users'], companies=options['companies'], dividends=size,
+                           reports=max(size // 5, 1), years=options['years'])
+        dataset.pop('user_ids')
+
+        user = User.objects.filter(username='bench0').get()
+        # /metrics только для персонала
+        user.is_staff = True
+        user.save(update_fields=['is_staff'])
+        client = Client()
+        client.force_login(user)
+
+        self.stdout.write(f'\nВыплат у пользователя: {size}')
+        self.stdout.write(f'{"адрес":<28}{"статус":>7}{"медиана":>10}{"p95":>10}{"запросов":>10}{"память, КБ":>12}')
+        results = {}
+        for name, url, query in endpoints(user):
+            if only and name not in only:
+                continue
+            res = measure(client, url, query, options['repeat'], options['warm'])
+            results[name] = res
+            self.stdout.write(f'{name:<28}{res["status"]:>7}{res["median_ms"]:>10.1f}{res["p95_ms"]:>10.1f}'
+                              f'{res["queries"]:>10}{res["peak_kb"]:>12.0f}')
+        return {'dataset': dataset, 'results': results}
+
+    # сравнение с прошлым запуском по совпадающим размерам и адресам
+    def compare(self, previous, current, threshold):
+        regressions = 0
+        for size, data in current['sizes'].items():
+            old = previous.get('sizes', {}).get(size)
+            if not old:
+                continue
+            self.stdout.write(f'\nСравнение, выплат у пользователя: {size}')
+            for name, res in data['results'].items():
+                prev = old['results'].get(name)
+                if not prev:
+                    continue
+                change = (res['median_ms'] - prev['median_ms']) / prev['median_ms'] * 100 if prev['median_ms'] else 0
+                slower = change > threshold or res['queries'] > prev['queries']
+                line = f'{name:<28}{prev["median_ms"]:>9.1f} -> {res["median_ms"]:<9.1f}{change:>+7.1f}%' \
+                       f'{prev["queries"]:>6} -> {res["queries"]:<5}'
+                if slower:
+                    regressions += 1
+                    self.stdout.write(self.style.ERROR(line))
+                else:
+                    self.stdout.write(line)
+        if regressions:
+            self.stdout.write(self.style.WARNING(f'Регрессий: {regressions}'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Регрессий нет'))
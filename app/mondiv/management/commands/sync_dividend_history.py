@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from mondiv.history import sync_ticker, is_fresh
+from mondiv.providers import ProviderError
+from mondiv.models import Company
+
+
+class Command(BaseCommand):
+    help = 'Дополняет локальную историю выплат (DividendHistory) из Polygon / MOEX только новыми записями'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ticker', action='append', dest='tickers',
+                            help='тикер, можно указать несколько раз; по умолчанию все компании')
+        parser.add_argument('--stale', action='store_true', help='только тикеры с устаревшей историей')
+
+    def handle(self, *args, **options):
+        tickers = options['tickers'] or list(Company.objects.order_by('ticker').values_list('ticker', flat=True))
+        failed = 0
+        for ticker in tickers:
+            if options['stale'] and is_fresh(ticker):
+                continue
+            try:
+                added = sync_ticker(ticker)
+            except ProviderError as e:
+                failed += 1
+                self.stdout.write(self.style.ERROR(f'{ticker}: {e}'))
+                continue
+            self.stdout.write(f'{ticker}: добавлено {added}')
+        self.stdout.write(self.style.SUCCESS(f'Готово, ошибок: {failed}'))
@@ -0,0 +1,186 @@
+import logging
+import os
+import socket
+import threading
+from bisect import bisect_left
+from time import monotonic, perf_counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+# Метрики в формате Prometheus. Каждый воркер gunicorn копит счетчики у себя и раз в
+# METRICS_FLUSH_INTERVAL секунд кладет снимок в общий кэш; /metrics складывает снимки всех воркеров
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# имя: (тип, описание, границы корзин для гистограмм)
+METRICS = {
+    'mondiv_requests_total': ('counter', 'Запросы по представлению и коду ответа', None),
+    'mondiv_request_duration_seconds': ('histogram', 'Время обработки запроса', LATENCY_BUCKETS),
+    'mondiv_db_queries': ('histogram', 'Число SQL-запросов на запрос', QUERY_BUCKETS),
+    'mondiv_db_duration_seconds': ('histogram', 'Суммарное время SQL-запросов на запрос', LATENCY_BUCKETS),
+    'mondiv_response_size_bytes': ('histogram', 'Размер тела ответа (после сжатия)', SIZE_BUCKETS),
+    'mondiv_market_data_requests_total': ('counter', 'Запросы к источникам рыночных данных', None),
+    'mondiv_market_data_duration_seconds': ('histogram', 'Время запроса к источнику рыночных данных',
+                                            LATENCY_BUCKETS),
+    'mondiv_chart_cache_total': ('counter', 'Попадания и промахи кэша графиков', None),
+}
+
+# снимок каждого воркера лежит в своей ячейке mondiv:metrics:slot:<n>; ячейка занимается
+# атомарным cache.add и освобождается сама через METRICS_SNAPSHOT_TIMEOUT после последнего снимка
+MAX_WORKERS = 64
+
+
+def slot_key(n):
+    return f'mondiv:metrics:slot:{n}'
+
+
+# накопленные значения процесса: счетчики {(имя, метки): число} и гистограммы
+# {(имя, метки): [число в каждой корзине..., в +Inf, сумма]}; метки - кортеж пар
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.worker = f'{socket.gethostname()}:{os.getpid()}'
+        self.slot = None
+        self.flushed = monotonic()
+
+    def inc(self, name, labels, value=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        buckets = METRICS[name][2]
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            if key not in self.histograms:
+                self.histograms[key] = [0] * (len(buckets) + 2)
+            histogram = self.histograms[key]
+            histogram[bisect_left(buckets, value)] += 1
+            histogram[-1] += value
+
+    def snapshot(self):
+        with self.lock:
+            return {'counters': dict(self.counters),
+                    'histograms': {k: list(v) for k, v in self.histograms.items()}}
+
+    # обновляет свою ячейку или, если ее срок истек и ее занял другой воркер, занимает свободную
+    def flush(self):
+        self.flushed = monotonic()
+        timeout = settings.METRICS_SNAPSHOT_TIMEOUT
+        value = dict(self.snapshot(), worker=self.worker)
+        if self.slot is not None:
+            current = cache.get(slot_key(self.slot))
+            if current is not None and current['worker'] == self.worker:
+                cache.set(slot_key(self.slot), value, timeout)
+                return
+        slots = ([self.slot] if self.slot is not None else []) + list(range(MAX_WORKERS))
+        for n in slots:
+            if cache.add(slot_key(n), value, timeout):
+                self.slot = n
+                return
+        logger.warning('metrics: no free slot for worker %s', self.worker)
+
+    def maybe_flush(self):
+        if monotonic() - self.flushed >= settings.METRICS_FLUSH_INTERVAL:
+            self.flush()
+
+
+registry = Registry()
+
+
+# суммирует снимки работающих воркеров: ячейки с истекшим сроком кэш уже не отдает
+def collect():
+    registry.flush()
+    counters, histograms = {}, {}
+    for snapshot in cache.get_many([slot_key(n) for n in range(MAX_WORKERS)]).values():
+        for key, value in snapshot['counters'].items():
+            counters[key] = counters.get(key, 0) + value
+        for key, value in snapshot['histograms'].items():
+            if key not in histograms:
+                histograms[key] = [0] * len(value)
+            histograms[key] = [a + b for a, b in zip(histograms[key], value)]
+    return counters, histograms
+
+
+def label_text(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+# текстовый формат Prometheus
+def render():
+    counters, histograms = collect()
+    lines = []
+    for name, (kind, description, buckets) in METRICS.items():
+        lines += [f'# HELP {name} {description}', f'# TYPE {name} {kind}']
+        if kind == 'counter':
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f'{name}{label_text(labels)} {value}')
+            continue
+        for (metric, labels), value in sorted(histograms.items()):
+            if metric != name:
+                continue
+            total = 0
+            for bound, count in zip(buckets + ('+Inf',), value[:-1]):
+                total += count
+                lines.append(f'{name}_bucket{label_text(labels, le=bound)} {total}')
+            lines.append(f'{name}_sum{label_text(labels)} {value[-1]}')
+            lines.append(f'{name}_count{label_text(labels)} {total}')
+    return '\n'.join(lines) + '\n'
+
+
+# время внешнего запроса к источнику; вызывается из mondiv.providers
+def observe_market_data(provider, seconds, ok):
+    registry.observe('mondiv_market_data_duration_seconds', {'provider': provider}, seconds)
+    registry.inc('mondiv_market_data_requests_total', {'provider': provider, 'outcome': 'ok' if ok else 'error'})
+
+
+# считает SQL-запросы и их время в потоке запроса
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += perf_counter() - start
+
+
+# время, число и время SQL-запросов, размер ответа - по имени url (mondiv:profile и т.п.)
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = perf_counter()
+        queries = QueryCounter()
+        with connection.execute_wrapper(queries):
+            response = self.get_response(request)
+        duration = perf_counter() - start
+
+        match = request.resolver_match
+        labels = {'view': match.view_name if match else 'unmatched'}
+        registry.inc('mondiv_requests_total', dict(labels, status=str(response.status_code)))
+        registry.observe('mondiv_request_duration_seconds', labels, duration)
+        registry.observe('mondiv_db_queries', labels, queries.count)
+        registry.observe('mondiv_db_duration_seconds', labels, queries.duration)
+        if not response.streaming:
+            registry.observe('mondiv_response_size_bytes', labels, len(response.content))
+        registry.maybe_flush()
+        return response
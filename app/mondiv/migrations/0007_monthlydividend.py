@@ -0,0 +1,48 @@
+# Generated by Django 3.2.6 on 2026-10-18 19:24
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum, Count
+from django.db.models.functions import TruncMonth
+import django.db.models.deletion
+
+
+def fill_rollup(apps, schema_editor):
+    Dividend = apps.get_model('mondiv', 'Dividend')
+    MonthlyDividend = apps.get_model('mondiv', 'MonthlyDividend')
+    rows = Dividend.objects \
+        .annotate(month=TruncMonth('date_of_receipt')) \
+        .values('user_id', 'currency_id', 'account_id', 'company_id', 'month') \
+        .annotate(total=Sum('payoff'), count=Count('id')) \
+        .order_by()
+    MonthlyDividend.objects.bulk_create((MonthlyDividend(**r) for r in rows.iterator()), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('mondiv', '0006_report'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyDividend',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(verbose_name='Месяц')),
+                ('total', models.FloatField(default=0, verbose_name='Сумма выплат')),
+                ('count', models.IntegerField(default=0, verbose_name='Число выплат')),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='mondiv.account', verbose_name='Счет')),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='mondiv.company', verbose_name='Компания')),
+                ('currency', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='mondiv.currency', verbose_name='Валюта')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Выплаты за месяц',
+                'verbose_name_plural': 'Выплаты по месяцам',
+                'unique_together': {('user', 'currency', 'account', 'company', 'month')},
+            },
+        ),
+        migrations.RunPython(fill_rollup, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 3.2.6 on 2026-10-18 19:26
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('mondiv', '0007_monthlydividend'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserDataStamp',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='auth.user', verbose_name='Пользователь')),
+                ('modified', models.DateTimeField(verbose_name='Данные изменены')),
+            ],
+            options={
+                'verbose_name': 'Отметка изменения данных',
+                'verbose_name_plural': 'Отметки изменения данных',
+            },
+        ),
+    ]
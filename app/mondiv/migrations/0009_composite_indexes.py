@@ -0,0 +1,29 @@
+# Generated by Django 3.2.6 on 2026-10-18 19:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mondiv', '0008_userdatastamp'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dividend',
+            index=models.Index(fields=['user', 'currency', 'date_of_receipt'], name='dividend_user_cur_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dividend',
+            index=models.Index(fields=['user', 'currency', 'payoff'], name='dividend_user_cur_payoff_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='monthlydividend',
+            index=models.Index(fields=['user', 'currency', 'month'], name='rollup_user_cur_month_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='report',
+            index=models.Index(fields=['user', 'currency', 'report_date'], name='report_user_cur_date_idx'),
+        ),
+    ]
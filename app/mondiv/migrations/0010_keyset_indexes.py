@@ -0,0 +1,21 @@
+# Generated by Django 3.2.6 on 2026-10-18 19:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mondiv', '0009_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dividend',
+            index=models.Index(fields=['user', 'date_of_receipt', 'id'], name='dividend_user_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='report',
+            index=models.Index(fields=['user', 'report_date', 'id'], name='report_user_date_id_idx'),
+        ),
+    ]
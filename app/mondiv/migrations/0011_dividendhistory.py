@@ -0,0 +1,50 @@
+# Generated by Django 3.2.6 on 2026-10-18 19:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mondiv', '0010_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DividendHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ticker', models.CharField(max_length=8, verbose_name='Тикер')),
+                ('ex_dividend_date', models.DateField(verbose_name='Дата отсечки')),
+                ('pay_date', models.DateField(blank=True, null=True, verbose_name='Дата выплаты')),
+                ('cash_amount', models.FloatField(verbose_name='Выплата на акцию')),
+                ('currency', models.CharField(blank=True, max_length=5, verbose_name='Валюта')),
+                ('source', models.CharField(choices=[('polygon', 'Polygon'), ('moex', 'MOEX')], max_length=10, verbose_name='Источник')),
+            ],
+            options={
+                'verbose_name': 'История выплат',
+                'verbose_name_plural': 'История выплат',
+            },
+        ),
+        migrations.CreateModel(
+            name='DividendHistorySync',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ticker', models.CharField(max_length=8, unique=True, verbose_name='Тикер')),
+                ('synced_at', models.DateTimeField(verbose_name='Время синхронизации')),
+                ('source', models.CharField(blank=True, max_length=10, verbose_name='Источник')),
+            ],
+            options={
+                'verbose_name': 'Синхронизация истории выплат',
+                'verbose_name_plural': 'Синхронизации истории выплат',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='dividendhistory',
+            index=models.Index(fields=['ticker', 'ex_dividend_date'], name='history_ticker_date_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='dividendhistory',
+            unique_together={('ticker', 'ex_dividend_date', 'source')},
+        ),
+    ]
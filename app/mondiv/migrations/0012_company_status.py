@@ -0,0 +1,18 @@
+# Generated by Django 3.2.6 on 2026-10-18 19:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mondiv', '0011_dividendhistory'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='company',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Загружается'), ('ready', 'Готово'), ('failed', 'Не найдена')], default='ready', max_length=10, verbose_name='Статус'),
+        ),
+    ]
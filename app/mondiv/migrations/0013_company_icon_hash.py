@@ -0,0 +1,18 @@
+# Generated by Django 3.2.6 on 2026-10-18 19:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mondiv', '0012_company_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='company',
+            name='icon_hash',
+            field=models.CharField(blank=True, default='', max_length=32, verbose_name='Хэш иконки'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.db import migrations
+from django.utils import timezone
+
+
+# отметки для пользователей, созданных до появления UserDataStamp, чтобы их первые
+# условные запросы сразу получали ETag и Last-Modified, а не ждали первой записи
+def fill_stamps(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    UserDataStamp = apps.get_model('mondiv', 'UserDataStamp')
+    now = timezone.now()
+    missing = User.objects.exclude(pk__in=UserDataStamp.objects.values('user_id')).values_list('pk', flat=True)
+    UserDataStamp.objects.bulk_create((UserDataStamp(user_id=pk, modified=now) for pk in missing.iterator()),
+                                      batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('mondiv', '0015_fxrate'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_stamps, migrations.RunPython.noop),
+    ]
@@ -1,10 +1,11 @@
 from django.contrib.auth.models import User
-from django.db import models
-from django.core.files import File
-from urllib import request
+from django.db import models, transaction
+from django.core.files.base import ContentFile
+from urllib.parse import urlparse
 import os
 
-from mondiv.utils import get_upl_and_apiKey
+from mondiv.providers import polygon
+from mondiv.thumbnails import build_thumbnails, thumb_url
 
 class Currency(models.Model):
     name = models.CharField(max_length=5, verbose_name='Валюта')
@@ -30,12 +31,18 @@ class Account(models.Model):
 
 
 class Company(models.Model):
+    # pending - создана по тикеру, данные и иконка загружаются в фоне (mondiv.onboarding)
+    STATUSES = (('pending', 'Загружается'), ('ready', 'Готово'), ('failed', 'Не найдена'))
+
     name = models.CharField(max_length=100, verbose_name='Название')
     ticker = models.CharField(unique=True, max_length=8, verbose_name='Тикер')
     description = models.CharField(max_length=3000, verbose_name='О компании')
     time_create = models.DateTimeField(auto_now_add=True, verbose_name='Время создания')
     icon_image = models.ImageField(upload_to='images/icon', verbose_name='Иконка', null=True)
     icon_url = models.URLField(null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUSES, default='ready', verbose_name='Статус')
+    # хэш содержимого иконки, по нему находятся уменьшенные копии (mondiv.thumbnails)
+    icon_hash = models.CharField(max_length=32, blank=True, default='', verbose_name='Хэш иконки')
 
     # def delete(self, *args, **kwargs):
     #     # До удаления записи получаем необходимую информацию
@@ -47,16 +54,28 @@ class Company(models.Model):
 
     def get_remote_image(self):
         if self.icon_url and not self.icon_image:
-            url = get_upl_and_apiKey(self.icon_url)
-            result = request.urlretrieve(url)
-            u = os.path.basename(url)
-            self.icon_image.save(
-                # выделяем из url имя сохраняемого файла
-                self.ticker + '.' + u[u.rindex(".") + 1:u.rindex("?")],
-                File(open(result[0], 'rb'))
-            )
+            content = polygon.download(self.icon_url)
+            # имя файла - тикер с расширением из url иконки
+            ext = os.path.splitext(urlparse(self.icon_url).path)[1]
+            self.icon_image.save(self.ticker + ext, ContentFile(content), save=False)
+            self.icon_hash = build_thumbnails(content)
         self.save()
 
+    # пересобрать уменьшенные копии из уже сохраненной иконки
+    def update_thumbnails(self):
+        if self.icon_image:
+            with self.icon_image.open('rb') as f:
+                self.icon_hash = build_thumbnails(f.read())
+        else:
+            self.icon_hash = ''
+        self.save(update_fields=['icon_hash'])
+
+    # url уменьшенной иконки: size - small (списки) или large (карточка компании)
+    def icon_thumb_url(self, size='small', fmt='png'):
+        if self.icon_hash:
+            return thumb_url(self.icon_hash, size, fmt)
+        return self.icon_image.url if self.icon_image else None
+
     def __str__(self):
         return self.name
 
@@ -64,6 +83,10 @@ class Company(models.Model):
         verbose_name = 'Компания'
         verbose_name_plural = 'Компании'
         ordering = ['name']
+        indexes = [
+            # постраничный каталог по названию
+            models.Index(fields=['name', 'id'], name='company_name_id_idx'),
+        ]
 
 
 class Dividend(models.Model):
@@ -76,9 +99,42 @@ class Dividend(models.Model):
     currency = models.ForeignKey(Currency, on_delete=models.PROTECT, verbose_name='Валюта')
     account = models.ForeignKey(Account, on_delete=models.PROTECT, verbose_name='Счет')
 
+    # запись и обновление помесячной сводки (mondiv/signals.py) в одной транзакции
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
     class Meta:
         verbose_name = 'Дивиденд'
         verbose_name_plural = 'Дивиденды'
+        indexes = [
+            # ряды по датам в валюте (недельные графики)
+            models.Index(fields=['user', 'currency', 'date_of_receipt'], name='dividend_user_cur_date_idx'),
+            # минимальная / максимальная выплата в профиле
+            models.Index(fields=['user', 'currency', 'payoff'], name='dividend_user_cur_payoff_idx'),
+            # постраничный список выплат по (дата, id)
+            models.Index(fields=['user', 'date_of_receipt', 'id'], name='dividend_user_date_id_idx'),
+        ]
+
+
+# помесячная сводка выплат, поддерживается сигналами при каждом изменении Dividend,
+# пересобирается командой rebuild_dividend_rollup
+class MonthlyDividend(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name='Пользователь')
+    currency = models.ForeignKey(Currency, on_delete=models.CASCADE, verbose_name='Валюта')
+    account = models.ForeignKey(Account, on_delete=models.CASCADE, verbose_name='Счет')
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, verbose_name='Компания')
+    month = models.DateField(verbose_name='Месяц')
+    total = models.FloatField(default=0, verbose_name='Сумма выплат')
+    count = models.IntegerField(default=0, verbose_name='Число выплат')
+
+    class Meta:
+        verbose_name = 'Выплаты за месяц'
+        verbose_name_plural = 'Выплаты по месяцам'
+        unique_together = ('user', 'currency', 'account', 'company', 'month')
+        indexes = [
+            models.Index(fields=['user', 'currency', 'month'], name='rollup_user_cur_month_idx'),
+        ]
 
 
 class Report(models.Model):
@@ -91,3 +147,65 @@ class Report(models.Model):
     class Meta:
         verbose_name = 'Отчет'
         verbose_name_plural = 'Отчеты'
+        indexes = [
+            models.Index(fields=['user', 'currency', 'report_date'], name='report_user_cur_date_idx'),
+            # постраничный список отчетов по (дата, id)
+            models.Index(fields=['user', 'report_date', 'id'], name='report_user_date_id_idx'),
+        ]
+
+
+# время последнего изменения выплат или отчетов пользователя (для ETag / Last-Modified)
+class UserDataStamp(models.Model):
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, verbose_name='Пользователь')
+    modified = models.DateTimeField(verbose_name='Данные изменены')
+
+    class Meta:
+        verbose_name = 'Отметка изменения данных'
+        verbose_name_plural = 'Отметки изменения данных'
+
+
+# история выплат по тикеру из внешних источников (Polygon, MOEX), пополняется командой
+# sync_dividend_history и при устаревании при просмотре страницы компании
+class DividendHistory(models.Model):
+    SOURCES = (('polygon', 'Polygon'), ('moex', 'MOEX'))
+
+    ticker = models.CharField(max_length=8, verbose_name='Тикер')
+    ex_dividend_date = models.DateField(verbose_name='Дата отсечки')
+    pay_date = models.DateField(null=True, blank=True, verbose_name='Дата выплаты')
+    cash_amount = models.FloatField(verbose_name='Выплата на акцию')
+    currency = models.CharField(max_length=5, blank=True, verbose_name='Валюта')
+    source = models.CharField(max_length=10, choices=SOURCES, verbose_name='Источник')
+
+    class Meta:
+        verbose_name = 'История выплат'
+        verbose_name_plural = 'История выплат'
+        unique_together = ('ticker', 'ex_dividend_date', 'source')
+        indexes = [
+            models.Index(fields=['ticker', 'ex_dividend_date'], name='history_ticker_date_idx'),
+        ]
+
+
+# когда история тикера последний раз сверялась с источником
+class DividendHistorySync(models.Model):
+    ticker = models.CharField(max_length=8, unique=True, verbose_name='Тикер')
+    synced_at = models.DateTimeField(verbose_name='Время синхронизации')
+    source = models.CharField(max_length=10, blank=True, verbose_name='Источник')
+
+    class Meta:
+        verbose_name = 'Синхронизация истории выплат'
+        verbose_name_plural = 'Синхронизации истории выплат'
+
+
+# курс валюты на дату: 1 currency = rate base; на выходные курсы не публикуются,
+# поэтому при пересчете берется ближайший предыдущий (mondiv/fx.py)
+class FxRate(models.Model):
+    currency = models.ForeignKey(Currency, on_delete=models.CASCADE, related_name='rates', verbose_name='Валюта')
+    base = models.ForeignKey(Currency, on_delete=models.CASCADE, related_name='+', verbose_name='Базовая валюта')
+    date = models.DateField(verbose_name='Дата')
+    rate = models.FloatField(verbose_name='Курс')
+
+    class Meta:
+        verbose_name = 'Курс валюты'
+        verbose_name_plural = 'Курсы валют'
+        # индекс (currency, base, date) нужен поиску ближайшего предыдущего курса
+        unique_together = ('currency', 'base', 'date')
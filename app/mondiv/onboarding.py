@@ -0,0 +1,90 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from mondiv.cache import bump_catalog_version
+from mondiv.models import Company
+from mondiv.providers import ProviderError, RateLimiter, ticker_details
+
+logger = logging.getLogger(__name__)
+
+# отдельный от mondiv.providers пул: задачи отсюда сами ждут ответов из пула источников
+executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='company-fetch')
+rate_limiter = RateLimiter(settings.MARKET_DATA_RATE)
+
+# тикеров в одном пакете
+MAX_BATCH = 50
+
+
+# загружает название, описание и иконку компании, созданной по тикеру;
+# при недоступности источника компания остается pending и будет загружена позже
+def fetch_company(company_id):
+    company = Company.objects.filter(pk=company_id, status='pending').first()
+    if company is None:
+        return None
+    try:
+        res = ticker_details(company.ticker)
+    except ProviderError as e:
+        logger.warning('company %s fetch failed: %s', company.ticker, e)
+        return company.status
+
+    if res is None:
+        company.status = 'failed'
+        company.save(update_fields=['status'])
+        return company.status
+
+    company.name = res['name'][:100]
+    company.description = res['description'][:3000]
+    company.icon_url = res['icon_url']
+    company.status = 'ready'
+    try:
+        company.get_remote_image()
+    except ProviderError as e:
+        # без иконки компания все равно готова, иконку догрузит fetch_pending_companies --icons
+        logger.warning('company %s icon download failed: %s', company.ticker, e)
+        company.save()
+    return company.status
+
+
+def run_fetch(company_id):
+    # пакет из MAX_BATCH компаний не должен превышать MARKET_DATA_RATE запросов в секунду
+    rate_limiter.wait()
+    close_old_connections()
+    try:
+        fetch_company(company_id)
+    except Exception:
+        logger.exception('company %s fetch crashed', company_id)
+    finally:
+        close_old_connections()
+
+
+# запуск загрузки в фоне после коммита транзакции, в которой создана компания
+def schedule_fetch(company_id):
+    if settings.COMPANY_FETCH_IN_BACKGROUND:
+        transaction.on_commit(lambda: executor.submit(run_fetch, company_id))
+
+
+# добавляет компании по списку тикеров, не обращаясь к источникам в запросе: новые тикеры
+# создаются одним bulk_create как pending (не найденные раньше - снова pending), а название,
+# описание и иконка загружаются в фоне, как при добавлении одной компании.
+# возвращает [(тикер, статус, компания)], статус: added или exists
+def add_companies(tickers):
+    tickers = list(dict.fromkeys(t.upper() for t in tickers))[:MAX_BATCH]
+    with transaction.atomic():
+        existing = {c.ticker: c for c in Company.objects.filter(ticker__in=tickers)}
+        # ignore_conflicts: тикер мог добавить кто-то другой между запросами;
+        # bulk_create не вызывает сигналы, версию каталога меняем сами
+        Company.objects.bulk_create([Company(ticker=t, name=t, description='', status='pending')
+                                     for t in tickers if t not in existing], ignore_conflicts=True)
+        retry = [c.pk for c in existing.values() if c.status == 'failed']
+        Company.objects.filter(pk__in=retry).update(status='pending')
+
+        companies = {c.ticker: c for c in Company.objects.filter(ticker__in=tickers)}
+        added = [t for t in tickers if t not in existing or existing[t].pk in retry]
+        if added:
+            transaction.on_commit(bump_catalog_version)
+        for t in added:
+            schedule_fetch(companies[t].pk)
+    return [(t, 'added' if t in added else 'exists', companies[t]) for t in tickers]
@@ -0,0 +1,56 @@
+import base64
+from datetime import date
+
+from django.db.models import Q
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+# курсор - позиция последней показанной строки (дата, id) в base64
+def encode_cursor(day, pk):
+    return base64.urlsafe_b64encode(f'{day.isoformat()}:{pk}'.encode()).decode()
+
+
+def decode_cursor(value):
+    try:
+        day, pk = base64.urlsafe_b64decode(value.encode()).decode().split(':')
+        return date.fromisoformat(day), int(pk)
+    except (ValueError, UnicodeError, AttributeError):
+        return None
+
+
+# строки после позиции (дата, id), по умолчанию от новых к старым;
+# нужен индекс, начинающийся с (user, <дата>)
+def after_position(queryset, date_field, position=None, descending=True):
+    sign, op = ('-', 'lt') if descending else ('', 'gt')
+    queryset = queryset.order_by(f'{sign}{date_field}', f'{sign}id')
+    if position:
+        day, pk = position
+        queryset = queryset.filter(Q(**{f'{date_field}__{op}': day}) | Q(**{date_field: day, f'id__{op}': pk}))
+    return queryset
+
+
+# страница по ключу: стоимость не зависит от номера страницы;
+# возвращает (строки, курсор следующей страницы или None)
+def keyset_page(queryset, date_field, cursor=None, size=PAGE_SIZE):
+    position = decode_cursor(cursor) if cursor else None
+    rows = list(after_position(queryset, date_field, position)[:size + 1])
+    next_cursor = None
+    if len(rows) > size:
+        rows = rows[:size]
+        next_cursor = encode_cursor(getattr(rows[-1], date_field), rows[-1].pk)
+    return rows, next_cursor
+
+
+# все строки .values() порциями по size от старых к новым; каждая порция - отдельный
+# ограниченный запрос по ключу, поэтому память не растет и на mysql, где iterator()
+# все равно забирает весь результат на клиент
+def keyset_batches(queryset, date_field, size=1000):
+    position = None
+    while True:
+        rows = list(after_position(queryset, date_field, position, descending=False)[:size])
+        yield from rows
+        if len(rows) < size:
+            return
+        position = (rows[-1][date_field], rows[-1]['id'])
@@ -0,0 +1,210 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import date
+from time import monotonic, sleep
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from mondiv.metrics import observe_market_data
+
+logger = logging.getLogger(__name__)
+
+# общий пул потоков для параллельных запросов к источникам; запрос, не уложившийся
+# в MARKET_DATA_DEADLINE, дорабатывает здесь, а не в воркере gunicorn
+executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='market-data')
+local = threading.local()
+
+
+class ProviderError(Exception):
+    pass
+
+
+# keep-alive сессия с пулом соединений и повторами, своя в каждом потоке
+def session():
+    if not hasattr(local, 'session'):
+        retry = Retry(total=settings.MARKET_DATA_RETRIES, backoff_factor=0.3,
+                      status_forcelist=(429, 500, 502, 503, 504), allowed_methods=('GET',))
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retry)
+        local.session = requests.Session()
+        local.session.mount('http://', adapter)
+        local.session.mount('https://', adapter)
+    return local.session
+
+
+# равномерно распределяет вызовы wait() во времени: не больше rate в секунду на процесс
+class RateLimiter:
+    def __init__(self, rate):
+        self.interval = 1 / rate
+        self.lock = threading.Lock()
+        self.next = 0
+
+    def wait(self):
+        with self.lock:
+            now = monotonic()
+            start = max(now, self.next)
+            self.next = start + self.interval
+        sleep(start - now)
+
+
+class Provider:
+    name = None
+
+    def get(self, url, params=None):
+        start, ok = monotonic(), False
+        try:
+            response = session().get(url, params=params, timeout=(settings.MARKET_DATA_CONNECT_TIMEOUT,
+                                                                  settings.MARKET_DATA_READ_TIMEOUT))
+            response.raise_for_status()
+            ok = True
+            return response
+        except requests.RequestException as e:
+            raise ProviderError(f'{self.name}: {e}') from e
+        finally:
+            observe_market_data(self.name, monotonic() - start, ok)
+
+    def get_json(self, url, params=None):
+        try:
+            return self.get(url, params).json()
+        except ValueError as e:
+            raise ProviderError(f'{self.name}: неверный ответ') from e
+
+    # {'name', 'ticker', 'description', 'icon_url'} или None, если тикер не найден
+    def ticker_details(self, ticker):
+        return None
+
+    # выплаты с отсечкой позже since по возрастанию даты:
+    # [{'ex_dividend_date', 'pay_date', 'cash_amount', 'currency'}]
+    def dividends(self, ticker, since=None):
+        return []
+
+
+class PolygonProvider(Provider):
+    name = 'polygon'
+    base_url = 'https://api.polygon.io'
+
+    def get(self, url, params=None):
+        return super().get(url, dict(params or {}, apiKey=settings.POLYGON_API_KEY))
+
+    def ticker_details(self, ticker):
+        try:
+            res = self.get_json(f'{self.base_url}/v3/reference/tickers/{ticker}').get('results')
+        except ProviderError as e:
+            # 404 - такого тикера нет, это ответ, а не ошибка источника
+            if isinstance(e.__cause__, requests.HTTPError) and e.__cause__.response.status_code == 404:
+                return None
+            raise
+        if not res:
+            return None
+        return {
+            'name': res['name'],
+            'ticker': res['ticker'],
+            'description': res.get('description') or '',
+            'icon_url': (res.get('branding') or {}).get('icon_url'),
+        }
+
+    def dividends(self, ticker, since=None):
+        params = {'ticker': ticker, 'order': 'asc', 'sort': 'ex_dividend_date', 'limit': 1000}
+        if since:
+            params['ex_dividend_date.gt'] = since.isoformat()
+        url, res = f'{self.base_url}/v3/reference/dividends', []
+        while url:
+            data = self.get_json(url, params)
+            for r in data.get('results') or []:
+                res.append({
+                    'ex_dividend_date': date.fromisoformat(r['ex_dividend_date']),
+                    'pay_date': date.fromisoformat(r['pay_date']) if r.get('pay_date') else None,
+                    'cash_amount': r['cash_amount'],
+                    'currency': r.get('currency') or '',
+                })
+            # next_url уже содержит все параметры кроме ключа
+            url, params = data.get('next_url'), None
+        return res
+
+    # иконки и логотипы Polygon отдает только с ключом
+    def download(self, url):
+        return self.get(url).content
+
+
+class MoexProvider(Provider):
+    name = 'moex'
+    base_url = 'https://iss.moex.com/iss'
+
+    # таблица ISS {'columns': [...], 'data': [[...]]} -> список словарей
+    @staticmethod
+    def rows(table):
+        return [dict(zip(table['columns'], row)) for row in table['data']]
+
+    def ticker_details(self, ticker):
+        data = self.get_json(f'{self.base_url}/securities/{ticker}.json', {'iss.meta': 'off'})
+        description = {r['name']: r['value'] for r in self.rows(data['description'])}
+        if not description.get('SECID'):
+            return None
+        return {
+            'name': description.get('NAME') or description.get('SHORTNAME') or ticker,
+            'ticker': description['SECID'].upper(),
+            'description': description.get('NAME') or '',
+            'icon_url': None,
+        }
+
+    # MOEX отдает всю историю сразу, новые записи отбираем сами
+    def dividends(self, ticker, since=None):
+        data = self.get_json(f'{self.base_url}/securities/{ticker}/dividends.json', {'iss.meta': 'off'})
+        res = []
+        for r in self.rows(data['dividends']):
+            if not r.get('registryclosedate') or r.get('value') is None:
+                continue
+            day = date.fromisoformat(r['registryclosedate'])
+            if since and day <= since:
+                continue
+            res.append({'ex_dividend_date': day, 'pay_date': None, 'cash_amount': r['value'],
+                        'currency': r.get('currencyid') or ''})
+        return res
+
+
+polygon = PolygonProvider()
+moex = MoexProvider()
+PROVIDERS = [polygon, moex]
+
+
+# опрашивает источники параллельно и возвращает (источник, ответ) первого по приоритету
+# непустого ответа, не дожидаясь менее приоритетных; не дольше deadline секунд.
+# None - все источники ответили, что данных нет; ProviderError - ответа нет из-за ошибок или таймаута
+def first_useful(method, *args, providers=None, deadline=None):
+    providers = providers or PROVIDERS
+    deadline = monotonic() + (deadline or settings.MARKET_DATA_DEADLINE)
+    futures = [executor.submit(getattr(p, method), *args) for p in providers]
+    pending = set(futures)
+    errors = []
+    while True:
+        for provider, future in zip(providers, futures):
+            if not future.done():
+                break
+            if future.exception() is None and future.result():
+                for other in pending:
+                    other.cancel()
+                return provider, future.result()
+        if not pending:
+            break
+        done, pending = wait(pending, timeout=max(deadline - monotonic(), 0), return_when=FIRST_COMPLETED)
+        if not done:
+            errors.append('таймаут')
+            # ответов по приоритету не дождались: берем любой готовый непустой
+            for provider, future in zip(providers, futures):
+                if future.done() and future.exception() is None and future.result():
+                    return provider, future.result()
+            break
+
+    errors += [str(f.exception()) for f in futures if f.done() and f.exception() is not None]
+    if errors:
+        logger.warning('market data %s%s failed: %s', method, args, '; '.join(errors))
+        raise ProviderError('; '.join(errors))
+    return None
+
+
+def ticker_details(ticker):
+    res = first_useful('ticker_details', ticker)
+    return res[1] if res else None
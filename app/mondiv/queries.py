@@ -0,0 +1,132 @@
+from django.db.models import Sum, Count, Min, Max, Subquery, OuterRef, Q, F, Exists
+
+from mondiv.fx import currency_scope, in_base
+from mondiv.models import Dividend, Report, MonthlyDividend, Currency, FxRate
+from mondiv.utils import last_year_start
+
+
+# Запросы графиков и списков. Собраны здесь, чтобы их планы можно было
+# проверить командой explain_queries. base - базовая валюта: вместо строк одной
+# валюты берутся все, суммы пересчитываются по курсу в самом запросе (mondiv/fx.py).
+
+# суммы выплат в валюте по компаниям ('company__name') или счетам ('account__name')
+def dividend_totals(user, currency, field, base=None):
+    queryset, total = currency_scope(MonthlyDividend.objects.filter(user=user), currency, 'total', 'month', base)
+    return queryset \
+        .values(field) \
+        .annotate(total=Sum(total))
+
+
+# сводка по (валюта, месяц, компания, счет) для dashboard; с base - по (месяц, компания, счет)
+def dashboard_dividends(user, currencies, base=None):
+    queryset = MonthlyDividend.objects.filter(user=user)
+    if base:
+        total, fields = in_base('total', 'month', base), ()
+    else:
+        queryset, total, fields = queryset.filter(currency__name__in=currencies), F('total'), ('currency__name',)
+    return queryset \
+        .values(*fields, 'month', 'company__name', 'account__name') \
+        .annotate(last_year=Sum(total, filter=Q(month__gte=last_year_start())), total=Sum(total)) \
+        .order_by('month')
+
+
+# отчеты по дате; value - сумма в валюте отчета или в base
+def report_rows(user, currencies, base=None):
+    queryset = Report.objects.filter(user=user)
+    if base:
+        value = in_base('amount', 'report_date', base)
+    else:
+        queryset, value = queryset.filter(currency__name__in=currencies), F('amount')
+    return queryset \
+        .values('currency__name', 'account_id', 'account__name', 'report_date') \
+        .annotate(value=value) \
+        .order_by('report_date', 'id')
+
+
+def report_totals(user, currency, base=None):
+    queryset, amount = currency_scope(Report.objects.filter(user=user), currency, 'amount', 'report_date', base)
+    return queryset \
+        .values('report_date') \
+        .annotate(total=Sum(amount)) \
+        .order_by('report_date')
+
+
+# все выплаты пользователя в base одной суммой
+def dividend_total(user, base):
+    return MonthlyDividend.objects \
+        .filter(user=user) \
+        .aggregate(total=Sum(in_base('total', 'month', base)))['total']
+
+
+def held_currencies(user):
+    return Currency.objects \
+        .filter(Exists(MonthlyDividend.objects.filter(user=user, currency=OuterRef('pk')))
+                | Exists(Report.objects.filter(user=user, currency=OuterRef('pk'))))
+
+
+# названия валют, в которых у пользователя есть выплаты или отчеты
+def user_currencies(user):
+    return list(held_currencies(user).order_by('name').values_list('name', flat=True))
+
+
+# валюты пользователя без единого курса в base: их суммы при пересчете дают NULL
+# и в итоги в base не попадают
+def missing_rates(user, base):
+    return list(held_currencies(user)
+                .exclude(name=base)
+                .exclude(Exists(FxRate.objects.filter(currency=OuterRef('pk'), base__name=base)))
+                .order_by('name')
+                .values_list('name', flat=True))
+
+
+# по строке на валюту: сумма, число, крайние выплаты и их компании;
+# коррелированные подзапросы идут по индексу (user, currency, payoff)
+def profile_stats(user):
+    mine = Dividend.objects.filter(user=user, currency=OuterRef('pk'))
+
+    def aggregate(expression):
+        return Subquery(mine.values('currency').annotate(value=expression).values('value'))
+
+    return Currency.objects \
+        .annotate(total=aggregate(Sum('payoff')),
+                  number_payments=aggregate(Count('id')),
+                  min_payoff=aggregate(Min('payoff')),
+                  max_payoff=aggregate(Max('payoff')),
+                  min_company=Subquery(mine.order_by('payoff', 'id').values('company__name')[:1]),
+                  max_company=Subquery(mine.order_by('-payoff', '-id').values('company__name')[:1])) \
+        .values('name', 'total', 'number_payments', 'min_payoff', 'max_payoff', 'min_company', 'max_company') \
+        .order_by('name')
+
+
+# фильтры списков: тикер, счет, валюта, период и диапазон суммы
+def filter_listing(queryset, filters, date_field, amount_field):
+    if filters.get('ticker'):
+        queryset = queryset.filter(company__ticker=filters['ticker'].upper())
+    if filters.get('account'):
+        queryset = queryset.filter(account__name=filters['account'])
+    if filters.get('currency'):
+        queryset = queryset.filter(currency__name=filters['currency'].upper())
+    if filters.get('start'):
+        queryset = queryset.filter(**{f'{date_field}__gte': filters['start']})
+    if filters.get('end'):
+        queryset = queryset.filter(**{f'{date_field}__lte': filters['end']})
+    if filters.get('min_amount') is not None:
+        queryset = queryset.filter(**{f'{amount_field}__gte': filters['min_amount']})
+    if filters.get('max_amount') is not None:
+        queryset = queryset.filter(**{f'{amount_field}__lte': filters['max_amount']})
+    return queryset
+
+
+def dividend_listing(user, filters=None):
+    queryset = Dividend.objects.filter(user=user).select_related('company', 'currency', 'account')
+    return filter_listing(queryset, filters or {}, 'date_of_receipt', 'payoff')
+
+
+def company_dividends(user, company):
+    return Dividend.objects.filter(company=company, user=user).select_related('currency', 'account') \
+        .order_by('date_of_receipt')
+
+
+def report_listing(user, filters=None):
+    queryset = Report.objects.filter(user=user).select_related('currency', 'account')
+    return filter_listing(queryset, filters or {}, 'report_date', 'amount')
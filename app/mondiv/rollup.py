@@ -0,0 +1,58 @@
+from django.db import transaction, IntegrityError
+from django.db.models import F, Sum, Count
+from django.db.models.functions import TruncMonth
+
+from mondiv.models import Dividend, MonthlyDividend
+
+
+def month_of(day):
+    return day.replace(day=1)
+
+
+# добавляет к сводке выплату (count=1) или вычитает ее (count=-1)
+def add_to_rollup(user_id, currency_id, account_id, company_id, day, payoff, count):
+    key = dict(user_id=user_id, currency_id=currency_id, account_id=account_id, company_id=company_id,
+               month=month_of(day))
+    rows = MonthlyDividend.objects.filter(**key)
+    if rows.update(total=F('total') + payoff, count=F('count') + count):
+        if count < 0:
+            rows.filter(count__lte=0).delete()
+        return
+    if count < 0:
+        return
+    try:
+        with transaction.atomic():
+            MonthlyDividend.objects.create(total=payoff, count=count, **key)
+    except IntegrityError:
+        # строку успел создать параллельный запрос
+        rows.update(total=F('total') + payoff, count=F('count') + count)
+
+
+def add_dividend(values, sign):
+    add_to_rollup(values['user_id'], values['currency_id'], values['account_id'], values['company_id'],
+                  values['date_of_receipt'], sign * values['payoff'], sign)
+
+
+# добавляет к сводке пачку новых выплат (bulk_create не вызывает сигналы): выплаты
+# складываются по строкам сводки, и каждая затронутая строка обновляется один раз
+def add_dividends(dividends):
+    groups = {}
+    for d in dividends:
+        key = (d.user_id, d.currency_id, d.account_id, d.company_id, month_of(d.date_of_receipt))
+        total, count = groups.get(key, (0, 0))
+        groups[key] = (total + d.payoff, count + 1)
+    for key, (total, count) in groups.items():
+        add_to_rollup(*key, total, count)
+
+
+# пересчитывает сводку пользователей целиком из Dividend
+def rebuild_rollup(user_ids, batch_size=1000):
+    with transaction.atomic():
+        MonthlyDividend.objects.filter(user_id__in=user_ids).delete()
+        rows = Dividend.objects \
+            .filter(user_id__in=user_ids) \
+            .annotate(month=TruncMonth('date_of_receipt')) \
+            .values('user_id', 'currency_id', 'account_id', 'company_id', 'month') \
+            .annotate(total=Sum('payoff'), count=Count('id')) \
+            .order_by()
+        MonthlyDividend.objects.bulk_create((MonthlyDividend(**r) for r in rows.iterator()), batch_size=batch_size)
@@ -0,0 +1,98 @@
+from datetime import date
+
+from dateutil.relativedelta import relativedelta
+from django.db.models import Sum
+from django.db.models.functions import TruncWeek, TruncMonth, TruncQuarter, TruncYear
+from django.utils import timezone
+
+from mondiv.fx import currency_scope
+from mondiv.models import Dividend, MonthlyDividend
+
+# размер интервала: (функция усечения в БД, шаг)
+BUCKETS = {
+    'week': (TruncWeek, relativedelta(weeks=1)),
+    'month': (TruncMonth, relativedelta(months=1)),
+    'quarter': (TruncQuarter, relativedelta(months=3)),
+    'year': (TruncYear, relativedelta(years=1)),
+}
+
+
+def bucket_start(day, bucket):
+    if bucket == 'week':
+        return day - relativedelta(days=day.weekday())
+    if bucket == 'month':
+        return day.replace(day=1)
+    if bucket == 'quarter':
+        return date(day.year, (day.month - 1) // 3 * 3 + 1, 1)
+    return date(day.year, 1, 1)
+
+
+# начала всех интервалов от start до end включительно
+def bucket_range(start, end, bucket):
+    step = BUCKETS[bucket][1]
+    current, end = bucket_start(start, bucket), bucket_start(end, bucket)
+    res = []
+    while current <= end:
+        res.append(current)
+        current += step
+    return res
+
+
+# один сгруппированный запрос: строки {'bucket': начало интервала, <group_by>..., 'value': сумма}
+def series_rows(queryset, date_field, value_field, bucket, start=None, end=None, group_by=()):
+    if start:
+        queryset = queryset.filter(**{f'{date_field}__gte': bucket_start(start, bucket)})
+    if end:
+        queryset = queryset.filter(**{f'{date_field}__lte': end})
+    return queryset \
+        .annotate(bucket=BUCKETS[bucket][0](date_field)) \
+        .values('bucket', *group_by) \
+        .annotate(value=Sum(value_field)) \
+        .order_by()
+
+
+# раскладывает строки (в т.ч. более мелких интервалов) по интервалам с нулями там,
+# где выплат не было, за O(строк + интервалов);
+# возвращает (начала интервалов, {ключ группы: [значения]}), ключ - кортеж значений group_by
+def densify(rows, bucket, start=None, end=None, group_by=(), value='value'):
+    rows = list(rows)
+    if start is None:
+        start = min((r['bucket'] for r in rows), default=None)
+    if end is None:
+        end = timezone.localdate()
+    buckets = bucket_range(start, end, bucket) if start else []
+    index = {b: i for i, b in enumerate(buckets)}
+
+    series = {}
+    for r in rows:
+        i = index.get(bucket_start(r['bucket'], bucket))
+        if i is None:
+            continue
+        key = tuple(r[g] for g in group_by)
+        if key not in series:
+            series[key] = [0] * len(buckets)
+        series[key][i] += r[value] or 0
+    if not group_by and () not in series:
+        series[()] = [0] * len(buckets)
+    return buckets, series
+
+
+def build_series(queryset, date_field, value_field, bucket, start=None, end=None, group_by=()):
+    rows = series_rows(queryset, date_field, value_field, bucket, start, end, group_by)
+    return densify(rows, bucket, start, end, group_by)
+
+
+# ряды выплат пользователя; помесячная сводка для интервалов от месяца, сырые выплаты для недель;
+# с base - все валюты в пересчете (сводка по курсу на начало месяца, выплаты - на дату выплаты)
+def dividend_series_rows(user, currency, bucket, start=None, end=None, group_by=(), base=None):
+    if bucket == 'week':
+        queryset, date_field, value_field = Dividend.objects, 'date_of_receipt', 'payoff'
+    else:
+        queryset, date_field, value_field = MonthlyDividend.objects, 'month', 'total'
+    queryset, value = currency_scope(queryset.filter(user=user), currency, value_field, date_field, base)
+    return series_rows(queryset, date_field, value, bucket, start, end, group_by)
+
+
+def dividend_series(user, currency, bucket, start=None, end=None, group_by=(), base=None):
+    rows = dividend_series_rows(user, currency, bucket, start, end, group_by, base)
+    return densify(rows, bucket, start, end, group_by)
@@ -0,0 +1,118 @@
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from mondiv.cache import bump_data_version, bump_data_versions, bump_catalog_version, bump_accounts_version, bump_currency_version, \
+    bump_fx_version
+from mondiv.models import Account, Company, Currency, Dividend, FxRate, Report, UserDataStamp
+from mondiv.rollup import add_dividend
+
+ROLLUP_FIELDS = ('user_id', 'currency_id', 'account_id', 'company_id', 'date_of_receipt', 'payoff')
+
+
+def rollup_values(instance):
+    return {f: getattr(instance, f) for f in ROLLUP_FIELDS}
+
+
+# при изменении запомнить старые значения, чтобы вычесть их из сводки
+@receiver(pre_save, sender=Dividend)
+def dividend_pre_save(sender, instance, raw=False, **kwargs):
+    instance._rollup_old = None
+    if instance.pk and not raw:
+        instance._rollup_old = Dividend.objects.select_for_update() \
+            .filter(pk=instance.pk).values(*ROLLUP_FIELDS).first()
+
+
+@receiver(post_save, sender=Dividend)
+def dividend_post_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    old = getattr(instance, '_rollup_old', None)
+    if old:
+        add_dividend(old, -1)
+    add_dividend(rollup_values(instance), 1)
+
+
+@receiver(post_delete, sender=Dividend)
+def dividend_post_delete(sender, instance, **kwargs):
+    add_dividend(rollup_values(instance), -1)
+
+
+# любое изменение выплат или отчетов пользователя делает его графики в кэше устаревшими;
+# версия меняется после коммита, чтобы в кэш не попали данные до изменения
+@receiver(post_save, sender=Dividend)
+@receiver(post_delete, sender=Dividend)
+@receiver(post_save, sender=Report)
+@receiver(post_delete, sender=Report)
+def user_data_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    user_id = instance.user_id
+    touch_user_data(user_id)
+    transaction.on_commit(lambda: bump_data_version(user_id))
+
+
+def touch_user_data(user_id):
+    now = timezone.now()
+    if not UserDataStamp.objects.filter(user_id=user_id).update(modified=now):
+        UserDataStamp.objects.get_or_create(user_id=user_id, defaults={'modified': now})
+
+
+# отметки сразу нескольких пользователей: два запроса на любое их число
+def touch_users_data(user_ids):
+    now = timezone.now()
+    UserDataStamp.objects.filter(user_id__in=user_ids).update(modified=now)
+    UserDataStamp.objects.bulk_create([UserDataStamp(user_id=user_id, modified=now) for user_id in user_ids],
+                                      ignore_conflicts=True)
+
+
+@receiver(pre_save, sender=Company)
+def company_pre_save(sender, instance, raw=False, **kwargs):
+    instance._old_name = None
+    if instance.pk and not raw:
+        instance._old_name = Company.objects.filter(pk=instance.pk).values_list('name', flat=True).first()
+
+
+# каталог компаний общий для всех пользователей: любое изменение компании меняет его версию.
+# названия компаний есть в графиках и списках выплат: при переименовании (например, pending
+# компании после загрузки из источника) устаревают данные всех, у кого есть ее выплаты
+@receiver(post_save, sender=Company)
+@receiver(post_delete, sender=Company)
+def company_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    transaction.on_commit(bump_catalog_version)
+    old_name = getattr(instance, '_old_name', None)
+    if old_name is not None and old_name != instance.name:
+        user_ids = list(Dividend.objects.filter(company=instance).values_list('user_id', flat=True).distinct())
+        if user_ids:
+            touch_users_data(user_ids)
+            transaction.on_commit(lambda: bump_data_versions(user_ids))
+
+
+# списки выбора в формах: счета свои у каждого пользователя, валюты общие
+@receiver(post_save, sender=Account)
+@receiver(post_delete, sender=Account)
+def account_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    user_id = instance.user_id
+    transaction.on_commit(lambda: bump_accounts_version(user_id))
+
+
+@receiver(post_save, sender=Currency)
+@receiver(post_delete, sender=Currency)
+def currency_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    transaction.on_commit(bump_currency_version)
+
+
+# курсы правятся и в админке, а не только командой load_fx_rates
+@receiver(post_save, sender=FxRate)
+@receiver(post_delete, sender=FxRate)
+def fx_rate_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    transaction.on_commit(bump_fx_version)
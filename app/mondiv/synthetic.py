@@ -0,0 +1,148 @@
+import random
+from datetime import date, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from mondiv.cache import bump_data_version, bump_catalog_version, bump_fx_version
+from mondiv.models import Account, Company, Currency, Dividend, DividendHistory, DividendHistorySync, FxRate, \
+    Report
+from mondiv.rollup import rebuild_rollup
+from mondiv.signals import touch_user_data
+
+# Синтетический портфель для замеров производительности (run_benchmarks) и тестов:
+# пользователи со счетами, выплатами и отчетами за много лет в нескольких валютах.
+# Одинаковый seed дает одинаковые данные.
+
+CURRENCIES = ('USD', 'RUB', 'EUR', 'CNY')
+# сколько стоит единица валюты в USD, от него курсы случайно гуляют
+USD_RATES = {'USD': 1, 'RUB': 0.013, 'EUR': 1.08, 'CNY': 0.14}
+TICKER_PREFIX = 'SYN'
+
+
+def make_companies(count):
+    Company.objects.bulk_create([Company(ticker=f'{TICKER_PREFIX}{i}', name=f'Synthetic Company {i}',
+                                         description=f'Синтетическая компания {i}', status='ready')
+                                 for i in range(count)], ignore_conflicts=True)
+    return list(Company.objects
+                .filter(ticker__in=[f'{TICKER_PREFIX}{i}' for i in range(count)])
+                .order_by('id')
+                .values_list('id', 'ticker'))
+
+
+def make_currencies(count):
+    names = CURRENCIES[:count]
+    existing = set(Currency.objects.filter(name__in=names).values_list('name', flat=True))
+    Currency.objects.bulk_create([Currency(name=n) for n in names if n not in existing])
+    return dict(Currency.objects.filter(name__in=names).values_list('name', 'id'))
+
+
+# курсы каждой валюты к каждой по рабочим дням, как после load_fx_rates
+def make_rates(rnd, currencies, start, end):
+    rows = []
+    day = start
+    while day <= end:
+        if day.weekday() < 5:
+            usd = {n: USD_RATES[n] * rnd.uniform(0.9, 1.1) for n in currencies}
+            for a in currencies:
+                for b in currencies:
+                    if a != b:
+                        rows.append(FxRate(currency_id=currencies[a], base_id=currencies[b], date=day,
+                                           rate=usd[a] / usd[b]))
+        day += timedelta(days=1)
+    FxRate.objects.bulk_create(rows, batch_size=2000, ignore_conflicts=True)
+
+
+# история выплат по тикерам уже синхронизирована, чтобы страницы компаний не ходили в сеть
+def make_history(rnd, tickers, start, end):
+    rows = []
+    for ticker in tickers:
+        day = start
+        while day <= end:
+            rows.append(DividendHistory(ticker=ticker, ex_dividend_date=day, cash_amount=round(rnd.uniform(0.1, 3), 2),
+                                        currency='USD', source='polygon'))
+            day += timedelta(days=91)
+    DividendHistory.objects.bulk_create(rows, batch_size=2000, ignore_conflicts=True)
+    now = timezone.now()
+    DividendHistorySync.objects.bulk_create([DividendHistorySync(ticker=t, synced_at=now, source='polygon')
+                                             for t in tickers], ignore_conflicts=True)
+
+
+# создает users пользователей (логины <prefix>0, <prefix>1, ...) с accounts счетами,
+# dividends выплатами и reports отчетами у каждого за years лет по portfolio компаниям;
+# пароль у всех - password. Рассчитано на пустую базу: повторный запуск добавит счета и выплаты.
+# возвращает словарь с числом созданных записей и id пользователей
+def generate(users=3, accounts=5, companies=200, dividends=1000, reports=200, years=10, currencies=3,
+             portfolio=30, seed=1, prefix='bench', password='bench', rates=True):
+    rnd = random.Random(seed)
+    end = date.today()
+    start = date(end.year - years + 1, 1, 1)
+    days = (end - start).days
+
+    with transaction.atomic():
+        currency_ids = make_currencies(currencies)
+        company_ids = make_companies(companies)
+        password_hash = make_password(password)
+        User.objects.bulk_create([User(username=f'{prefix}{i}', password=password_hash) for i in range(users)],
+                                 ignore_conflicts=True)
+        user_ids = list(User.objects
+                        .filter(username__in=[f'{prefix}{i}' for i in range(users)])
+                        .order_by('id')
+                        .values_list('id', flat=True))
+
+        Account.objects.bulk_create([Account(user_id=u, name=f'Счет {j}') for u in user_ids for j in range(accounts)])
+        account_ids = {}
+        for account_id, user_id in Account.objects.filter(user_id__in=user_ids).values_list('id', 'user_id'):
+            account_ids.setdefault(user_id, []).append(account_id)
+
+        names = list(currency_ids)
+        # основная валюта встречается чаще остальных
+        weights = [len(names) - i for i in range(len(names))]
+        rows, tickers = [], set()
+        for user_id in user_ids:
+            held = rnd.sample(company_ids, min(portfolio, len(company_ids)))
+            tickers.update(t for _, t in held)
+            for _ in range(dividends):
+                rows.append(Dividend(user_id=user_id, company_id=rnd.choice(held)[0],
+                                     date_of_receipt=start + timedelta(days=rnd.randrange(days + 1)),
+                                     payoff=round(rnd.lognormvariate(3, 1), 2),
+                                     currency_id=currency_ids[rnd.choices(names, weights)[0]],
+                                     account_id=rnd.choice(account_ids[user_id])))
+        Dividend.objects.bulk_create(rows, batch_size=2000)
+
+        rows = []
+        for user_id in user_ids:
+            for _ in range(reports):
+                rows.append(Report(user_id=user_id, account_id=rnd.choice(account_ids[user_id]),
+                                   currency_id=currency_ids[rnd.choices(names, weights)[0]],
+                                   report_date=start + timedelta(days=rnd.randrange(days + 1)),
+                                   amount=round(rnd.uniform(1e3, 1e6), 2)))
+        Report.objects.bulk_create(rows, batch_size=2000)
+
+        # bulk_create не вызывает сигналы: сводка, отметки изменений и версии кэша - здесь
+        rebuild_rollup(user_ids)
+        for user_id in user_ids:
+            touch_user_data(user_id)
+        if rates:
+            make_rates(rnd, currency_ids, start, end)
+        make_history(rnd, sorted(tickers), start, end)
+
+        def bump():
+            for user_id in user_ids:
+                bump_data_version(user_id)
+            bump_catalog_version()
+            bump_fx_version()
+        transaction.on_commit(bump)
+
+    return {
+        'users': len(user_ids),
+        'user_ids': user_ids,
+        'accounts': accounts * len(user_ids),
+        'companies': len(company_ids),
+        'currencies': len(currency_ids),
+        'dividends': dividends * len(user_ids),
+        'reports': reports * len(user_ids),
+        'years': years,
+    }
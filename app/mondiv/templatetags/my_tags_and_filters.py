@@ -1,14 +1,32 @@
 import os
 
 from django import template
+from django.urls import reverse
+from django.utils.html import format_html
+
+from mondiv.charts import CHART_CONFIG_VERSION
 
-from mondiv.models import Company
 
 register = template.Library()
 
+# иконка компании: webp с запасным png нужного размера, для старых записей - исходный файл
+@register.simple_tag()
+def company_icon(company, size='small', css_class='img-thumbnail', width=40):
+    if company.icon_hash:
+        return format_html('<picture><source srcset="{}" type="image/webp">'
+                           '<img style="width: {}px" src="{}" class="{}" alt="" loading="lazy"></picture>',
+                           company.icon_thumb_url(size, 'webp'), width, company.icon_thumb_url(size, 'png'),
+                           css_class)
+    if company.icon_image:
+        return format_html('<img style="width: {}px" src="{}" class="{}" alt="" loading="lazy">',
+                           width, company.icon_image.url, css_class)
+    return ''
+
+# адрес статической части графиков с версией: после ее смены браузер загрузит новую
 @register.simple_tag()
-def companies():
-    return Company.objects.all()
+def chart_config_url():
+    return f"{reverse('mondiv:chart_config')}?v={CHART_CONFIG_VERSION}"
+
 
 @register.filter()
 def url_and_apikey(url):
@@ -1,3 +1,973 @@
-from django.test import TestCase
+import gzip
+import io
+import json
+import threading
+from datetime import date
+from decimal import Decimal
+from unittest import mock, skipIf
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from mondiv.autocomplete import MAX_RESULTS, PrefixIndex
+from mondiv.benchmark import endpoints, fetch, reset_state
+from mondiv.catalog import catalog_fragment
+from mondiv.charts import report_label
+from mondiv.export import export_lines
+from mondiv.history import history_rows
+from mondiv.forms import AddReportForm, BatchCompanyForm, SearchCompanyForm
+from mondiv.fx import load_rates
+from mondiv.onboarding import add_companies
+from mondiv.imports import import_rows, read_rows
+from mondiv.metrics import registry
+from mondiv.models import Account, Company, Currency, Dividend, DividendHistory, DividendHistorySync, \
+    MonthlyDividend, Report
+from mondiv.pagination import decode_cursor, encode_cursor, keyset_page
+from mondiv.providers import ProviderError, first_useful, moex
+from mondiv.queries import dividend_total, missing_rates, profile_stats
+from mondiv.responses import CompressionMiddleware, FastJsonResponse, brotli, choose_encoding, dumps
+from mondiv.rollup import rebuild_rollup
+from mondiv.series import bucket_start, densify, dividend_series
+from mondiv.synthetic import generate
+from mondiv.utils import month_name
+
+
+# пользователь с двумя счетами в двух валютах и двумя компаниями
+class PortfolioTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('investor', password='pw12345!x')
+        cls.usd = Currency.objects.create(name='USD')
+        cls.rub = Currency.objects.create(name='RUB')
+        cls.accounts = [Account.objects.create(user=cls.user, name=f'Счет {i}') for i in range(2)]
+        cls.companies = [Company.objects.create(ticker=t, name=f'Company {t}', description='') for t in ('AAA', 'BBB')]
+
+    def dividend(self, **kwargs):
+        values = dict(user=self.user, company=self.companies[0], date_of_receipt=date(2022, 3, 15), payoff=10,
+                      currency=self.usd, account=self.accounts[0])
+        values.update(kwargs)
+        return Dividend.objects.create(**values)
+
+
+# наибольшее число запросов к базе на адрес mondiv/urls.py при пустом кэше в памяти
+# (с запросами сессии и пользователя); у нового адреса должен появиться свой лимит
+QUERY_BUDGETS = {
+    'register_done': 2,
+    'register': 2,
+    'password_change': 2,
+    'profile_change': 3,
+    'profile': 7,
+    'login': 2,
+    'company': 5,
+    'company_autocomplete': 3,
+    'company_status': 3,
+    'proba': 3,
+    'last_year': 4,
+    'last_n_years': 4,
+    'last_n_years_base': 5,
+    'total_for_each_year': 4,
+    'total_for_each_ticker': 4,
+    'total_for_each_ticker_base': 5,
+    'total_for_each_account': 4,
+    'dividend_history': 4,
+    'all_reports': 4,
+    'all_reports_base': 5,
+    'report_in_currency': 4,
+    'dashboard': 8,
+    'dashboard_base': 8,
+    'chart_config': 0,
+    'metrics': 2,
+    'add_company': 4,
+    'add_companies': 2,
+    'add_dividend': 5,
+    'add_report': 4,
+    'report_update': 5,
+    'dividend_update': 6,
+    'report_delete': 4,
+    'dividend_delete': 4,
+    'dividends_received': 4,
+    'report_list': 4,
+    'import': 2,
+    'export_dividends': 3,
+    'export_reports': 3,
+    'index': 2,
+}
+
+
+# число запросов не должно зависеть от числа выплат, отчетов, счетов и компаний пользователя:
+# одни и те же адреса сравниваются у маленького и в десятки раз большего портфеля.
+# Кэш в памяти, чтобы считались только запросы самих представлений; снимок метрик
+# не пишется, чтобы число запросов не зависело от времени
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+                   METRICS_FLUSH_INTERVAL=float('inf'))
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        generate(users=1, accounts=2, companies=60, dividends=20, reports=10, years=3, portfolio=5, prefix='small')
+        generate(users=1, accounts=10, companies=60, dividends=600, reports=200, years=3, portfolio=40,
+                 prefix='large', rates=False)
+        cls.small = User.objects.get(username='small0')
+        cls.large = User.objects.get(username='large0')
+        # /metrics только для персонала
+        User.objects.filter(pk__in=[cls.small.pk, cls.large.pk]).update(is_staff=True)
+
+    # число запросов на каждый адрес {имя: (статус, запросов)}; кэш и состояние процесса
+    # перед каждым запросом сброшены, поэтому число не зависит от порядка и прошлых запросов
+    def count_queries(self, user):
+        self.client.force_login(user)
+        res = {}
+        for name, url, query in endpoints(user):
+            reset_state()
+            with CaptureQueriesContext(connection) as ctx:
+                response, size = fetch(self.client, url, query)
+            res[name] = (response.status_code, len(ctx.captured_queries))
+        return res
+
+    def test_every_url_has_budget(self):
+        names = {name for name, url, query in endpoints(self.small)}
+        self.assertEqual(names, set(QUERY_BUDGETS))
+
+    def test_query_budgets(self):
+        small, large = self.count_queries(self.small), self.count_queries(self.large)
+        for name, budget in QUERY_BUDGETS.items():
+            with self.subTest(name):
+                self.assertEqual(small[name][0], 200)
+                self.assertEqual(large[name][0], 200)
+                self.assertLessEqual(small[name][1], budget)
+                self.assertLessEqual(large[name][1], budget)
+                self.assertEqual(large[name][1], small[name][1], 'число запросов растет с объемом данных')
+
+
+# помесячная сводка, которую ведут сигналы, совпадает с пересчитанной с нуля
+class RollupTests(PortfolioTestCase):
+    def rollup(self):
+        return sorted((r[:4] + (round(r[4], 6), r[5])) for r in MonthlyDividend.objects
+                      .filter(user=self.user)
+                      .values_list('currency_id', 'account_id', 'company_id', 'month', 'total', 'count'))
+
+    def assertRollupRebuilt(self):
+        live = self.rollup()
+        rebuild_rollup([self.user.pk])
+        self.assertEqual(live, self.rollup())
+
+    def test_create_and_edit(self):
+        first = self.dividend(payoff=10)
+        self.dividend(payoff=5.5, date_of_receipt=date(2022, 3, 1))
+        self.dividend(company=self.companies[1])
+        first.payoff = 12.25
+        first.save()
+        self.assertRollupRebuilt()
+        self.assertEqual(MonthlyDividend.objects.get(user=self.user, company=self.companies[0]).total, 17.75)
+
+    def test_move_between_months(self):
+        d = self.dividend()
+        self.dividend(date_of_receipt=date(2022, 4, 2))
+        d.date_of_receipt = date(2022, 4, 30)
+        d.save()
+        self.assertRollupRebuilt()
+        self.assertEqual(self.rollup(), [(self.usd.pk, self.accounts[0].pk, self.companies[0].pk, date(2022, 4, 1),
+                                          20, 2)])
+
+    def test_move_between_accounts_and_currencies(self):
+        d = self.dividend()
+        self.dividend(payoff=3)
+        d.account = self.accounts[1]
+        d.save()
+        self.assertRollupRebuilt()
+        d.currency = self.rub
+        d.payoff = 700
+        d.save()
+        self.assertRollupRebuilt()
+        self.assertEqual(len(self.rollup()), 2)
+
+    def test_delete(self):
+        d = self.dividend()
+        other = self.dividend(payoff=4)
+        d.delete()
+        self.assertRollupRebuilt()
+        other.delete()
+        self.assertRollupRebuilt()
+        self.assertFalse(MonthlyDividend.objects.filter(user=self.user).exists())
+
+
+# график отдается из кэша, пока данные пользователя не изменились
+class ChartCacheTests(PortfolioTestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def totals(self):
+        data = self.client.get(reverse('mondiv:total_for_each_ticker'), {'currency': 'USD', 'compact': 1}).json()
+        return dict(zip(data['labels'], data['series'][0]['data']))
+
+    def hits(self):
+        return registry.counters.get(('mondiv_chart_cache_total',
+                                      (('chart', 'total_for_each_ticker'), ('result', 'hit'))), 0)
+
+    # версия данных меняется после коммита
+    def write(self, action, *args, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return action(*args, **kwargs)
+
+    def test_cached_until_write(self):
+        d = self.write(self.dividend, payoff=10)
+        self.assertEqual(self.totals(), {'Company AAA': 10})
+        hits = self.hits()
+        self.assertEqual(self.totals(), {'Company AAA': 10})
+        self.assertEqual(self.hits(), hits + 1)
+
+        self.write(self.dividend, payoff=5, company=self.companies[1])
+        self.assertEqual(self.totals(), {'Company AAA': 10, 'Company BBB': 5})
+        d.payoff = 7
+        self.write(d.save)
+        self.assertEqual(self.totals(), {'Company AAA': 7, 'Company BBB': 5})
+        self.write(d.delete)
+        self.assertEqual(self.totals(), {'Company BBB': 5})
+
+    def test_other_users_keep_cache(self):
+        self.write(self.dividend, payoff=10)
+        self.totals()
+        other = User.objects.create_user('other', password='pw12345!x')
+        account = Account.objects.create(user=other, name='Счет')
+        self.write(Dividend.objects.create, user=other, company=self.companies[0], date_of_receipt=date(2022, 1, 1),
+                   payoff=1, currency=self.usd, account=account)
+        hits = self.hits()
+        self.assertEqual(self.totals(), {'Company AAA': 10})
+        self.assertEqual(self.hits(), hits + 1)
+
+    # pending компания получает настоящее название из источника: графики с названиями устаревают
+    def test_company_rename(self):
+        self.write(self.dividend)
+        url = reverse('mondiv:total_for_each_ticker')
+        etag = self.client.get(url, {'currency': 'USD'})['ETag']
+        self.assertEqual(self.totals(), {'Company AAA': 10})
+        company = self.companies[0]
+        company.name = 'Apple'
+        self.write(company.save)
+        self.assertEqual(self.totals(), {'Apple': 10})
+        self.assertEqual(self.client.get(url, {'currency': 'USD'}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    # графики "за последние годы" после смены года строятся заново, а не берутся из кэша
+    def test_daily_charts_after_rollover(self):
+        self.write(self.dividend, date_of_receipt=date(2024, 3, 15))
+        url = reverse('mondiv:last_n_years')
+
+        def chart(day):
+            with mock.patch('django.utils.timezone.localdate', return_value=day):
+                response = self.client.get(url, {'currency': 'USD', 'compact': 1})
+            return response['ETag'], [s['label'] for s in response.json()['series']]
+
+        etag, labels = chart(date(2026, 12, 31))
+        self.assertEqual(labels[0], 'Дивиденды за 2024 год в USD')
+        self.assertEqual(chart(date(2026, 12, 31)), (etag, labels))
+        new_etag, labels = chart(date(2027, 1, 1))
+        self.assertNotEqual(new_etag, etag)
+        self.assertEqual(labels, ['Нет дивидендов'] * 3)
+
+
+# условные запросы графиков: 304 по тому же ETag, новый ETag после изменения данных
+class ConditionalChartTests(PortfolioTestCase):
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.dividend()
+        self.url = reverse('mondiv:total_for_each_year')
+
+    def test_not_modified(self):
+        response = self.client.get(self.url, {'currency': 'USD'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.has_header('Last-Modified'))
+        response = self.client.get(self.url, {'currency': 'USD'}, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_changes_after_write(self):
+        etag = self.client.get(self.url, {'currency': 'USD'})['ETag']
+        self.dividend(payoff=3)
+        response = self.client.get(self.url, {'currency': 'USD'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_etag_depends_on_params_and_user(self):
+        etag = self.client.get(self.url, {'currency': 'USD'})['ETag']
+        self.assertNotEqual(self.client.get(self.url, {'currency': 'RUB'})['ETag'], etag)
+        self.client.force_login(User.objects.create_user('other', password='pw12345!x'))
+        response = self.client.get(self.url, {'currency': 'USD'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+# раскладка по интервалам: нули в пропусках, недели с понедельника, месяцы в кварталы и годы
+class DensifyTests(SimpleTestCase):
+    def test_gaps_are_zero(self):
+        rows = [{'bucket': date(2022, 1, 1), 'value': 5}, {'bucket': date(2022, 4, 1), 'value': 2}]
+        buckets, series = densify(rows, 'month', end=date(2022, 5, 20))
+        self.assertEqual(buckets, [date(2022, m, 1) for m in range(1, 6)])
+        self.assertEqual(series, {(): [5, 0, 0, 2, 0]})
+
+    def test_no_rows(self):
+        self.assertEqual(densify([], 'month', end=date(2022, 5, 20)), ([], {(): []}))
+        buckets, series = densify([], 'year', start=date(2020, 6, 1), end=date(2022, 1, 1))
+        self.assertEqual(series, {(): [0, 0, 0]})
+
+    def test_groups_and_coarser_buckets(self):
+        rows = [{'bucket': date(2022, 1, 1), 'company__name': 'A', 'value': 1},
+                {'bucket': date(2022, 2, 1), 'company__name': 'A', 'value': 2},
+                {'bucket': date(2022, 8, 1), 'company__name': 'B', 'value': None},
+                {'bucket': date(2022, 9, 1), 'company__name': 'B', 'value': 4}]
+        buckets, series = densify(rows, 'quarter', start=date(2022, 1, 1), end=date(2022, 12, 31),
+                                  group_by=('company__name',))
+        self.assertEqual(buckets, [date(2022, m, 1) for m in (1, 4, 7, 10)])
+        self.assertEqual(series, {('A',): [3, 0, 0, 0], ('B',): [0, 0, 4, 0]})
+
+    def test_rows_outside_range_skipped(self):
+        rows = [{'bucket': date(2021, 12, 1), 'value': 9}, {'bucket': date(2022, 1, 1), 'value': 1}]
+        self.assertEqual(densify(rows, 'month', start=date(2022, 1, 1), end=date(2022, 2, 1))[1], {(): [1, 0]})
+
+    def test_week_starts_on_monday(self):
+        self.assertEqual(bucket_start(date(2022, 3, 13), 'week'), date(2022, 3, 7))
+        self.assertEqual(bucket_start(date(2022, 3, 14), 'week'), date(2022, 3, 14))
+
+
+class DividendSeriesTests(PortfolioTestCase):
+    def test_weeks_from_raw_dividends(self):
+        # 7 и 13 марта - одна неделя, следующая пустая, 21 марта - третья
+        for day, payoff in ((date(2022, 3, 7), 1), (date(2022, 3, 13), 2), (date(2022, 3, 21), 4)):
+            self.dividend(date_of_receipt=day, payoff=payoff)
+        self.dividend(date_of_receipt=date(2022, 3, 8), payoff=100, currency=self.rub)
+        buckets, series = dividend_series(self.user, 'USD', 'week', start=date(2022, 3, 9), end=date(2022, 3, 27))
+        self.assertEqual(buckets, [date(2022, 3, 7), date(2022, 3, 14), date(2022, 3, 21)])
+        self.assertEqual(series, {(): [3, 0, 4]})
+
+    def test_months_from_rollup(self):
+        self.dividend(date_of_receipt=date(2022, 1, 31), payoff=1)
+        self.dividend(date_of_receipt=date(2022, 3, 1), payoff=2, account=self.accounts[1])
+        buckets, series = dividend_series(self.user, 'USD', 'month', end=date(2022, 4, 1), group_by=('account__name',))
+        self.assertEqual(len(buckets), 4)
+        self.assertEqual(series, {('Счет 0',): [1, 0, 0, 0], ('Счет 1',): [0, 0, 2, 0]})
+
+
+# постраничный список по курсору (дата, id)
+class KeysetPaginationTests(PortfolioTestCase):
+    def setUp(self):
+        # по три выплаты в день: порядок внутри даты задает id
+        self.ids = [self.dividend(date_of_receipt=date(2022, 1, 1 + i // 3)).pk for i in range(11)]
+        self.expected = sorted(self.ids, key=lambda pk: (Dividend.objects.get(pk=pk).date_of_receipt, pk),
+                               reverse=True)
+
+    def test_cursor_round_trip(self):
+        self.assertEqual(decode_cursor(encode_cursor(date(2022, 5, 17), 42)), (date(2022, 5, 17), 42))
+
+    def test_bad_cursor(self):
+        for value in ('', 'garbage', '!!!', encode_cursor(date(2022, 1, 1), 1)[:-4], 'MjAyMi0xMy0wMToy'):
+            self.assertIsNone(decode_cursor(value), value)
+
+    def test_pages_cover_all_rows_once(self):
+        queryset, cursor, seen = Dividend.objects.filter(user=self.user), None, []
+        while True:
+            rows, cursor = keyset_page(queryset, 'date_of_receipt', cursor, size=4)
+            seen += [r.pk for r in rows]
+            if not cursor:
+                break
+        self.assertEqual(seen, self.expected)
+
+    def test_view_pages(self):
+        self.client.force_login(self.user)
+        url, seen = reverse('mondiv:dividends_received'), []
+        params = {'format': 'json', 'limit': 5}
+        while True:
+            data = self.client.get(url, params).json()
+            seen += [r['id'] for r in data['results']]
+            if not data['next']:
+                break
+            params['cursor'] = data['next']
+        self.assertEqual(seen, self.expected)
+
+    def test_view_bad_cursor_starts_over(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('mondiv:dividends_received'), {'format': 'json', 'cursor': 'garbage'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['id'], self.expected[0])
+
+
+# повторная загрузка того же файла не создает дублей
+class ImportTests(PortfolioTestCase):
+    def rows(self):
+        return [
+            {'date': '2022-03-15', 'ticker': 'aaa', 'currency': 'usd', 'account': 'Счет 0', 'payoff': '10'},
+            {'date': '16.03.2022', 'ticker': 'BBB', 'currency': 'RUB', 'account': 'Счет 1', 'payoff': '1 250,5'},
+        ]
+
+    def test_reimport_is_duplicate(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(import_rows(self.user, 'dividends', self.rows()),
+                             {'created': 2, 'duplicates': 0, 'errors': []})
+        self.assertEqual(import_rows(self.user, 'dividends', self.rows()),
+                         {'created': 0, 'duplicates': 2, 'errors': []})
+        self.assertEqual(Dividend.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(MonthlyDividend.objects.get(user=self.user, currency=self.rub).total, 1250.5)
+
+    def test_duplicates_inside_file_and_existing(self):
+        self.dividend()
+        rows = self.rows() + self.rows()
+        result = import_rows(self.user, 'dividends', rows)
+        self.assertEqual((result['created'], result['duplicates']), (1, 3))
+
+    def test_other_user_rows_are_not_duplicates(self):
+        other = User.objects.create_user('other')
+        Account.objects.create(user=other, name='Счет 0')
+        import_rows(other, 'dividends', self.rows()[:1])
+        self.assertEqual(import_rows(self.user, 'dividends', self.rows())['created'], 2)
+
+    def test_errors_are_reported_by_line(self):
+        rows = self.rows() + [
+            {'date': '2022-13-01', 'ticker': 'AAA', 'currency': 'USD', 'account': 'Счет 0', 'payoff': '1'},
+            {'date': '2022-03-01', 'ticker': 'ZZZ', 'currency': 'USD', 'account': 'Счет 0', 'payoff': '1'},
+            {'date': '2022-03-01', 'ticker': 'AAA', 'currency': 'EUR', 'account': 'Счет 0', 'payoff': '1'},
+            {'date': '2022-03-01', 'ticker': 'AAA', 'currency': 'USD', 'account': 'Чужой', 'payoff': 'x'},
+        ]
+        result = import_rows(self.user, 'dividends', rows)
+        self.assertEqual(result['created'], 2)
+        self.assertEqual([line for line, _ in result['errors']], [4, 5, 6, 7])
+
+    def test_json_values_of_wrong_type(self):
+        rows = read_rows(io.StringIO(json.dumps([
+            {'date': '2022-03-15', 'ticker': 'AAA', 'currency': 'USD', 'account': ['Счет 0'], 'payoff': 1},
+            {'date': '2022-03-15', 'ticker': {'x': 1}, 'currency': 'USD', 'account': 'Счет 0', 'payoff': 1},
+            {'date': '2022-03-15', 'ticker': 'AAA', 'currency': 'USD', 'account': 'Счет 0', 'payoff': 2.5},
+            {'date': '2022-03-15', 'ticker': 'AAA', 'currency': None, 'account': 'Счет 0', 'payoff': 1},
+        ])))
+        result = import_rows(self.user, 'dividends', rows)
+        self.assertEqual(result['created'], 1)
+        self.assertEqual([line for line, _ in result['errors']], [2, 3, 5])
+
+    # сводка обновляется только по затронутым месяцам и совпадает с пересчетом целиком
+    def test_rollup_after_import(self):
+        self.dividend(payoff=1)
+        self.dividend(date_of_receipt=date(2021, 1, 5))
+        import_rows(self.user, 'dividends', self.rows() + [
+            {'date': '2022-03-20', 'ticker': 'AAA', 'currency': 'USD', 'account': 'Счет 0', 'payoff': '4'}])
+        live = sorted(MonthlyDividend.objects.filter(user=self.user).values_list('month', 'company_id', 'total',
+                                                                                 'count'))
+        rebuild_rollup([self.user.pk])
+        self.assertEqual(live, sorted(MonthlyDividend.objects.filter(user=self.user)
+                                      .values_list('month', 'company_id', 'total', 'count')))
+        self.assertIn((date(2022, 3, 1), self.companies[0].pk, 15, 3), live)
+
+    def test_reports(self):
+        rows = [{'report_date': '2022-01-10', 'currency': 'USD', 'account': 'Счет 0', 'amount': '100'}]
+        self.assertEqual(import_rows(self.user, 'reports', rows)['created'], 1)
+        self.assertEqual(import_rows(self.user, 'reports', rows)['duplicates'], 1)
+        self.assertEqual(Report.objects.filter(user=self.user).count(), 1)
+
+    def test_export_round_trip(self):
+        self.dividend()
+        self.dividend(payoff=3.3333, currency=self.rub, account=self.accounts[1])
+        for fmt in ('csv', 'ndjson'):
+            rows = read_rows(io.StringIO(''.join(export_lines(self.user, 'dividends', fmt))))
+            self.assertEqual(import_rows(self.user, 'dividends', rows),
+                             {'created': 0, 'duplicates': 2, 'errors': []}, fmt)
+
+    def test_view(self):
+        self.client.force_login(self.user)
+        body = 'date,ticker,currency,account,payoff\n2022-03-15,AAA,USD,Счет 0,10\n'
+        for _ in range(2):
+            file = io.BytesIO(body.encode())
+            file.name = 'dividends.csv'
+            self.client.post(reverse('mondiv:import'), {'kind': 'dividends', 'file': file})
+        self.assertEqual(Dividend.objects.filter(user=self.user).count(), 1)
+
+
+# пересчет в базовую валюту: курс на начало месяца сводки - ближайший предыдущий,
+# до первого курса - самый ранний; валюты без курса перечислены в missing_rates
+class FxTests(PortfolioTestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+        self.eur = Currency.objects.create(name='EUR')
+        self.dividend(payoff=10)
+        self.dividend(payoff=700, currency=self.rub)
+        self.dividend(payoff=300, currency=self.rub, date_of_receipt=date(2021, 6, 10))
+        self.dividend(payoff=5, currency=self.eur)
+        self.load([('2022-01-01', 0.0125), ('2022-03-01', 0.01), ('2022-04-01', 0.02)])
+
+    def load(self, rates):
+        with self.captureOnCommitCallbacks(execute=True):
+            return load_rates([{'date': day, 'currency': 'RUB', 'base': 'USD', 'rate': rate} for day, rate in rates])
+
+    def years(self, **params):
+        data = self.client.get(reverse('mondiv:total_for_each_year'), dict(params, compact=1)).json()
+        return data, dict(zip(data['labels'], data['series'][0]['data']))
+
+    def test_load_rates(self):
+        self.assertEqual(self.load([('2022-03-01', 0.01)]), {'loaded': 2, 'errors': []})
+        result = load_rates([{'date': '2022-03-01', 'currency': 'RUB', 'base': 'RUB', 'rate': 1},
+                             {'date': '2022-03-01', 'currency': 'XXX', 'base': 'USD', 'rate': 1},
+                             {'date': '2022-03-01', 'currency': 'RUB', 'base': 'USD', 'rate': 'x'}])
+        self.assertEqual([line for line, _ in result['errors']], [2, 3, 4])
+        self.assertEqual(result['loaded'], 0)
+
+    def test_total_in_base(self):
+        self.assertAlmostEqual(dividend_total(self.user, 'USD'), 10 + 700 * 0.01 + 300 * 0.0125)
+        # обратный курс сохраняется вместе с прямым
+        self.assertAlmostEqual(dividend_total(self.user, 'RUB'), 10 * 100 + 700 + 300)
+
+    def test_missing_rates(self):
+        self.assertEqual(missing_rates(self.user, 'USD'), ['EUR'])
+        self.assertEqual(missing_rates(self.user, 'RUB'), ['EUR'])
+        self.assertEqual(missing_rates(self.user, 'EUR'), ['RUB', 'USD'])
+
+    def test_chart_in_base(self):
+        data, years = self.years(base_currency='USD')
+        self.assertAlmostEqual(years[2021], 3.75)
+        self.assertAlmostEqual(years[2022], 17)
+        self.assertEqual(data['missing_rates'], ['EUR'])
+        self.assertNotIn('missing_rates', self.years(currency='USD')[0])
+
+    def test_dashboard_matches_chart(self):
+        data = self.client.get(reverse('mondiv:dashboard'), {'base_currency': 'USD', 'compact': 1}).json()
+        self.assertEqual(list(data), ['USD', 'missing_rates'])
+        self.assertEqual(data['missing_rates'], ['EUR'])
+        chart = data['USD']['total_for_each_year']
+        self.assertEqual(dict(zip(chart['labels'], chart['series'][0]['data'])), self.years(base_currency='USD')[1])
+
+    def test_new_rates_invalidate_chart(self):
+        url = reverse('mondiv:total_for_each_year')
+        etag = self.client.get(url, {'base_currency': 'USD'})['ETag']
+        self.assertAlmostEqual(self.years(base_currency='USD')[1][2022], 17)
+        self.load([('2022-03-01', 0.02)])
+        self.assertAlmostEqual(self.years(base_currency='USD')[1][2022], 24)
+        self.assertEqual(self.client.get(url, {'base_currency': 'USD'}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_profile(self):
+        response = self.client.get(reverse('mondiv:profile'))
+        self.assertEqual(response.context['base_currency'], 'USD')
+        self.assertEqual(response.context['missing_rates'], ['EUR'])
+        self.assertContains(response, 'Нет курсов EUR к USD')
+
+
+# сжатие ответов по Accept-Encoding и слабый ETag у сжатого ответа
+@override_settings(COMPRESS_MIN_SIZE=100)
+class CompressionTests(SimpleTestCase):
+    def respond(self, response, accept='gzip, deflate'):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept)
+        return CompressionMiddleware(lambda r: response)(request)
+
+    def big(self):
+        return FastJsonResponse({'data': list(range(200))})
+
+    def test_dumps(self):
+        self.assertEqual(dumps({'d': date(2022, 3, 1), 'x': Decimal('1.5')}), b'{"d":"2022-03-01","x":1.5}')
+
+    def test_negotiation(self):
+        self.assertEqual(choose_encoding('gzip, deflate, br'), 'br' if brotli else 'gzip')
+        self.assertIsNone(choose_encoding('gzip;q=0, deflate'))
+        self.assertIsNone(choose_encoding(''))
+        with mock.patch('mondiv.responses.brotli', object()):
+            self.assertEqual(choose_encoding('gzip, br;q=0.5'), 'br')
+            self.assertEqual(choose_encoding('gzip, br;q=0'), 'gzip')
+        with mock.patch('mondiv.responses.brotli', None):
+            self.assertEqual(choose_encoding('br, gzip'), 'gzip')
+            self.assertIsNone(choose_encoding('br'))
+
+    def test_gzip(self):
+        content = self.big().content
+        response = self.respond(self.big())
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(gzip.decompress(response.content), content)
+        self.assertEqual(response['Content-Length'], str(len(response.content)))
+
+    @skipIf(brotli is None, 'brotli не установлен')
+    def test_brotli(self):
+        response = self.respond(self.big(), 'gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(response.content), self.big().content)
+
+    def test_not_compressed(self):
+        response = self.respond(self.big(), '')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        response = self.respond(FastJsonResponse({'data': 1}))
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertFalse(response.has_header('Vary'))
+        response = self.respond(HttpResponse(b'x' * 1000, content_type='image/png'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_streaming(self):
+        lines = [dumps({'n': i}) + b'\n' for i in range(3)]
+        response = self.respond(StreamingHttpResponse(iter(lines), content_type='application/x-ndjson'))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), b''.join(lines))
+
+    def test_weak_etag(self):
+        response = self.big()
+        response['ETag'] = '"abc"'
+        self.assertEqual(self.respond(response)['ETag'], 'W/"abc"')
+        response = self.big()
+        response['ETag'] = '"abc"'
+        self.assertEqual(self.respond(response, '')['ETag'], '"abc"')
+
+
+# сжатый график отдается 304 по слабому ETag
+@override_settings(COMPRESS_MIN_SIZE=0)
+class CompressedChartTests(PortfolioTestCase):
+    def test_not_modified_by_weak_etag(self):
+        self.client.force_login(self.user)
+        self.dividend()
+        url = reverse('mondiv:total_for_each_year')
+        response = self.client.get(url, {'currency': 'USD'}, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertTrue(response['ETag'].startswith('W/"'))
+        self.assertEqual(gzip.decompress(response.content), self.client.get(url, {'currency': 'USD'}).content)
+        response = self.client.get(url, {'currency': 'USD'}, HTTP_ACCEPT_ENCODING='gzip',
+                                   HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+
+# страница профиля: графики по всем валютам выплат и отчетов
+class ProfileTests(PortfolioTestCase):
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_currency_with_reports_only(self):
+        self.dividend()
+        Report.objects.create(user=self.user, account=self.accounts[1], currency=self.rub,
+                              report_date=date(2022, 3, 31), amount=1000)
+        response = self.client.get(reverse('mondiv:profile'))
+        self.assertEqual(response.context['currencies'], ['RUB', 'USD'])
+        self.assertContains(response, 'id="all_reports_RUB"')
+        self.assertContains(response, 'id="report_in_currency_RUB"')
+        self.assertContains(response, 'currency=RUB&currency=USD&')
+
+    def test_no_data(self):
+        self.assertEqual(self.client.get(reverse('mondiv:profile')).context['currencies'], ['USD'])
+
+
+# история выплат со страницы компании: при сбое источника отдается сохраненная,
+# и следующие просмотры не ждут источник до HISTORY_RETRY_AFTER
+class HistoryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        DividendHistory.objects.create(ticker='AAA', ex_dividend_date=date(2022, 3, 1), cash_amount=0.5,
+                                       source='polygon')
+
+    @mock.patch('mondiv.history.first_useful', side_effect=ProviderError('таймаут'))
+    def test_provider_error_backs_off(self, first_useful):
+        with self.assertLogs('mondiv.history', 'WARNING'):
+            self.assertEqual(history_rows('aaa', 10), [(date(2022, 3, 1), 0.5)])
+        self.assertEqual(history_rows('AAA', 10), [(date(2022, 3, 1), 0.5)])
+        self.assertEqual(first_useful.call_count, 1)
+        self.assertFalse(DividendHistorySync.objects.exists())
+
+    @mock.patch('mondiv.history.first_useful')
+    def test_sync_adds_newer_rows(self, first_useful):
+        first_useful.return_value = (moex, [{'ex_dividend_date': date(2022, 6, 1), 'cash_amount': 0.7}])
+        self.assertEqual(history_rows('AAA', 10), [(date(2022, 3, 1), 0.5), (date(2022, 6, 1), 0.7)])
+        self.assertEqual(first_useful.call_args.args, ('dividends', 'AAA', date(2022, 3, 1)))
+        # свежая история в источнике не сверяется
+        history_rows('AAA', 10)
+        self.assertEqual(first_useful.call_count, 1)
+        self.assertEqual(DividendHistorySync.objects.get(ticker='AAA').source, 'moex')
+
+    def test_view_blank_ticker(self):
+        user = User.objects.create_user('investor', password='pw12345!x')
+        self.client.force_login(user)
+        self.assertEqual(self.client.get(reverse('mondiv:dividend_history'), {'ticker': ' '}).status_code, 400)
+
+
+# тикер из форм добавления компаний помещается в Company.ticker
+class AddCompanyTests(TestCase):
+    def test_ticker_validation(self):
+        for ticker, valid in (('aapl', True), (' brk.b ', True), ('RDS-A', True), ('ABCDEFGH', True),
+                              ('ABCDEFGHI', False), ('ABCDEFGHIJ', False), ('SBER;', False), ('ГАЗП', False)):
+            self.assertEqual(SearchCompanyForm({'ticker': ticker}).is_valid(), valid, ticker)
+        form = SearchCompanyForm({'ticker': ' brk.b '})
+        form.is_valid()
+        self.assertEqual(form.cleaned_data['ticker'], 'BRK.B')
+        form = BatchCompanyForm({'tickers': 'aapl, ABCDEFGHI ГАЗП'})
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors['tickers'], ['Неверные тикеры: ABCDEFGHI, ГАЗП'])
+
+    def test_view_rejects_long_ticker(self):
+        self.client.force_login(User.objects.create_user('investor', password='pw12345!x'))
+        response = self.client.post(reverse('mondiv:add_company'), {'ticker': 'ABCDEFGHIJ'})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Company.objects.exists())
+
+
+# в формах выплат и отчетов можно выбрать только свои счета
+class AccountScopeTests(PortfolioTestCase):
+    def setUp(self):
+        cache.clear()
+        self.other = User.objects.create_user('other', password='pw12345!x')
+        self.other_account = Account.objects.create(user=self.other, name='Чужой счет')
+        self.data = {'account': self.other_account.pk, 'currency': self.usd.pk, 'report_date': '2022-03-31',
+                     'amount': 100}
+
+    def test_report_form(self):
+        form = AddReportForm(self.data, user=self.user)
+        self.assertFalse(form.is_valid())
+        self.assertIn('account', form.errors)
+        self.assertEqual([pk for pk, _ in form.fields['account'].choices if pk],
+                         [a.pk for a in self.accounts])
+        self.assertTrue(AddReportForm(dict(self.data, account=self.accounts[0].pk), user=self.user).is_valid())
+
+    def test_add_report_view(self):
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('mondiv:add_report'), self.data)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, 'Чужой счет')
+        self.assertFalse(Report.objects.exists())
+
+    def test_new_account_in_choices(self):
+        self.assertEqual(len(AddReportForm(user=self.user).fields['account'].choices), 3)
+        with self.captureOnCommitCallbacks(execute=True):
+            Account.objects.create(user=self.user, name='Счет 2')
+        self.assertEqual(len(AddReportForm(user=self.user).fields['account'].choices), 4)
+
+
+class FakeProvider:
+    def __init__(self, name, result=None, delay=0, error=None, release=None):
+        self.name, self.result, self.delay, self.error, self.release = name, result, delay, error, release
+
+    def dividends(self, ticker):
+        if self.delay:
+            self.release.wait(self.delay)
+        if self.error:
+            raise ProviderError(self.error)
+        return self.result
+
+
+# первый непустой ответ по приоритету источников, не дольше deadline
+class FirstUsefulTests(SimpleTestCase):
+    def setUp(self):
+        # медленные источники ждут этого события, чтобы не занимать пул после теста
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+
+    def provider(self, name, result=None, delay=0, error=None):
+        return FakeProvider(name, result, delay, error, self.release)
+
+    def test_priority(self):
+        first, second = self.provider('first', ['a'], delay=0.1), self.provider('second', ['b'])
+        self.assertEqual(first_useful('dividends', 'AAA', providers=[first, second], deadline=5), (first, ['a']))
+
+    def test_empty_first(self):
+        first, second = self.provider('first', []), self.provider('second', ['b'], delay=0.05)
+        self.assertEqual(first_useful('dividends', 'AAA', providers=[first, second], deadline=5), (second, ['b']))
+
+    def test_slow_first_skipped_after_deadline(self):
+        first, second = self.provider('first', ['a'], delay=5), self.provider('second', ['b'])
+        self.assertEqual(first_useful('dividends', 'AAA', providers=[first, second], deadline=0.2), (second, ['b']))
+
+    def test_nothing_found(self):
+        providers = [self.provider('first', []), self.provider('second', None)]
+        self.assertIsNone(first_useful('dividends', 'AAA', providers=providers, deadline=5))
+
+    def test_errors(self):
+        first, second = self.provider('first', error='503'), self.provider('second', ['b'])
+        self.assertEqual(first_useful('dividends', 'AAA', providers=[first, second], deadline=5), (second, ['b']))
+        with self.assertLogs('mondiv.providers', 'WARNING'), self.assertRaisesMessage(ProviderError, '503'):
+            first_useful('dividends', 'AAA', providers=[first, self.provider('second', [])], deadline=5)
+
+    def test_deadline(self):
+        providers = [self.provider('first', ['a'], delay=5), self.provider('second', ['b'], delay=5)]
+        with self.assertLogs('mondiv.providers', 'WARNING'), self.assertRaisesMessage(ProviderError, 'таймаут'):
+            first_useful('dividends', 'AAA', providers=providers, deadline=0.1)
+
+
+# поиск компаний по префиксу тикера или слова названия
+class PrefixIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.index = PrefixIndex([(1, 'A', 'Agilent Technologies'), (2, 'AA', 'Alcoa'), (3, 'AAPL', 'Apple Inc'),
+                                  (4, 'MSFT', 'Microsoft'), (5, 'ZZZ', 'Big Apple Holdings')])
+
+    def pks(self, query, limit=10):
+        return [pk for pk, _, _ in self.index.search(query, limit)]
+
+    def test_ticker_before_name(self):
+        # сначала тикеры по длине, затем названия
+        self.assertEqual(self.pks('a'), [1, 2, 3, 5])
+        self.assertEqual(self.pks('aap'), [3])
+        # среди названий выше более короткий совпавший ключ: слово 'apple' короче 'apple inc'
+        self.assertEqual(self.pks('apple'), [5, 3])
+
+    def test_case_and_words(self):
+        self.assertEqual(self.pks('  aApL '), [3])
+        self.assertEqual(self.pks('HOLD'), [5])
+        self.assertEqual(self.pks('technologies'), [1])
+        self.assertEqual(self.index.search('msft'), [(4, 'MSFT', 'Microsoft')])
+
+    def test_prefix_bounds(self):
+        self.assertEqual(self.pks('ab'), [])
+        self.assertEqual(self.pks('z'), [5])
+        self.assertEqual(self.pks(''), [])
+        self.assertEqual(self.pks('   '), [])
+
+    def test_limit(self):
+        self.assertEqual(self.pks('a', limit=2), [1, 2])
+
+    # точное совпадение тикера не теряется среди множества названий с тем же префиксом
+    def test_exact_ticker_among_many_names(self):
+        index = PrefixIndex([(i, f'X{i}', f'Test {i}') for i in range(1, 500)] + [(500, 'T', 'Tiny')])
+        self.assertEqual([pk for pk, _, _ in index.search('t', 1)], [500])
+        self.assertEqual(len(index.search('t', 15)), 15)
+
+
+class AutocompleteViewTests(PortfolioTestCase):
+    def setUp(self):
+        cache.clear()
+        reset_state()
+        self.client.force_login(self.user)
+
+    def search(self, q, **params):
+        return self.client.get(reverse('mondiv:company_autocomplete'), dict(params, q=q)).json()['results']
+
+    def test_results(self):
+        self.assertEqual(self.search('bb'), [{'id': self.companies[1].pk, 'text': 'Company BBB (BBB)'}])
+        self.assertEqual(len(self.search('company')), 2)
+        self.assertEqual(self.search(''), [])
+
+    def test_limit(self):
+        Company.objects.bulk_create([Company(ticker=f'C{i}', name=f'Corp {i}', description='') for i in range(30)])
+        reset_state()
+        self.assertEqual(len(self.search('c')), 10)
+        self.assertEqual(len(self.search('c', limit=5)), 5)
+        self.assertEqual(len(self.search('c', limit=1000)), MAX_RESULTS)
+
+    @mock.patch('mondiv.autocomplete.INDEX_CHECK_INTERVAL', 0)
+    def test_catalog_changes(self):
+        self.assertEqual(self.search('new'), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            company = Company.objects.create(ticker='NEW', name='Newco', description='')
+        self.assertEqual([r['id'] for r in self.search('new')], [company.pk])
+        company.status = 'failed'
+        with self.captureOnCommitCallbacks(execute=True):
+            company.save()
+        self.assertEqual(self.search('new'), [])
+
+
+# html каталога компаний из кэша до любого изменения компаний
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+                   COMPANY_FETCH_IN_BACKGROUND=False)
+class CatalogCacheTests(PortfolioTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def write(self, action, *args, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return action(*args, **kwargs)
+
+    def test_cached(self):
+        html = catalog_fragment(1)
+        self.assertIn('Company AAA', html)
+        with self.assertNumQueries(0):
+            self.assertEqual(catalog_fragment(1), html)
+
+    def test_create_and_rename(self):
+        catalog_fragment(1)
+        company = self.write(Company.objects.create, ticker='NEW', name='Newco', description='')
+        self.assertIn('Newco', catalog_fragment(1))
+        company.name = 'Renamed Inc'
+        self.write(company.save)
+        html = catalog_fragment(1)
+        self.assertIn('Renamed Inc', html)
+        self.assertNotIn('Newco', html)
+
+    def test_batch_add(self):
+        catalog_fragment(1)
+        self.write(add_companies, ['zzz', 'AAA'])
+        self.assertIn('ZZZ', catalog_fragment(1))
+
+
+# сводные графики и статистика профиля на неизменных данных: значения совпадают с посчитанными
+# по отдельным выплатам и с отдельными адресами графиков
+@mock.patch('django.utils.timezone.localdate', return_value=date(2022, 6, 30))
+class DashboardParityTests(PortfolioTestCase):
+    CHARTS = ('total_for_each_year', 'last_year', 'last_n_years', 'total_for_each_ticker', 'total_for_each_account',
+              'all_reports', 'report_in_currency')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+        aaa, bbb = self.companies
+        for company, account, day, payoff, currency in (
+                (aaa, 0, date(2021, 11, 10), 10, self.usd),
+                (aaa, 0, date(2022, 3, 15), 20, self.usd),
+                (bbb, 1, date(2022, 3, 20), 5, self.usd),
+                (bbb, 0, date(2022, 6, 1), 7.5, self.usd),
+                (aaa, 1, date(2020, 5, 5), 1000, self.rub),
+                (bbb, 1, date(2022, 1, 10), 300, self.rub)):
+            self.dividend(company=company, account=self.accounts[account], date_of_receipt=day, payoff=payoff,
+                          currency=currency)
+        for account, day, amount, currency in (
+                (0, date(2022, 1, 31), 100, self.usd),
+                (1, date(2022, 1, 31), 50, self.usd),
+                (0, date(2022, 2, 28), 120, self.usd),
+                (1, date(2022, 1, 31), 5000, self.rub)):
+            Report.objects.create(user=self.user, account=self.accounts[account], report_date=day, amount=amount,
+                                  currency=currency)
+
+    def dashboard(self):
+        return self.client.get(reverse('mondiv:dashboard'), {'compact': 1}).json()
+
+    def values(self, chart):
+        return {s['label']: s['data'] for s in chart['series']}
+
+    def test_same_as_single_charts(self, localdate):
+        data = self.dashboard()
+        self.assertEqual(list(data), ['RUB', 'USD'])
+        for currency in data:
+            for name in self.CHARTS:
+                single = self.client.get(reverse(f'mondiv:{name}'), {'currency': currency, 'compact': 1}).json()
+                self.assertEqual(data[currency][name], single, f'{currency} {name}')
+
+    def test_dividend_values(self, localdate):
+        usd, rub = self.dashboard()['USD'], self.dashboard()['RUB']
+        self.assertEqual(usd['total_for_each_year']['labels'], [2021, 2022])
+        self.assertEqual(list(self.values(usd['total_for_each_year']).values()), [[10, 32.5]])
+        self.assertEqual(rub['total_for_each_year']['labels'], [2020, 2021, 2022])
+        self.assertEqual(list(self.values(rub['total_for_each_year']).values()), [[1000, 0, 300]])
+        self.assertEqual(dict(zip(usd['total_for_each_ticker']['labels'],
+                                  usd['total_for_each_ticker']['series'][0]['data'])),
+                         {'Company AAA': 30, 'Company BBB': 12.5})
+        self.assertEqual(dict(zip(usd['total_for_each_account']['labels'],
+                                  usd['total_for_each_account']['series'][0]['data'])),
+                         {'Счет 0': 37.5, 'Счет 1': 5})
+        # последние 12 месяцев: с июля 2021 по июнь 2022
+        self.assertEqual(usd['last_year']['labels'][0], month_name(date(2021, 7, 1)))
+        self.assertEqual(usd['last_year']['series'][0]['data'], [0, 0, 0, 0, 10, 0, 0, 0, 25, 0, 0, 7.5])
+        self.assertEqual(self.values(usd['last_n_years']), {
+            'Нет дивидендов': [0] * 12,
+            'Дивиденды за 2021 год в USD': [0] * 10 + [10, 0],
+            'Дивиденды за 2022 год в USD': [0, 0, 25, 0, 0, 7.5] + [0] * 6,
+        })
+
+    def test_report_values(self, localdate):
+        usd = self.dashboard()['USD']
+        self.assertEqual(usd['report_in_currency']['labels'],
+                         [report_label(date(2022, 1, 31)), report_label(date(2022, 2, 28))])
+        self.assertEqual(usd['report_in_currency']['series'][0]['data'], [150, 120])
+        self.assertEqual(self.values(usd['all_reports']), {'Счет 0': [100, 120], 'Счет 1': [50, None]})
+
+    # статистика одним запросом совпадает с посчитанной по выплатам каждой валюты
+    def test_profile_stats(self, localdate):
+        expected = []
+        for currency in (self.rub, self.usd):
+            mine = list(Dividend.objects.filter(user=self.user, currency=currency).select_related('company'))
+            low = min(mine, key=lambda d: (d.payoff, d.pk))
+            high = max(mine, key=lambda d: (d.payoff, d.pk))
+            expected.append({'name': currency.name, 'total': sum(d.payoff for d in mine), 'number_payments': len(mine),
+                             'min_payoff': low.payoff, 'max_payoff': high.payoff,
+                             'min_company': low.company.name, 'max_company': high.company.name})
+        stats = [s for s in profile_stats(self.user) if s['number_payments']]
+        self.assertEqual(stats, expected)
+        self.assertEqual(expected[1]['total'], 42.5)
+        self.assertEqual(self.client.get(reverse('mondiv:profile')).context['stats'], expected)
+
+    def test_profile_stats_other_user(self, localdate):
+        other = User.objects.create_user('other')
+        self.assertEqual([s for s in profile_stats(other) if s['number_payments']], [])
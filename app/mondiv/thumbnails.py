@@ -0,0 +1,47 @@
+import hashlib
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, UnidentifiedImageError
+
+# уменьшенные копии иконок: имя файла - хэш содержимого исходника, поэтому одинаковые иконки
+# хранятся один раз, а файл по имени никогда не меняется (nginx отдает их как immutable)
+THUMB_DIR = 'images/icon/thumbs'
+# размер в пикселях с запасом для экранов с двойной плотностью
+THUMB_SIZES = {'small': 80, 'large': 256}
+THUMB_FORMATS = {
+    'webp': {'format': 'WEBP', 'quality': 85, 'method': 6},
+    'png': {'format': 'PNG', 'optimize': True},
+}
+
+
+def thumb_name(icon_hash, size, fmt):
+    return f'{THUMB_DIR}/{icon_hash[:2]}/{icon_hash}-{THUMB_SIZES[size]}.{fmt}'
+
+
+def thumb_url(icon_hash, size, fmt):
+    return default_storage.url(thumb_name(icon_hash, size, fmt))
+
+
+# строит все варианты иконки и возвращает хэш, '' если это не картинка
+def build_thumbnails(content):
+    try:
+        image = Image.open(BytesIO(content))
+        image.load()
+    except (UnidentifiedImageError, OSError):
+        return ''
+    image = image.convert('RGBA')
+    icon_hash = hashlib.sha256(content).hexdigest()[:32]
+
+    for size, px in THUMB_SIZES.items():
+        thumb = image.copy()
+        thumb.thumbnail((px, px), Image.LANCZOS)
+        for fmt, options in THUMB_FORMATS.items():
+            name = thumb_name(icon_hash, size, fmt)
+            if default_storage.exists(name):
+                continue
+            buf = BytesIO()
+            thumb.save(buf, **options)
+            default_storage.save(name, ContentFile(buf.getvalue()))
+    return icon_hash
@@ -13,6 +13,8 @@ urlpatterns = [
     path('accounts/profile/', profile, name='profile'),
     path('accounts/login/', MDLoginView.as_view(), name='login'),
     path('company/<int:company_pk>/', ShowCompany.as_view(), name='company'),
+    path('company_autocomplete/', company_autocomplete, name='company_autocomplete'),
+    path('company/<int:company_pk>/status/', company_status, name='company_status'),
     path('proba/', proba, name='proba'),
     path('last_year/', last_year, name='last_year'),
     path('last_n_years/', last_n_years, name='last_n_years'),
@@ -22,7 +24,11 @@ urlpatterns = [
     path('dividend_history/', dividend_history, name='dividend_history'),
     path('all_reports/', all_reports, name='all_reports'),
     path('report_in_currency/', report_in_currency, name='report_in_currency'),
+    path('dashboard/', dashboard, name='dashboard'),
+    path('charts/config/', chart_config, name='chart_config'),
+    path('metrics', metrics, name='metrics'),
     path('add_company/', add_company, name='add_company'),
+    path('add_companies/', add_companies_view, name='add_companies'),
     path('add_dividend/', AddDividendView.as_view(), name='add_dividend'),
     path('add_report/', AddReportView.as_view(), name='add_report'),
     path('report_update/<int:report_pk>/', ReportdUpdateView.as_view(), name='report_update'),
@@ -31,5 +37,7 @@ urlpatterns = [
     path('dividend_delete/<int:div_pk>/', DividendDeleteView.as_view(), name='dividend_delete'),
     path('dividends_received/', DividendsReceivedView.as_view(), name='dividends_received'),
     path('report_list/', ReportListView.as_view(), name='report_list'),
+    path('import/', import_statements, name='import'),
+    path('export/<str:kind>/', export, name='export'),
     path('', index, name='index'),
 ]
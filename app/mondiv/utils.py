@@ -1,18 +1,23 @@
-import os
-from datetime import datetime
+from dateutil.relativedelta import relativedelta
+from django.utils import timezone
+from django.utils.dates import MONTHS
 
-from polygon import RESTClient
+# название месяца по номеру, не зависит от системной локали
+def month_name(day):
+    return str(MONTHS[day.month])
 
-client = RESTClient(os.environ.get("POLYGON_API_KEY") or 'slfhowwfy')
+def get_month_list():
+    return [str(MONTHS[m]) for m in range(1, 13)]
 
-def get_upl_and_apiKey(url):
-    return url+'?apiKey='+os.environ.get('POLYGON_API_KEY')
+# целый параметр запроса в пределах [1, maximum], при ошибке - значение по умолчанию
+def int_param(value, default, maximum):
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return default
+    return min(max(value, 1), maximum)
 
-def get_month_list():
-    ps = []
-    count = 0
-    for r in range(1, 13):
-        qw = datetime(year=2020, month=r, day=1)
-        ps.append(qw.strftime("%B"))
-        count = count + 1
-    return ps
\ No newline at end of file
+# первый месяц графика "за последний год": 12 месяцев, включая текущий;
+# сегодня - по часовому поясу сайта, как в ETag и ключе кэша графиков
+def last_year_start():
+    return timezone.localdate().replace(day=1) - relativedelta(months=11)
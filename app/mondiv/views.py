@@ -1,35 +1,63 @@
-import os
+import csv
 
-from bootstrap_datepicker_plus.widgets import DatePickerInput
-from dateutil.relativedelta import relativedelta
+from django.conf import settings
 from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.models import User
 from django.contrib.auth.views import LoginView, LogoutView, PasswordChangeView
 from django.contrib.messages.views import SuccessMessageMixin
-from django.db.models import F, Count, Sum, DateField, Min, Subquery
-from django.db.models.functions import TruncMonth, TruncYear
-from django.http import JsonResponse, HttpResponseRedirect, Http404
+from django.db import transaction
+from django.db.models import Sum
+from django.http import HttpResponse, HttpResponseRedirect, Http404, StreamingHttpResponse, HttpResponseBadRequest
 from django.shortcuts import render, get_object_or_404, redirect
 from django.urls import reverse_lazy, reverse
+from django.utils import timezone
+from django.utils.decorators import method_decorator
 from django.utils.http import urlencode
+from django.utils.safestring import mark_safe
+from django.views.decorators.cache import cache_control
 from django.views.generic import UpdateView, CreateView, TemplateView, ListView, DeleteView, DetailView
 
-import requests
-from polygon import RESTClient
-
-from mondiv.forms import SearchCompanyForm, ChangeUserInfoForm, AddDividendForm, DividendPeriodForm, AddReportForm
-from mondiv.models import Company, Dividend, Report
-from mondiv.utils import client, get_month_list
-
-from datetime import datetime, timedelta, date
+from mondiv.autocomplete import search_companies, MAX_RESULTS
+from mondiv.cache import cached_chart, user_data_condition
+from mondiv.catalog import catalog_fragment
+from mondiv.charts import last_year_chart, last_n_years_chart, total_for_each_ticker_chart, \
+    total_for_each_account_chart, dividend_history_chart, total_for_each_year_chart, all_reports_chart, \
+    report_in_currency_chart, report_label, group_reports, dividend_charts, last_n_years_datasets, expand_chart, \
+    CHART_CONFIG_JSON
+from mondiv.export import EXPORTS, FORMATS, export_lines
+from mondiv.history import history_rows
+from mondiv.imports import read_rows, import_rows
+from mondiv.forms import SearchCompanyForm, BatchCompanyForm, ChangeUserInfoForm, AddDividendForm, AddReportForm, \
+    DividendFilterForm, ReportFilterForm, ImportForm
+from mondiv.models import Company, Dividend, Report, FxRate
+from mondiv.metrics import render as render_metrics
+from mondiv.responses import FastJsonResponse
+from mondiv.queries import dividend_totals, dashboard_dividends, report_rows, report_totals, profile_stats, \
+    dividend_listing, report_listing, company_dividends, dividend_total, user_currencies, \
+    missing_rates
+from mondiv.pagination import keyset_page, PAGE_SIZE, MAX_PAGE_SIZE
+from mondiv.onboarding import schedule_fetch, add_companies
+from mondiv.series import dividend_series
+from mondiv.utils import get_month_list, last_year_start, month_name, int_param
+
+from datetime import date
+
+
+# формы с выбором счета и валюты получают текущего пользователя
+class UserFormMixin:
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs['user'] = self.request.user
+        return kwargs
 
 
 # Отчеты ##############################################################
 
-class AddReportView(LoginRequiredMixin, CreateView):
+class AddReportView(LoginRequiredMixin, UserFormMixin, CreateView):
     form_class = AddReportForm
     template_name = 'mondiv/main/add_report.html'
     success_url = reverse_lazy('mondiv:report_list')
@@ -41,19 +69,81 @@ class AddReportView(LoginRequiredMixin, CreateView):
         return super().form_valid(form)
 
 
-class ReportListView(LoginRequiredMixin, ListView):
+# заполненные и правильные поля формы фильтра; неверно заполненные игнорируются
+def cleaned_filters(form):
+    if not form.is_bound:
+        return {}
+    form.is_valid()
+    return {k: v for k, v in form.cleaned_data.items() if v not in (None, '')}
+
+
+# постраничный список с фильтрами: страница по курсору (дата, id), размер limit не больше MAX_PAGE_SIZE,
+# ?format=json - та же страница в json для бесконечной прокрутки
+class KeysetListMixin:
+    filter_form_class = None
+    date_field = None
+
+    def listing(self, filters):
+        raise NotImplementedError
+
+    def to_json(self, obj):
+        raise NotImplementedError
+
+    def get_queryset(self):
+        # неверно заполненные поля фильтра игнорируются
+        self.filter_form = self.filter_form_class(self.request.GET or None)
+        self.filters = cleaned_filters(self.filter_form)
+        size = int_param(self.request.GET.get('limit'), PAGE_SIZE, MAX_PAGE_SIZE)
+        rows, self.next_cursor = keyset_page(self.listing(self.filters), self.date_field,
+                                             self.request.GET.get('cursor'), size)
+        return rows
+
+    def next_url(self):
+        if not self.next_cursor:
+            return None
+        params = self.request.GET.copy()
+        params['cursor'] = self.next_cursor
+        return f'{self.request.path}?{params.urlencode()}'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['form'] = self.filter_form
+        context['filters'] = self.filters
+        context['next_url'] = self.next_url()
+        return context
+
+    def render_to_response(self, context, **response_kwargs):
+        if self.request.GET.get('format') == 'json':
+            return FastJsonResponse({
+                'results': [self.to_json(obj) for obj in context['object_list']],
+                'next': self.next_cursor,
+                'next_url': context['next_url'],
+            })
+        return super().render_to_response(context, **response_kwargs)
+
+
+@method_decorator(user_data_condition('report_list'), name='dispatch')
+class ReportListView(LoginRequiredMixin, KeysetListMixin, ListView):
     model = Report
     context_object_name = 'reports'
     template_name = 'mondiv/main/report_list.html'
-
-    def get_queryset(self):
-        # Возвращает по умолчанию 50 последних записей
-        limit = self.request.GET.get('limit', 50)
-        return Report.objects.filter(user=self.request.user) \
-                   .order_by('-id')[:int(limit):-1]
+    filter_form_class = ReportFilterForm
+    date_field = 'report_date'
+
+    def listing(self, filters):
+        return report_listing(self.request.user, filters)
+
+    def to_json(self, report):
+        return {
+            'id': report.pk,
+            'report_date': report.report_date,
+            'account': report.account.name,
+            'currency': report.currency.name,
+            'amount': report.amount,
+        }
 
 
-class ReportdUpdateView(LoginRequiredMixin, UpdateView):
+class ReportdUpdateView(LoginRequiredMixin, UserFormMixin, UpdateView):
     model = Report
     form_class = AddReportForm
     template_name = 'mondiv/main/report_update.html'
@@ -93,11 +183,18 @@ class ReportDeleteView(LoginRequiredMixin, DeleteView):
 
 # Дивиденды #################################################################################
 
-class AddDividendView(LoginRequiredMixin, CreateView):
+class AddDividendView(LoginRequiredMixin, UserFormMixin, CreateView):
     form_class = AddDividendForm
     template_name = 'mondiv/main/add_dividend.html'
     success_url = reverse_lazy('mondiv:dividends_received')
 
+    # после добавления компании она приходит выбранной: ?id=<pk>
+    def get_initial(self):
+        initial = super().get_initial()
+        if self.request.GET.get('id'):
+            initial['company'] = self.request.GET['id']
+        return initial
+
     def form_valid(self, form):
         fields = form.save(commit=False)
         fields.user = self.request.user
@@ -105,7 +202,7 @@ class AddDividendView(LoginRequiredMixin, CreateView):
         return super().form_valid(form)
 
 
-class DividendUpdateView(LoginRequiredMixin, UpdateView):
+class DividendUpdateView(LoginRequiredMixin, UserFormMixin, UpdateView):
     model = Dividend
     form_class = AddDividendForm
     template_name = 'mondiv/main/dividend_update.html'
@@ -142,30 +239,71 @@ class DividendDeleteView(LoginRequiredMixin, DeleteView):
         return context
 
 
-class DividendsReceivedView(LoginRequiredMixin, ListView):
+@method_decorator(user_data_condition('dividends_received'), name='dispatch')
+class DividendsReceivedView(LoginRequiredMixin, KeysetListMixin, ListView):
     model = Dividend
     context_object_name = 'dividends'
     template_name = 'mondiv/main/dividends_received.html'
+    filter_form_class = DividendFilterForm
+    date_field = 'date_of_receipt'
+
+    def listing(self, filters):
+        return dividend_listing(self.request.user, filters)
+
+    def to_json(self, dividend):
+        return {
+            'id': dividend.pk,
+            'date_of_receipt': dividend.date_of_receipt,
+            'ticker': dividend.company.ticker,
+            'company': dividend.company.name,
+            'icon': dividend.company.icon_thumb_url(),
+            'currency': dividend.currency.name,
+            'payoff': dividend.payoff,
+            'account': dividend.account.name,
+        }
 
-    def get_queryset(self):
-        # Фильтрация по диапазону дат
-        if self.request.GET and self.request.GET['start'] and self.request.GET['end']:
-            start = self.request.GET['start']
-            end = self.request.GET['end']
-            return Dividend.objects.filter(user=self.request.user, date_of_receipt__range=[start, end])
 
-        # Возвращает по умолчанию 50 последних записей
-        limit = self.request.GET.get('limit', 50)
-        return Dividend.objects.filter(user=self.request.user) \
-                   .order_by('-id')[:int(limit):-1]
+# загрузка выписок брокера из csv / json
+@login_required()
+def import_statements(request):
+    result = None
+    if request.method == 'POST':
+        form = ImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            try:
+                rows = read_rows(form.cleaned_data['file'])
+            except (ValueError, csv.Error) as e:
+                form.add_error('file', f'Не удалось прочитать файл: {e}')
+            else:
+                result = import_rows(request.user, form.cleaned_data['kind'], rows)
+                if result['created']:
+                    messages.success(request, f'Загружено записей: {result["created"]}')
+    else:
+        form = ImportForm()
+    return render(request, 'mondiv/main/import.html', {'form': form, 'result': result})
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        if self.request.GET and self.request.GET['start'] and self.request.GET['end']:
-            context['start'] = datetime.strptime(self.request.GET['start'], '%Y-%m-%d').date()
-            context['end'] = datetime.strptime(self.request.GET['end'], '%Y-%m-%d').date()
-        context['form'] = DividendPeriodForm()
-        return context
+
+# выгрузка всех выплат или отчетов пользователя потоком: /export/dividends/?format=csv|ndjson
+# и те же фильтры, что у списков
+@login_required()
+def export(request, kind):
+    if kind not in EXPORTS:
+        raise Http404
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in FORMATS:
+        fmt = 'csv'
+    form = (DividendFilterForm if kind == 'dividends' else ReportFilterForm)(request.GET or None)
+    response = StreamingHttpResponse(export_lines(request.user, kind, fmt, cleaned_filters(form)),
+                                     content_type=FORMATS[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{kind}-{date.today()}.{fmt}"'
+    return response
+
+
+# страница добавления компании с каталогом уже добавленных
+def add_company_page(request, form):
+    number = int_param(request.GET.get('page'), 1, 10 ** 6)
+    return render(request, 'mondiv/main/add_company.html',
+                  {'form': form, 'catalog': mark_safe(catalog_fragment(number))})
 
 
 @login_required
@@ -174,39 +312,68 @@ def add_company(request):
         form = SearchCompanyForm(request.POST)
         if form.is_valid():
             ticker = form.cleaned_data['ticker'].upper()
-            if Company.objects.filter(ticker=ticker).exists():
-                messages.add_message(request, messages.INFO, "Такая компания уже добавлена")
-                return render(request, 'mondiv/main/add_company.html', {'form': SearchCompanyForm()})
-            else:
-                try:
-                    res = client.get_ticker_details(ticker)
-                    company = Company()
-                    company.name = res.name
-                    company.ticker = res.ticker
-                    company.description = res.description
-                    company.icon_url = res.branding.icon_url
-                    company.get_remote_image()
-                    saved_company = Company.objects.get(name=res.name)
-                    messages.add_message(request, messages.INFO,
-                                         f"Компания: {res.name}, с тикером: {ticker} успешно добавлена")
-
-                    # редирект на урл с гет параметрами сохраненной компании
-                    return redirect('{}?{}'.format(reverse('mondiv:add_dividend'), urlencode(
-                        {'company_name': f'{saved_company.name} ({saved_company.ticker})', 'id': saved_company.id})))
-
-                except Exception as e:
-                    messages.add_message(request, messages.ERROR, e)
-                    return render(request, 'mondiv/main/add_company.html', {'form': SearchCompanyForm()})
+            # компания создается сразу по тикеру, название, описание и иконка загружаются в фоне
+            with transaction.atomic():
+                company, created = Company.objects.get_or_create(
+                    ticker=ticker, defaults={'name': ticker, 'description': '', 'status': 'pending'})
+                if not created and company.status == 'failed':
+                    # повторная попытка для тикера, который раньше не нашелся
+                    company.status = 'pending'
+                    company.save(update_fields=['status'])
+                elif not created:
+                    messages.add_message(request, messages.INFO, "Такая компания уже добавлена")
+                    return add_company_page(request, SearchCompanyForm())
+                schedule_fetch(company.pk)
+            messages.add_message(request, messages.INFO,
+                                 f"Компания с тикером: {ticker} добавлена, данные о ней загружаются")
+
+            # редирект на урл с гет параметрами сохраненной компании
+            return redirect('{}?{}'.format(reverse('mondiv:add_dividend'), urlencode(
+                {'company_name': f'{company.name} ({company.ticker})', 'id': company.id})))
         else:
-            return render(request, 'mondiv/main/add_company.html', {'form': form})
+            return add_company_page(request, form)
     else:
-        return render(request, 'mondiv/main/add_company.html', {'form': SearchCompanyForm()})
+        return add_company_page(request, SearchCompanyForm())
+
+
+# добавление компаний списком тикеров, ответ - таблица статусов по каждому тикеру
+@login_required()
+def add_companies_view(request):
+    results = None
+    if request.method == 'POST':
+        form = BatchCompanyForm(request.POST)
+        if form.is_valid():
+            results = add_companies(form.cleaned_data['tickers'])
+    else:
+        form = BatchCompanyForm()
+    return render(request, 'mondiv/main/add_companies.html', {'form': form, 'results': results})
 
 
 def index(request):
     return render(request, 'mondiv/main/index.html')
 
 
+# поиск компании по началу тикера или названия для выбора в формах (формат ответа select2)
+@login_required()
+def company_autocomplete(request):
+    limit = int_param(request.GET.get('limit'), 10, MAX_RESULTS)
+    return FastJsonResponse({'results': [
+        {'id': pk, 'text': f'{name} ({ticker})'}
+        for pk, ticker, name in search_companies(request.GET.get('q', ''), limit)
+    ]})
+
+
+# состояние фоновой загрузки компании, опрашивается страницами, пока компания pending
+@login_required()
+def company_status(request, company_pk):
+    company = get_object_or_404(Company, pk=company_pk)
+    return FastJsonResponse({
+        'status': company.status,
+        'name': company.name,
+        'icon': company.icon_thumb_url(),
+    })
+
+
 # подробно про компанию (дивиденты и инфо)
 class ShowCompany(LoginRequiredMixin, DetailView):
     model = Company
@@ -216,8 +383,7 @@ class ShowCompany(LoginRequiredMixin, DetailView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        dividends = Dividend.objects.filter(company=self.get_object(), user=self.request.user)\
-            .order_by('date_of_receipt')
+        dividends = company_dividends(self.request.user, self.object)
         context['dividends'] = dividends
         context['total'] = dividends.aggregate(total=Sum('payoff'))['total']
         return context
@@ -230,46 +396,27 @@ class MDLoginView(LoginView):
 
 @login_required
 def profile(request):
-    res = Dividend.objects \
-        .filter(user=request.user)
-
-    total = res.values('currency__name') \
-        .annotate(total=Sum('payoff'))
-    ctx = {}
-    if total.count() == 0:
-        ctx['RUB'] = 0
-        ctx['USD'] = 0
-    else:
-        for item in total:
-            ctx[item['currency__name']] = item['total']
-
-    # минимальная и максимальная выплата в рублях по тикеру
-    payout_ticker_rub = res.filter(currency__name='RUB') \
-        .values('company__name', 'payoff') \
-        .order_by('payoff')
-    minimum_payout_ticker_rub = payout_ticker_rub.first()
-    maximum_payout_ticker_rub = payout_ticker_rub.last()
-
-    # минимальная и максимальная выплата в долларах по тикеру
-    payout_ticker_usd = res.filter(currency__name='USD') \
-        .values('company__name', 'payoff') \
-        .order_by('payoff')
-    minimum_payout_ticker_usd = payout_ticker_usd.first()
-    maximum_payout_ticker_usd = payout_ticker_usd.last()
-
-    # количество выплат
-    number_payments = res.values('currency__name') \
-        .annotate(number_payments=Count('id'))
-
-    # контекст
-    ctx['minimum_payout_ticker_rub'] = minimum_payout_ticker_rub
-    ctx['maximum_payout_ticker_rub'] = maximum_payout_ticker_rub
-    ctx['minimum_payout_ticker_usd'] = minimum_payout_ticker_usd
-    ctx['maximum_payout_ticker_usd'] = maximum_payout_ticker_usd
-    for n in number_payments:
-        ctx[n['currency__name'] + '_p'] = n
-
-    return render(request, 'mondiv/auth/profile.html', ctx)
+    # статистика по всем валютам пользователя одним запросом (mondiv/queries.py)
+    stats = [s for s in profile_stats(request.user) if s['number_payments']]
+    # валюты выплат и отчетов, как у dashboard: у валюты только с отчетами свои графики отчетов
+    currencies = user_currencies(request.user)
+
+    # при нескольких валютах и загруженных курсах - один набор графиков в базовой валюте
+    base = None
+    if len(currencies) > 1 and FxRate.objects.filter(base__name=settings.BASE_CURRENCY).exists():
+        base = settings.BASE_CURRENCY
+    context = {
+        'stats': stats,
+        'base_currency': base,
+        'total': dividend_total(request.user, base) if base else None,
+        'missing_rates': missing_rates(request.user, base) if base else [],
+        # графики по каждой валюте, в которой есть выплаты или отчеты
+        'currencies': [base] if base else currencies or [settings.BASE_CURRENCY],
+        'dividend_charts': ['total_for_each_year', 'last_year', 'last_n_years', 'total_for_each_ticker',
+                            'total_for_each_account'],
+        'report_charts': ['all_reports', 'report_in_currency'],
+    }
+    return render(request, 'mondiv/auth/profile.html', context)
 
 
 class MDLogoutView(LoginRequiredMixin, LogoutView):
@@ -310,6 +457,41 @@ class RegisterDoneView(TemplateView):
 
 
 ###########  Charts json ######################################
+
+# сколько лет можно запросить в last_n_years / dashboard
+MAX_YEARS = 50
+
+
+# статическая часть всех графиков; адрес с версией, поэтому кэшируется навсегда
+@cache_control(public=True, max_age=60 * 60 * 24 * 365, immutable=True)
+def chart_config(request):
+    return HttpResponse(CHART_CONFIG_JSON, content_type='application/json')
+
+
+# метрики всех воркеров в формате Prometheus, только для персонала
+@staff_member_required
+def metrics(request):
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+# ?compact=1 - только данные графика (подписи, ряды, заголовок), оформление клиент берет
+# из chart_config; без него - полный конфиг Chart.js. В пересчете в базовую валюту
+# missing_rates - валюты без курса, не попавшие в суммы
+def chart_response(request, name, payload):
+    payload = payload if request.GET.get('compact') else expand_chart(name, payload)
+    _, base = chart_currency(request)
+    if base:
+        payload = dict(payload, missing_rates=missing_rates(request.user, base))
+    return FastJsonResponse(payload)
+
+
+# графики строятся по одной валюте (?currency=USD) или по всем в пересчете
+# в базовую (?base_currency=USD); возвращает (валюта графика, базовая валюта или None)
+def chart_currency(request):
+    base = request.GET.get('base_currency', '').strip().upper() or None
+    return base or request.GET.get('currency', 'USD'), base
+
+
 def proba(request):
     currency = request.GET.get('currency', 'USD')
     res = Report.objects \
@@ -321,482 +503,124 @@ def proba(request):
 
 
 @login_required()
+@user_data_condition('last_year', daily=True)
+@cached_chart(daily=True)
 def last_year(request):
-    currency = request.GET.get('currency', 'USD')
-    res = Dividend.objects \
-        .filter(user=request.user, currency__name=currency, date_of_receipt__gt=datetime.now() - relativedelta(years=1)) \
-        .annotate(month=TruncMonth('date_of_receipt')) \
-        .values('month') \
-        .annotate(total=Sum('payoff')) \
-        .order_by('month')
-
-    labels = [r['month'].strftime("%B") for r in res]
-    data = [r['total'] for r in res]
-    return JsonResponse({
-        'type': 'bar',
-        'data': {
-            'labels': labels,
-            'datasets': [
-                {
-                    'data': data,
-                    'label': 'Дивиденды за последний год в ' + currency,
-                },
-            ]
-        },
-        'options': {
-            'plugins': {
-                'legend': {
-                    'labels': {
-                        'font': {
-                            'size': 18
-                        }
-                    },
-                },
-                'tooltip': {
-                    'titleFont': {
-                        'size': 20
-                    },
-                    'titleAlign': 'center',
-                    'boxPadding': 10
-                },
-                'title': {
-                    'font': {
-                        'size': 30
-                    },
-                    'display': 'true',
-                    'text': f'Дивиденды за последний год в {currency}'
-                },
-            }
-        }
-    })
+    currency, base = chart_currency(request)
+    buckets, series = dividend_series(request.user, currency, 'month', last_year_start(), timezone.localdate(),
+                                      base=base)
+    return chart_response(request, 'last_year', last_year_chart(currency, [month_name(b) for b in buckets], series[()]))
 
 
 @login_required()
+@user_data_condition('last_n_years', daily=True)
+@cached_chart(daily=True)
 def last_n_years(request):
-    year_now = datetime.now().year
-    for_n_years = request.GET.get('for_n_years', 3)
-    currency = request.GET.get('currency', 'USD')
-    res = Dividend.objects \
-        .filter(user=request.user, date_of_receipt__gt=f'{year_now - (for_n_years - 1)}-01-01', currency__name=currency) \
-        .annotate(month=TruncMonth('date_of_receipt')) \
-        .annotate(year=TruncYear('date_of_receipt')) \
-        .values('month', 'year') \
-        .annotate(total=Sum('payoff')) \
-        .order_by('month')
-
-    res = [{'month': r['month'].strftime("%B"), 'year': r['year'].year, 'total': r['total']} for r in res]
-
-    # формирует список по годам
-    list_by_year = []
-    count = 0
-    for y in range(year_now - (for_n_years - 1), year_now + 1):
-        list_by_year.append([])
-        for r in res:
-            if str(y) == str(r['year']):
-                list_by_year[count].append(r)
-        count = count + 1
-
-    # готовый список
-    ready_list = []
-    cnt = 0
-    for y in list_by_year:
-        ready_list.append([])
-        for month in get_month_list():
-            flg = True
-            for m in y:
-                if month == m['month']:
-                    ready_list[cnt].append(m['total'])
-                    flg = False
-                    break
-            if flg:
-                ready_list[cnt].append(0)
-        cnt = cnt + 1
-
-    return JsonResponse({
-        'type': 'bar',
-        'data': {
-            'labels': get_month_list(),
-            'datasets': [
-                {
-                    'data': ready_list[n],
-                    'label': 'Нет дивидендов' if len(list_by_year[n]) == 0 else 'Дивиденды за ' + str(
-                        list_by_year[n][0]["year"]) + ' год в ' + str(currency),
-                }
-                for n in range(for_n_years)
-            ]
-        },
-        'options': {
-            'plugins': {
-                'legend': {
-                    'labels': {
-                        'font': {
-                            'size': 18
-                        }
-                    },
-                },
-                'tooltip': {
-                    'titleFont': {
-                        'size': 20
-                    },
-                    'titleAlign': 'center',
-                    'boxPadding': 10
-                },
-                'title': {
-                    'font': {
-                        'size': 30
-                    },
-                    'display': 'true',
-                    'text': f'Дивиденды за три последних года в {currency}'
-                },
-            }
-        }
-    })
+    year_now = timezone.localdate().year
+    for_n_years = int_param(request.GET.get('for_n_years'), 3, MAX_YEARS)
+    currency, base = chart_currency(request)
+    buckets, series = dividend_series(request.user, currency, 'month',
+                                      date(year_now - (for_n_years - 1), 1, 1), date(year_now, 12, 31), base=base)
+    return chart_response(request, 'last_n_years', last_n_years_chart(currency, get_month_list(), last_n_years_datasets(buckets, series[()])))
 
 
 @login_required()
+@user_data_condition('total_for_each_ticker')
+@cached_chart()
 def total_for_each_ticker(request):
-    currency = request.GET.get('currency', 'USD')
-    res = Dividend.objects \
-        .filter(user=request.user, currency__name=currency) \
-        .values('company__name') \
-        .annotate(total=Sum('payoff'))
-
-    return JsonResponse({
-        'type': 'doughnut',
-        'data': {
-            'labels': [r['company__name'] for r in res],
-            'datasets': [
-                {
-                    'data': [r['total'] for r in res],
-                    'label': f'Всего в  {currency}',
-                    'hoverOffset': 8
-                },
-            ]
-        },
-        'options': {
-            'plugins': {
-                'legend': {
-                    'display': 0,
-                    'labels': {
-                        'font': {
-                            'size': 18
-                        }
-                    },
-                },
-                'title': {
-                    'font': {
-                        'size': 30
-                    },
-                    'display': 'true',
-                    'text': f'Дивиденды по компаниям в {currency}'
-                },
-                'tooltip': {
-                    'titleFont': {
-                        'size': 20
-                    },
-                    'titleAlign': 'center',
-                    'boxPadding': 10
-                }
-            }
-        }
-    })
+    currency, base = chart_currency(request)
+    res = dividend_totals(request.user, currency, 'company__name', base)
+
+    return chart_response(request, 'total_for_each_ticker',
+                          total_for_each_ticker_chart(currency, [r['company__name'] for r in res],
+                                                      [r['total'] for r in res]))
 
 
 @login_required()
+@user_data_condition('total_for_each_account')
+@cached_chart()
 def total_for_each_account(request):
-    currency = request.GET.get('currency', 'USD')
-    res = Dividend.objects \
-        .filter(user=request.user, currency__name=currency, ) \
-        .values('account__name') \
-        .annotate(total=Sum('payoff'))
-
-    return JsonResponse({
-        'type': 'polarArea',
-        'data': {
-            'labels': [r['account__name'] for r in res],
-            'datasets': [
-                {
-                    'data': [r['total'] for r in res],
-                    'label': f'Всего в  {currency}',
-                    'hoverOffset': 8
-                },
-            ]
-        },
-        'options': {
-            'plugins': {
-                'legend': {
-                    'labels': {
-                        'font': {
-                            'size': 18
-                        }
-                    },
-                },
-                'title': {
-                    'font': {
-                        'size': 30
-                    },
-                    'display': 'true',
-                    'text': f'Дивиденды на счетах в {currency}'
-                },
-                'tooltip': {
-                    'titleFont': {
-                        'size': 20
-                    },
-                    'titleAlign': 'center',
-                    'boxPadding': 10
-                }
-            }
-        }
-    })
+    currency, base = chart_currency(request)
+    res = dividend_totals(request.user, currency, 'account__name', base)
+
+    return chart_response(request, 'total_for_each_account',
+                          total_for_each_account_chart(currency, [r['account__name'] for r in res],
+                                                       [r['total'] for r in res]))
 
 
 @login_required()
 def dividend_history(request):
-    ticker = request.GET.get('ticker')
-    limit = request.GET.get('limit', 40)
-    apiKey = os.environ.get("POLYGON_API_KEY") or 'slfhowwfy'
-
-    url = f'https://api.polygon.io/v3/reference/dividends?ticker={ticker}&limit={limit}&apiKey={apiKey}'
-
-    res = requests.get(url)
-    if len(res.json()['results']) != 0:
-        res = res.json()['results']
-        res = [[r['cash_amount'] for r in reversed(res)], [r['ex_dividend_date'] for r in reversed(res)]]
-    else:
-        url = f'http://iss.moex.com/iss/securities/{ticker}/dividends.json'
-        res = requests.get(url)
-        res = res.json()['dividends']['data']
-        res = [[r[3] for r in res], [r[2] for r in res]]
-    return JsonResponse({
-        'type': 'bar',
-        'data': {
-            'labels': res[1],
-            'datasets': [
-                {
-                    'data': res[0],
-                    'label': 'выплата',
-                },
-            ]
-        },
-        'options': {
-            'plugins': {
-                'legend': {
-                    'display': 0,
-                    'labels': {
-                        'font': {
-                            'size': 18
-                        }
-                    },
-                },
-                'tooltip': {
-                    'titleFont': {
-                        'size': 20
-                    },
-                    'titleAlign': 'center',
-                    'boxPadding': 10
-                },
-                'title': {
-                    'font': {
-                        'size': 30
-                    },
-                    'display': 'true',
-                    'text': f'Дивиденды, последние {limit} выплат'
-                },
-            }
-        }
-    })
+    ticker = request.GET.get('ticker', '').strip()
+    # без тикера источник отдал бы выплаты всех компаний подряд
+    if not ticker:
+        return HttpResponseBadRequest('Не указан тикер')
+    limit = int_param(request.GET.get('limit'), 40, 1000)
+    rows = history_rows(ticker, limit)
+    return chart_response(request, 'dividend_history', dividend_history_chart(limit, [r[0] for r in rows], [r[1] for r in rows]))
 
 
 @login_required()
+@user_data_condition('total_for_each_year', daily=True)
+@cached_chart(daily=True)
 def total_for_each_year(request):
-    currency = request.GET.get('currency', 'USD')
-    res = Dividend.objects \
-        .filter(user=request.user, currency__name=currency) \
-        .annotate(year=TruncYear('date_of_receipt')) \
-        .values('year') \
-        .annotate(total=Sum('payoff')) \
-        .order_by('year')
-
-    labels = [r['year'].year for r in res]
-    data = [r['total'] for r in res]
-
-    return JsonResponse({
-        'type': 'bar',
-        'data': {
-            'labels': labels,
-            'datasets': [
-                {
-                    'data': data,
-                    'label': 'Дивиденды в ' + currency,
-                    'backgroundColor': [
-                        'rgba(255, 99, 132, 0.2)',
-                        'rgba(255, 159, 64, 0.2)',
-                        'rgba(255, 205, 86, 0.2)',
-                        'rgba(75, 192, 192, 0.2)',
-                        'rgba(54, 162, 235, 0.2)',
-                        'rgba(153, 102, 255, 0.2)',
-                        'rgba(201, 203, 207, 0.2)'
-                    ],
-                    'borderColor': [
-                        'rgb(255, 99, 132)',
-                        'rgb(255, 159, 64)',
-                        'rgb(255, 205, 86)',
-                        'rgb(75, 192, 192)',
-                        'rgb(54, 162, 235)',
-                        'rgb(153, 102, 255)',
-                        'rgb(201, 203, 207)'
-                    ],
-                    'borderWidth': 1
-                }
-            ]
-        },
-        'options': {
-            'plugins': {
-                'legend': {
-                    'display': 0,
-                    'labels': {
-                        'font': {
-                            'size': 18
-                        }
-                    },
-                },
-                'tooltip': {
-                    'titleFont': {
-                        'size': 20
-                    },
-                    'titleAlign': 'center',
-                    'boxPadding': 10
-                },
-                'title': {
-                    'font': {
-                        'size': 30
-                    },
-                    'display': 'true',
-                    'text': f'Дивиденды в {currency}'
-                },
-            }
-        }
-    })
+    currency, base = chart_currency(request)
+    buckets, series = dividend_series(request.user, currency, 'year', base=base)
+    return chart_response(request, 'total_for_each_year', total_for_each_year_chart(currency, [b.year for b in buckets], series[()]))
 
 
 @login_required()
+@user_data_condition('all_reports')
+@cached_chart()
 def all_reports(request):
-    currency = request.GET.get('currency', 'USD')
-    accounts = Report.objects \
-        .filter(user=request.user, currency__name=currency) \
-        .values_list('account__name').distinct()
-
-    res = []
-    for account in accounts:
-        res.append(
-            Report.objects \
-                .filter(user=request.user, currency__name=currency, account__name=account[0]) \
-                .values('report_date', 'amount', 'account__name') \
-                .order_by('report_date')
-        )
-
-    return JsonResponse({
-        'type': 'line',
-        'data': {
-            'datasets': [
-                {
-                    'data': {
-                        # 'January': 400
-                        f"{item['report_date'].strftime('%B')} - {item['report_date'].year}": item['amount']
-                        for item in acc
-                    },
-                    'label': acc[0]['account__name'],
-                    'pointStyle': 'circle',
-                    'pointRadius': 8,
-                    'pointHoverRadius': 10
-                }
-                for acc in res
-            ]
-        },
-        'options': {
-            'responsive': 1,
-            'plugins': {
-                'legend': {
-                    'display': 1,
-                    'position': 'top',
-                    'labels': {
-                        'font': {
-                            'size': 18
-                        }
-                    },
-                },
-                'tooltip': {
-                    'titleFont': {
-                        'size': 20
-                    },
-                    'titleAlign': 'center',
-                    'boxPadding': 10
-                },
-                'title': {
-                    'font': {
-                        'size': 30
-                    },
-                    'display': 'true',
-                    'text': f'Отчеты в {currency}'
-                },
-            }
-        }
-    })
+    currency, base = chart_currency(request)
+    # все отчеты одним запросом, по счетам раскладываются за один проход
+    accounts, totals = group_reports(report_rows(request.user, [currency], base), base)
+    return chart_response(request, 'all_reports',
+                          all_reports_chart(currency, accounts.get(currency, []), list(totals.get(currency, {}))))
 
 
 @login_required()
+@user_data_condition('report_in_currency')
+@cached_chart()
 def report_in_currency(request):
-    currency = request.GET.get('currency', 'USD')
-    res = Report.objects \
-        .filter(user=request.user, currency__name=currency) \
-        .values('report_date') \
-        .annotate(total=Sum('amount'))
+    currency, base = chart_currency(request)
+    res = report_totals(request.user, currency, base)
+    return chart_response(request, 'report_in_currency',
+                          report_in_currency_chart(currency, {report_label(r['report_date']): r['total'] for r in res}))
 
-    return JsonResponse({
-        'type': 'line',
-        'data': {
-            'datasets': [
-                {
-                    'data': {
-                        # 'January': 400
-                        # f"{item['report_date'].strftime('%B')} - {item['report_date'].year}": item['amount']
-                        f"{r['report_date'].strftime('%B')} - {r['report_date'].year}": r['total']
-                        for r in res
-                    },
-                    'label': currency,
-                    'pointStyle': 'circle',
-                    'pointRadius': 8,
-                    'pointHoverRadius': 10
-
-                }
-            ]
-        },
-        'options': {
-            'responsive': 1,
-            'plugins': {
-                'legend': {
-                    'display': 0,
-                    'position': 'top',
-                    'labels': {
-                        'font': {
-                            'size': 18
-                        }
-                    },
-                },
-                'tooltip': {
-                    'titleFont': {
-                        'size': 20
-                    },
-                    'titleAlign': 'center',
-                    'boxPadding': 10
-                },
-                'title': {
-                    'font': {
-                        'size': 30
-                    },
-                    'display': 'true',
-                    'text': f'Отчет в {currency}'
-                },
-            }
-        }
-    })
\ No newline at end of file
+
+# все графики страницы профиля одним запросом:
+# ?currency=USD&currency=RUB&for_n_years=3 - по валютам (без currency - по всем валютам пользователя),
+# ?base_currency=USD - один набор графиков по всем валютам в пересчете
+@login_required()
+@user_data_condition('dashboard', daily=True)
+@cached_chart(daily=True)
+def dashboard(request):
+    _, base = chart_currency(request)
+    currencies = [base] if base else request.GET.getlist('currency') or user_currencies(request.user) \
+        or [settings.BASE_CURRENCY]
+    for_n_years = int_param(request.GET.get('for_n_years'), 3, MAX_YEARS)
+
+    # оба запроса в одной транзакции - графики строятся по одному снимку данных
+    with transaction.atomic():
+        dividends = list(dashboard_dividends(request.user, currencies, base))
+        reports = list(report_rows(request.user, currencies, base))
+
+    rows_by_currency = {}
+    for r in dividends:
+        rows_by_currency.setdefault(base or r['currency__name'], []).append(r)
+    accounts, totals = group_reports(reports, base)
+
+    res = {}
+    for currency in currencies:
+        charts = dividend_charts(currency, rows_by_currency.get(currency, []), timezone.localdate(),
+                                  for_n_years)
+        charts['all_reports'] = all_reports_chart(currency, accounts.get(currency, []),
+                                                  list(totals.get(currency, {})))
+        charts['report_in_currency'] = report_in_currency_chart(currency, totals.get(currency, {}))
+        if not request.GET.get('compact'):
+            charts = {name: expand_chart(name, chart) for name, chart in charts.items()}
+        res[currency] = charts
+    if base:
+        res['missing_rates'] = missing_rates(request.user, base)
+    return FastJsonResponse(res)